@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Per inbound message receive timeouts learned from how long the
+# target actually takes to answer (--adaptiveTimeout)
+#
+# The unfuzzed test run and every later successful receive add a
+# latency sample for their message.  Each message's timeout becomes a
+# multiple of a high quantile of its recent samples, never more than
+# the .fuzzer file's receiveTimeout
+#
+# Learning only from answers that made it in time would keep a timeout
+# that is too short, since the slow answers it cuts off are never seen.
+# So a receive that times out before any fuzzed message went out adds a
+# censored sample (the answer took at least that long) and backs its
+# message's timeout off by BACKOFF.  Once fuzzed data has been sent, a
+# timeout usually means the target rejected or choked on it rather than
+# being slow, so those are only counted.  Otherwise every fuzz case the
+# target ignores would push the timeout back up to receiveTimeout
+#
+#------------------------------------------------------------------
+
+from collections import deque
+
+# Default lower bound on learned timeouts (--adaptiveTimeoutFloor), timer
+# and scheduling noise alone can take a few ms
+MIN_TIMEOUT = 0.005
+# A timed out receive multiplies its message's timeout by this
+BACKOFF = 2
+# Once a message has this many samples, only recompute its timeout
+# every UPDATE_INTERVAL samples instead of on every one
+UPDATE_INTERVAL = 32
+
+class AdaptiveTimeouts(object):
+    # maxTimeout - timeout until something is learned, and the upper bound
+    # multiplier - timeout is multiplier * the quantile of the samples
+    # minTimeout - lower bound on any learned timeout
+    # windowSize - how many of the latest samples each message keeps
+    def __init__(self, maxTimeout, multiplier, minTimeout=MIN_TIMEOUT, windowSize=1000, quantile=0.99):
+        self.maxTimeout = maxTimeout
+        self.multiplier = multiplier
+        self.minTimeout = min(maxTimeout, minTimeout)
+        self.windowSize = windowSize
+        self.quantile = quantile
+        # Message number => deque of latencies in seconds
+        self._samples = {}
+        # Message number => learned timeout
+        self._timeouts = {}
+        # Message number => samples since the timeout was last computed
+        self._staleSamples = {}
+        # Message number => receives that timed out
+        self._timedOut = {}
+        # Message number => how many of those were after fuzzed data
+        self._timedOutFuzzed = {}
+
+    def getTimeout(self, messageNumber):
+        return self._timeouts.get(messageNumber, self.maxTimeout)
+
+    def _getSamples(self, messageNumber):
+        samples = self._samples.get(messageNumber)
+        if samples is None:
+            samples = self._samples[messageNumber] = deque(maxlen=self.windowSize)
+        return samples
+
+    # latency - seconds between asking for messageNumber and having it
+    def record(self, messageNumber, latency):
+        samples = self._getSamples(messageNumber)
+        samples.append(latency)
+        staleSamples = self._staleSamples.get(messageNumber, 0) + 1
+        if len(samples) < UPDATE_INTERVAL or staleSamples >= UPDATE_INTERVAL:
+            timeout = self.getQuantile(messageNumber) * self.multiplier
+            self._timeouts[messageNumber] = min(self.maxTimeout, max(self.minTimeout, timeout))
+            staleSamples = 0
+        self._staleSamples[messageNumber] = staleSamples
+
+    # Nothing arrived for messageNumber within timeout seconds.  Unless
+    # afterFuzzed (a fuzzed message went out earlier in the run), kept as
+    # a sample of timeout, a lower bound on the real latency, and the
+    # backed off timeout holds until the next recompute
+    def recordTimeout(self, messageNumber, timeout, afterFuzzed=False):
+        self._timedOut[messageNumber] = self._timedOut.get(messageNumber, 0) + 1
+        if afterFuzzed:
+            self._timedOutFuzzed[messageNumber] = self._timedOutFuzzed.get(messageNumber, 0) + 1
+            return
+        self._getSamples(messageNumber).append(timeout)
+        backedOff = max(self.getTimeout(messageNumber), timeout) * BACKOFF
+        self._timeouts[messageNumber] = min(self.maxTimeout, max(self.minTimeout, backedOff))
+        self._staleSamples[messageNumber] = 0
+
+    def getQuantile(self, messageNumber):
+        samples = sorted(self._samples[messageNumber])
+        return samples[min(len(samples) - 1, int(len(samples) * self.quantile))]
+
+    # Lines for the stats summary, see Stats.addSection()
+    def getSummary(self):
+        lines = ["Receive timeouts (p%g x %g, %g to %g ms):" % (self.quantile * 100, self.multiplier, self.minTimeout * 1000, self.maxTimeout * 1000)]
+        for messageNumber in sorted(self._samples):
+            lines.append("\tMessage %d: p%g %.2f ms over %d samples, %d timed out (%d after fuzzed data), timeout in use %.2f ms" % (messageNumber,
+                         self.quantile * 100, self.getQuantile(messageNumber) * 1000, len(self._samples[messageNumber]),
+                         self._timedOut.get(messageNumber, 0), self._timedOutFuzzed.get(messageNumber, 0), self.getTimeout(messageNumber) * 1000))
+        return lines
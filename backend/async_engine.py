@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Runs up to --concurrency conversations with the target at once on a
+# single asyncio event loop, instead of one blocking socket at a time
+#
+# Every slot has its own message processor instance, so a processor
+# still sees one run at a time, in order, exactly as it does with
+# performRun().  Processor callbacks and the mutator run on a single
+# helper thread so they never block socket I/O and never run
+# concurrently with each other.  A conversation that takes longer than
+# failureTimeout as a whole is cut off, so a target that trickles out
+# responses can't hold a slot forever.
+#
+#------------------------------------------------------------------
+
+import asyncio
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mutiny_classes.mutiny_exceptions import *
+from mutiny_classes.message_processor import MessageProcessorExtraParams
+from backend.fuzzer_types import RunRecord
+from backend.framing import checkFrameSize, MAX_FRAME_SIZE
+from backend.tls_transport import TlsTransport
+from backend.socket_lifecycle import SocketLifecycle
+from backend.pacing import Pacer
+from backend.target_health import TargetHealth
+from backend.crash_events import RunTimeline, CrashEventsPending, TIMELINE_RUNS
+
+# Protocols the engine can speak, raw sockets still need performRun()
+SUPPORTED_PROTOCOLS = ["tcp", "tls", "udp"]
+
+# One run: what was sent and received with a given seed
+class Conversation(object):
+    def __init__(self, runNumber, seed):
+        self.runNumber = runNumber
+        self.seed = seed
+        self.runRecord = RunRecord()
+
+# Collects datagrams for a udp conversation
+class _DatagramQueue(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait(data)
+
+    def error_received(self, exc):
+        self.queue.put_nowait(exc)
+
+# A connected tcp, tls, udp or unix socket for one conversation
+class _AsyncConnection(object):
+    def __init__(self, reader=None, writer=None, transport=None, protocol=None):
+        self._reader = reader
+        self._writer = writer
+        self._transport = transport
+        self._protocol = protocol
+        # Stream data read past the end of the last frame
+        self.pending = bytearray()
+
+    def isStream(self):
+        return self._reader is not None
+
+    # The SSLObject of a tls connection, otherwise None
+    def sslObject(self):
+        return self._writer.get_extra_info("ssl_object") if self._writer else None
+
+    # buffers - list of buffers to send one after the other
+    async def send(self, buffers):
+        if self._writer:
+            self._writer.writelines(buffers)
+            await self._writer.drain()
+        else:
+            self._transport.sendto(b"".join(buffers))
+
+    async def recv(self, bufferSize):
+        if self._reader:
+            return await self._reader.read(bufferSize)
+        data = await self._protocol.queue.get()
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+        elif self._transport:
+            self._transport.close()
+
+class AsyncEngine(object):
+    # target - TargetEndpoint, each conversation takes the next address
+    # runPlan - RunPlan of fuzzerData.messageCollection
+    # prepareOutbound - prepareOutboundMessage() from mutiny.py
+    # messageProcessorClass - a fresh instance is made for every slot
+    # pacer - Pacer to take a token from before every case
+    # reportEvent - callable(event, **fields), see reportToParent()
+    # receiveTimeouts - AdaptiveTimeouts, None to always use receiveTimeout
+    # tlsTransport - TlsTransport for proto tls
+    # socketLifecycle - SocketLifecycle to set up and bind every socket with
+    # targetHealth - TargetHealth to wait on before retrying a crashed case
+    def __init__(self, fuzzerData, target, concurrency, runPlan, prepareOutbound, messageProcessorClass,
+                 exceptionProcessor, monitor, stats, logger=None, logAll=False, pacer=None, reportEvent=None,
+                 receiveTimeouts=None, tlsTransport=None, socketLifecycle=None, targetHealth=None):
+        if fuzzerData.proto not in SUPPORTED_PROTOCOLS:
+            raise ValueError("--concurrency doesn't support the %s protocol" % (fuzzerData.proto))
+        self.fuzzerData = fuzzerData
+        self.target = target
+        self.concurrency = concurrency
+        self.runPlan = runPlan
+        self.prepareOutbound = prepareOutbound
+        self.messageProcessorClass = messageProcessorClass
+        self.exceptionProcessor = exceptionProcessor
+        self.monitor = monitor
+        self.stats = stats
+        self.logger = logger
+        self.logAll = logAll
+        self.pacer = pacer if pacer else Pacer(0)
+        self.reportEvent = reportEvent if reportEvent else lambda event, **fields: None
+        self.receiveTimeouts = receiveTimeouts
+        self.tlsTransport = tlsTransport
+        if socketLifecycle is None:
+            socketLifecycle = SocketLifecycle(fuzzerData.getSourceIPs(), fuzzerData.getSourcePorts())
+        self.socketLifecycle = socketLifecycle
+        if targetHealth is None:
+            targetHealth = TargetHealth(fuzzerData, target, tlsTransport, stats)
+        self.targetHealth = targetHealth
+        # Conversations in flight and just finished, for blaming crashes
+        self.runTimeline = RunTimeline(max(TIMELINE_RUNS, concurrency * 4))
+        # Runs a crash was blamed on, whichever slot logged it
+        self._blamedRuns = set()
+        self._cases = None
+        self._executor = None
+        self._sslContext = None
+
+    # Fuzz every (runNumber, seed) in cases.  testRun, if given, is the
+    # runNumber of an unfuzzed run performed on its own before the rest.
+    # Returns once cases runs out or a processor asks to halt
+    def run(self, cases, testRun=None):
+        self._cases = iter(cases)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            asyncio.run(self._run(testRun))
+        finally:
+            self._executor.shutdown(wait=False)
+
+    async def _run(self, testRun):
+        if self.fuzzerData.proto == "tls":
+            if self.tlsTransport is None:
+                self.tlsTransport = TlsTransport(stats=self.stats)
+            self._sslContext = self.tlsTransport.context
+
+        slots = [self._Slot(self.messageProcessorClass()) for n in range(0, self.concurrency)]
+        try:
+            if testRun is not None:
+                print("\n\nPerforming test run without fuzzing...")
+                await self._runCase(slots[0], testRun, -1)
+            tasks = [asyncio.ensure_future(self._runSlot(slot)) for slot in slots]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+        except (LogAndHaltException, LogLastAndHaltException, HaltException):
+            pass
+
+    class _Slot(object):
+        def __init__(self, messageProcessor):
+            self.messageProcessor = messageProcessor
+            # Previous conversation, for LogLastAndHaltException
+            self.lastConversation = None
+
+    async def _runSlot(self, slot):
+        for (runNumber, seed) in self._cases:
+            print("\n\nFuzzing with seed %d" % (seed))
+            await self._runCase(slot, runNumber, seed)
+
+    # Call a processor/mutator function on the helper thread
+    async def _callProcessor(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # Mirrors the exception handling of the main loop in mutiny.py for
+    # one run, including LogCrashException retries.  Raises the halting
+    # exceptions after logging them
+    async def _runCase(self, slot, runNumber, seed):
+        failureCount = 0
+        incident = None
+        while True:
+            delay = self.pacer.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            conversation = Conversation(runNumber, seed)
+            self.runTimeline.add(runNumber, seed, conversation.runRecord)
+            lastConversation = slot.lastConversation
+            slot.lastConversation = conversation
+            self.stats.increment("Runs performed")
+            try:
+                try:
+                    await self._converseWithTimeout(slot, conversation)
+                    if self.logAll:
+                        self._log(conversation, "LogAll ")
+                    self.pacer.recordRun(failed=False)
+                except Exception as e:
+                    self.pacer.recordRun(failed=True)
+                    if self.monitor.hasCrashEvents():
+                        self._logCrashEvents(conversation)
+                    elif self.logAll:
+                        self._log(conversation, "LogAll ")
+
+                    if isinstance(e, CrashEventsPending):
+                        # Another slot may have taken the crash events first,
+                        # so ask whether anyone blamed this run
+                        if runNumber in self._blamedRuns:
+                            # Logged already, nothing more to do with this run
+                            self._blamedRuns.discard(runNumber)
+                        elif failureCount < self.fuzzerData.failureThreshold:
+                            # Cut short by another run's crash, run it again
+                            failureCount += 1
+                            continue
+                        else:
+                            print("Run %d was cut short by other runs' crashes %d times, moving to next test." % (runNumber, failureCount + 1))
+                    elif e.__class__ in MessageProcessorExceptions.all:
+                        raise e
+                    else:
+                        self.exceptionProcessor.processException(e)
+                        print("Exception ignored: %s" % (str(e)))
+
+            except LogCrashException as e:
+                if incident is None:
+                    incident = self.targetHealth.beginIncident()
+                if failureCount == 0:
+                    print("MessageProcessor detected a crash")
+                    self.reportEvent("crash", seed=seed, message=str(e))
+                    self._log(conversation, str(e))
+                if self.logAll:
+                    self._log(conversation, "LogAll ")
+                failureCount += 1
+                if failureCount < self.fuzzerData.failureThreshold:
+                    print("Failure %d of %d allowed for seed %d" % (failureCount, self.fuzzerData.failureThreshold, seed))
+                    print("The test run didn't complete, continuing once the target is ready (at most %d seconds)..." % (self.fuzzerData.failureTimeout))
+                    # Probes block, keep them off the event loop
+                    await asyncio.get_running_loop().run_in_executor(None, self.targetHealth.waitUntilReady, incident)
+                    continue
+                print("Failed %d times, moving to next test." % (failureCount))
+
+            except AbortCurrentRunException as e:
+                print("Run aborted: %s" % (str(e)))
+
+            except RetryCurrentRunException as e:
+                print("Retrying current run: %s" % (str(e)))
+                continue
+
+            except LogAndHaltException as e:
+                self.reportEvent("halt", seed=seed, message=str(e))
+                if self.logger:
+                    self._log(conversation, str(e))
+                    print("Received LogAndHaltException, logging and halting")
+                else:
+                    print("Received LogAndHaltException, halting but not logging (quiet mode)")
+                raise
+
+            except LogLastAndHaltException as e:
+                # "Last" is this slot's previous run, other slots may
+                # have finished runs since then
+                self.reportEvent("halt", seed=lastConversation.seed if lastConversation else -1, message=str(e))
+                if not self.logger:
+                    print("Received LogLastAndHaltException, halting but not logging (quiet mode)")
+                elif lastConversation and lastConversation.seed > -1:
+                    print("Received LogLastAndHaltException, logging last run and halting")
+                    self._log(lastConversation, str(e))
+                else:
+                    print("Received LogLastAndHaltException, skipping logging (due to last run being a test run) and halting")
+                raise
+
+            except HaltException as e:
+                self.reportEvent("halt", seed=seed, message=str(e))
+                print("Received HaltException halting")
+                raise
+            if incident:
+                self.targetHealth.endIncident(incident)
+            self._blamedRuns.discard(runNumber)
+            return
+
+    # Logs each crash the monitor reported against the conversations it's
+    # blamed on, whichever slots they're in, see backend/crash_events.py,
+    # and remembers those runs so their own slots don't retry them
+    def _logCrashEvents(self, conversation):
+        for crashEvent in self.monitor.takeCrashEvents():
+            crashMessage = crashEvent.describe()
+            print(crashMessage)
+            runs = self.runTimeline.findRuns(crashEvent.timestamp)
+            if not runs:
+                # Before anything was sent
+                runs = [(conversation.runNumber, conversation.seed, conversation.runRecord)]
+            for (runNumber, seed, runRecord) in runs:
+                message = crashMessage
+                if len(runs) > 1:
+                    message += " (one of %d runs the target hadn't answered)" % (len(runs))
+                self._blamedRuns.add(runNumber)
+                self.reportEvent("crash", seed=seed, message=message)
+                if self.logger:
+                    self.logger.outputRunLog(runNumber, self.fuzzerData.messageCollection, message, runRecord)
+
+    def _log(self, conversation, errorMessage):
+        if self.logger:
+            self.logger.outputRunLog(conversation.runNumber, self.fuzzerData.messageCollection, errorMessage, conversation.runRecord)
+
+    async def _connect(self, family, address):
+        if family == socket.AF_UNIX:
+            if self.fuzzerData.proto == "udp":
+                (transport, protocol) = await asyncio.get_running_loop().create_datagram_endpoint(
+                    _DatagramQueue, remote_addr=address, family=family)
+                return _AsyncConnection(transport=transport, protocol=protocol)
+            (reader, writer) = await asyncio.open_unix_connection(address, ssl=self._sslContext,
+                server_hostname="localhost" if self._sslContext else None)
+            return _AsyncConnection(reader=reader, writer=writer)
+
+        # Make the socket here so socketLifecycle can set it up and bind it,
+        # same as SocketLifecycle.connect() but without blocking
+        for attempt in range(0, self.socketLifecycle.poolSize):
+            sock = socket.socket(family, socket.SOCK_DGRAM if self.fuzzerData.proto == "udp" else socket.SOCK_STREAM)
+            try:
+                sock.setblocking(False)
+                self.socketLifecycle.prepare(sock)
+            except:
+                sock.close()
+                raise
+            try:
+                await asyncio.get_running_loop().sock_connect(sock, address)
+                break
+            except OSError as e:
+                sock.close()
+                if attempt == self.socketLifecycle.poolSize - 1 or not self.socketLifecycle.shouldRetryConnect(e):
+                    raise
+            except:
+                sock.close()
+                raise
+        if self.fuzzerData.proto == "udp":
+            (transport, protocol) = await asyncio.get_running_loop().create_datagram_endpoint(_DatagramQueue, sock=sock)
+            return _AsyncConnection(transport=transport, protocol=protocol)
+        (reader, writer) = await asyncio.open_connection(sock=sock, ssl=self._sslContext,
+            server_hostname=address[0] if self._sslContext else None)
+        return _AsyncConnection(reader=reader, writer=writer)
+
+    # Wait for awaitable for up to timeout, raising socket.timeout like a
+    # blocking socket would so exception processors see the same thing
+    async def _withTimeout(self, awaitable, timeout):
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout("timed out")
+
+    # Same as StreamReceiver.receive(), returns once frame is complete or
+    # timeout passes
+    async def _receiveFrame(self, connection, frame, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        buffer = connection.pending
+        while True:
+            frameLength = frame.getFrameLength(buffer, len(buffer))
+            if frameLength is not None and frameLength <= len(buffer):
+                break
+            checkFrameSize(frameLength, len(buffer), MAX_FRAME_SIZE)
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                chunk = await asyncio.wait_for(connection.recv(4096), remaining)
+            except asyncio.TimeoutError:
+                if len(buffer) == 0:
+                    raise socket.timeout("timed out")
+                frameLength = len(buffer)
+                break
+            if len(chunk) == 0:
+                if len(buffer) == 0:
+                    raise ConnectionClosedException("Server has closed the connection")
+                frameLength = len(buffer)
+                break
+            buffer += chunk
+        data = buffer[:frameLength]
+        del buffer[:frameLength]
+        return data
+
+    async def _receive(self, connection, bytesToRead, timeout):
+        if connection.pending:
+            # Already read past the last frame, that's what's there
+            response = connection.pending[:]
+            del connection.pending[:]
+            return response
+        readBufSize = 4096
+        response = bytearray(await self._withTimeout(connection.recv(readBufSize), timeout))
+        if len(response) == 0:
+            raise ConnectionClosedException("Server has closed the connection")
+        # Same as receivePacket(), keep reading 4096 byte chunks until
+        # we should have read enough
+        i = readBufSize
+        while i < bytesToRead:
+            response += bytearray(await self._withTimeout(connection.recv(readBufSize), timeout))
+            i += readBufSize
+        return response
+
+    # _converse(), cut off with socket.timeout once failureTimeout passes
+    async def _converseWithTimeout(self, slot, conversation):
+        if not self.fuzzerData.failureTimeout:
+            return await self._converse(slot, conversation)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.fuzzerData.failureTimeout
+        try:
+            return await asyncio.wait_for(self._converse(slot, conversation), self.fuzzerData.failureTimeout)
+        except asyncio.TimeoutError:
+            if loop.time() < deadline:
+                # A receive inside timed out (socket.timeout is the same
+                # class as asyncio.TimeoutError from Python 3.11 on)
+                raise
+            self.stats.increment("Conversations cut off by failureTimeout")
+            raise socket.timeout("conversation took longer than failureTimeout (%d seconds)" % (self.fuzzerData.failureTimeout))
+
+    # The async counterpart of performRun()
+    async def _converse(self, slot, conversation):
+        messageProcessor = slot.messageProcessor
+        seed = conversation.seed
+        (family, address, host) = self.target.next()
+        if "preConnect" in self.runPlan.hooks:
+            try:
+                await self._callProcessor(messageProcessor.preConnect, seed, host, self.fuzzerData.port)
+            except AttributeError:
+                pass
+
+        self.monitor.checkCrashEvents()
+        connection = await self._connect(family, address)
+        if self.tlsTransport:
+            self.tlsTransport.recordHandshake(connection.sslObject())
+        try:
+            runRecord = conversation.runRecord
+            for i in self.runPlan.connectionMessages:
+                plan = self.runPlan.messages[i]
+                if plan.isOutbound:
+                    buffersToSend = await self._callProcessor(self.prepareOutbound, i, runRecord, messageProcessor, seed)
+                    runRecord.sendTimes.append(time.time())
+                    await connection.send(buffersToSend)
+                    if plan.isFuzzed and seed > -1:
+                        runRecord.sentFuzzed = True
+                    print("\tSeed %d: sent %d byte packet" % (seed, sum([len(buffer) for buffer in buffersToSend])))
+                else:
+                    timeout = self.receiveTimeouts.getTimeout(i) if self.receiveTimeouts else self.fuzzerData.receiveTimeout
+                    startTime = time.monotonic()
+                    try:
+                        if plan.frame and connection.isStream():
+                            data = await self._receiveFrame(connection, plan.frame, timeout)
+                        else:
+                            data = await self._receive(connection, len(plan.originalMessage), timeout)
+                    except socket.timeout:
+                        if timeout < self.fuzzerData.receiveTimeout:
+                            self.stats.increment("Receives cut short by adaptive timeout")
+                        if self.receiveTimeouts:
+                            self.receiveTimeouts.recordTimeout(i, timeout, runRecord.sentFuzzed)
+                        raise
+                    runRecord.receiveTimes.append(time.time())
+                    if self.receiveTimeouts:
+                        self.receiveTimeouts.record(i, time.monotonic() - startTime)
+                    print("\tSeed %d: received %d bytes" % (seed, len(data)))
+                    if data == plan.originalMessage:
+                        print("\tSeed %d: received expected response" % (seed))
+                    runRecord.receivedMessageData[i] = data
+                    if "postReceiveProcess" in self.runPlan.hooks:
+                        await self._callProcessor(messageProcessor.postReceiveProcess, data,
+                                                  MessageProcessorExtraParams(i, -1, False, plan.originalWhole, [data]))
+                runRecord.highestMessageNumber = i
+                self.monitor.checkCrashEvents()
+            if self.tlsTransport:
+                self.tlsTransport.saveSession(connection.sslObject())
+        finally:
+            connection.close()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Memory-bounded set membership used to skip duplicate test cases
+#
+# A Bloom filter never forgets an item, but may occasionally claim
+# to have seen one it hasn't (false positive).  Size it with the
+# number of items expected and the false positive rate you can live
+# with, and memory use stays fixed no matter how many items go in.
+# Past that number the false positive rate climbs quickly, so
+# BloomFilterChain adds filters as later sessions need more room.
+#
+#------------------------------------------------------------------
+
+import hashlib
+import math
+import os
+import struct
+
+# Smallest filter, in bits
+MIN_BIT_COUNT = 8192
+
+class BloomFilter(object):
+    # Identifies the file format written by save()
+    MAGIC = b"MUTINYB2"
+    HEADER = struct.Struct("<8sQQQQ")
+
+    # capacity - number of items expected
+    # errorRate - acceptable false positive rate at capacity
+    def __init__(self, capacity, errorRate=0.0001):
+        self.capacity = max(1, capacity)
+        # Optimal sizes, see any reference on Bloom filters
+        optimalBitCount = int(math.ceil(-self.capacity * math.log(errorRate) / (math.log(2) ** 2)))
+        self.hashCount = max(1, int(round(optimalBitCount / float(self.capacity) * math.log(2))))
+        # Double hashing repeats positions in a tiny filter, which then
+        # misses errorRate by far
+        self.bitCount = max(MIN_BIT_COUNT, optimalBitCount)
+        self.count = 0
+        self._bits = bytearray((self.bitCount + 7) // 8)
+
+    # Double hashing: k bit positions from two 64 bit halves of one digest
+    def _positions(self, data):
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        (first, second) = struct.unpack("<QQ", digest)
+        second |= 1
+        return [(first + i * second) % self.bitCount for i in range(0, self.hashCount)]
+
+    def __contains__(self, data):
+        for position in self._positions(data):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    # Adds data, returns False if it (probably) was already present
+    def add(self, data):
+        isNew = False
+        for position in self._positions(data):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                isNew = True
+        if isNew:
+            self.count += 1
+        return isNew
+
+    def write(self, outputFile):
+        outputFile.write(self.HEADER.pack(self.MAGIC, self.capacity, self.bitCount, self.hashCount, self.count))
+        outputFile.write(self._bits)
+
+    # Reads a filter written by write(), None at the end of the file
+    @classmethod
+    def read(cls, inputFile, filePath):
+        header = inputFile.read(cls.HEADER.size)
+        if not header:
+            return None
+        if len(header) != cls.HEADER.size:
+            raise RuntimeError("%s is truncated" % (filePath))
+        (magic, capacity, bitCount, hashCount, count) = cls.HEADER.unpack(header)
+        if magic != cls.MAGIC:
+            raise RuntimeError("%s is not a Mutiny dedup file" % (filePath))
+        bloomFilter = cls.__new__(cls)
+        bloomFilter.capacity = capacity
+        bloomFilter.bitCount = bitCount
+        bloomFilter.hashCount = hashCount
+        bloomFilter.count = count
+        bloomFilter._bits = bytearray(inputFile.read((bitCount + 7) // 8))
+        if len(bloomFilter._bits) != (bitCount + 7) // 8:
+            raise RuntimeError("%s is truncated" % (filePath))
+        return bloomFilter
+
+# A Bloom filter can't be resized once items are in, so a session that
+# expects more items than are left in the current filter chains on a
+# new one sized for them.  An item is present if any filter has it
+class BloomFilterChain(object):
+    def __init__(self, capacity, errorRate=0.0001):
+        self.errorRate = errorRate
+        self.filters = [BloomFilter(capacity, errorRate)]
+
+    @property
+    def count(self):
+        return sum([bloomFilter.count for bloomFilter in self.filters])
+
+    # Makes room for capacity more items, returns True if a filter had
+    # to be added for them
+    def reserve(self, capacity):
+        last = self.filters[-1]
+        if last.capacity - last.count >= capacity:
+            return False
+        self.filters.append(BloomFilter(capacity, self.errorRate))
+        return True
+
+    def __contains__(self, data):
+        for bloomFilter in self.filters:
+            if data in bloomFilter:
+                return True
+        return False
+
+    # Adds data, returns False if it (probably) was already present
+    def add(self, data):
+        if data in self:
+            return False
+        return self.filters[-1].add(data)
+
+    def save(self, filePath):
+        # Write then rename so a crash mid-save can't eat the old state
+        tempPath = filePath + ".tmp"
+        with open(tempPath, "wb") as outputFile:
+            for bloomFilter in self.filters:
+                bloomFilter.write(outputFile)
+        os.replace(tempPath, filePath)
+
+    @classmethod
+    def load(cls, filePath, errorRate=0.0001):
+        chain = cls.__new__(cls)
+        chain.errorRate = errorRate
+        chain.filters = []
+        with open(filePath, "rb") as inputFile:
+            while True:
+                bloomFilter = BloomFilter.read(inputFile, filePath)
+                if bloomFilter is None:
+                    break
+                chain.filters.append(bloomFilter)
+        if not chain.filters:
+            raise RuntimeError("%s is not a Mutiny dedup file" % (filePath))
+        return chain
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Keeps a tcp/tls connection open across cases (casesPerConnection)
+#
+# The first case on a connection goes through the whole conversation.
+# Later ones send the reset messages and then only the messages from
+# the first fuzzed one on (RunPlan.reuseMessages).  Since a case that
+# gets no response can't be told apart from one that quietly broke
+# the target, cases are remembered until the target answers one so a
+# crash can be blamed on all of them
+#
+#------------------------------------------------------------------
+
+class ConnectionReuse(object):
+    # casesPerConnection - most cases to run on one connection
+    def __init__(self, casesPerConnection, stats=None):
+        self.casesPerConnection = casesPerConnection
+        self.stats = stats
+        # (connection, addr, receiver), None when there's nothing open to reuse
+        self._connection = None
+        self._casesOnConnection = 0
+        # (runNumber, runRecord) of the cases sent since the last response
+        self._unconfirmedRuns = []
+
+    # Returns (connection, addr, receiver) for the next case, or None if it
+    # should open a new connection
+    def take(self):
+        if self._connection is None:
+            return None
+        if self._casesOnConnection >= self.casesPerConnection:
+            self.close()
+            return None
+        self._casesOnConnection += 1
+        if self.stats:
+            self.stats.increment("Cases on a reused connection")
+        return self._connection
+
+    # Keep a new connection open after its first case
+    # receiver - the connection's StreamReceiver, which may hold data
+    #   read past the last frame, or None
+    def keep(self, connection, addr, receiver):
+        self.close()
+        self._connection = (connection, addr, receiver)
+        self._casesOnConnection = 1
+
+    def close(self):
+        if self._connection is not None:
+            self._connection[0].close()
+            self._connection = None
+
+    # The target answered, so it was still fine after every case so far
+    def responseReceived(self):
+        self._unconfirmedRuns = []
+
+    # gotResponse - whether the target answered after the case's last
+    #   outbound message
+    def caseFinished(self, runNumber, runRecord, gotResponse):
+        if not gotResponse:
+            self._unconfirmedRuns.append((runNumber, runRecord))
+
+    # Returns and forgets the (runNumber, runRecord) of every case sent
+    # since the target last answered
+    def takeUnconfirmedRuns(self):
+        unconfirmedRuns = self._unconfirmedRuns
+        self._unconfirmedRuns = []
+        return unconfirmedRuns
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Crashes reported by monitors, and the runs they're blamed on
+#
+# Monitors push a CrashEvent onto MonitorWrapper's queue from their own
+# thread, stamped with when it happened.  The engine checks the queue
+# between messages (checkCrashEvents() raises CrashEventsPending to end
+# the run there) and hands each event to RunTimeline, which has the
+# send and receive times of the last few runs.  A crash is blamed on
+# every run that sent something the target hadn't answered yet by the
+# time of the crash, or if it had answered all of them, on the last
+# run to send something before it
+#
+#------------------------------------------------------------------
+
+import collections
+import signal
+import time
+
+# Runs to remember, enough to cover a slow monitor at a high case rate
+TIMELINE_RUNS = 64
+LOG_EXCERPT_LENGTH = 500
+
+# Raised at a check point when there are crash events to deal with
+class CrashEventsPending(Exception):
+    pass
+
+class CrashEvent(object):
+    # message - what the monitor saw, e.g. exit status
+    # timestamp - time.time() of the crash, if the monitor knows better
+    #   than when it got round to reporting it (e.g. a core file's mtime)
+    # signal - number of the signal the target died on
+    # corePath - where the target dumped core
+    # logExcerpt - the target's last words, e.g. the end of its log
+    def __init__(self, message=None, timestamp=None, signal=None, corePath=None, logExcerpt=None):
+        self.message = message
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.signal = signal
+        self.corePath = corePath
+        self.logExcerpt = logExcerpt
+
+    def describe(self):
+        description = "Crash event detected"
+        if self.message:
+            description += ": %s" % (self.message)
+        details = []
+        if self.signal is not None:
+            try:
+                details.append("signal %s" % (signal.Signals(self.signal).name))
+            except ValueError:
+                details.append("signal %d" % (self.signal))
+        if self.corePath:
+            details.append("core dumped to %s" % (self.corePath))
+        if self.logExcerpt:
+            details.append("log: %s" % (self.logExcerpt[-LOG_EXCERPT_LENGTH:]))
+        if details:
+            description += " (%s)" % (", ".join(details))
+        return description
+
+# The runs a crash could have come from, see findRuns()
+class RunTimeline(object):
+    def __init__(self, maxRuns=TIMELINE_RUNS):
+        # (runNumber, seed, runRecord), oldest first
+        self._runs = collections.deque(maxlen=maxRuns)
+
+    # Call as each run (or retry) starts, runRecord's sendTimes and
+    # receiveTimes are read when a crash comes in
+    def add(self, runNumber, seed, runRecord):
+        self._runs.append((runNumber, seed, runRecord))
+
+    # Returns the (runNumber, seed, runRecord) of the runs to blame for a
+    # crash at timestamp, oldest first.  Empty if nothing had been sent
+    def findRuns(self, timestamp):
+        sentRuns = []
+        answerTimes = []
+        for run in self._runs:
+            runRecord = run[2]
+            if runRecord.sendTimes and runRecord.sendTimes[0] <= timestamp:
+                sentRuns.append(run)
+            answerTimes.extend([t for t in runRecord.receiveTimes if t <= timestamp])
+        if not sentRuns:
+            return []
+        lastSendTimes = [max([t for t in run[2].sendTimes if t <= timestamp]) for run in sentRuns]
+        lastAnswerTime = max(answerTimes) if answerTimes else 0
+        # Runs the target hadn't answered since their last send
+        suspects = [run for (run, lastSendTime) in zip(sentRuns, lastSendTimes) if lastSendTime >= lastAnswerTime]
+        if not suspects:
+            suspects = [sentRuns[lastSendTimes.index(max(lastSendTimes))]]
+        # A retried run is only blamed once
+        runs = collections.OrderedDict()
+        for run in suspects:
+            runs[run[0]] = run
+        return list(runs.values())
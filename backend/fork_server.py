@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# --forkServer: runs a local target under backend/fork_server_stub.py,
+# which loads it once and forks a fresh copy per test case, instead of
+# talking to it over the network
+#
+# Both a transport and a monitor.  connect() hands back Mutiny's end
+# of a socketpair whose other end goes to a copy of the target, and
+# finishCase() returns the copy's verdict, a crash being a copy killed
+# by a signal, raising from a Python handler, or hanging.  As a monitor
+# (see ProcDirector.MonitorWrapper.addMonitor()) it reports the stub
+# itself dying
+#
+#------------------------------------------------------------------
+
+import os
+import select
+import shlex
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+from mutiny_classes.mutiny_exceptions import HaltException
+from backend.fork_server_stub import VERDICT_OK, VERDICT_SIGNALED, VERDICT_EXITED, VERDICT_EXEC_FAILED, VERDICT_FORMAT, isPythonTarget
+
+STUB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fork_server_stub.py")
+
+class ForkServer(object):
+    # target - "file.py:function" or a native command line, see fork_server_stub.py
+    # casesPerChild - cases each forked copy handles before a fresh one
+    # hangTimeout - longest a case can take after Mutiny's done with it
+    def __init__(self, target, casesPerChild=1, hangTimeout=5, stats=None):
+        self.target = target
+        self.casesPerChild = casesPerChild
+        self.hangTimeout = hangTimeout
+        self.stats = stats
+        self.process = None
+        self.control = None
+        self._stopping = False
+
+    # Starts the stub and waits for it to load the target
+    def start(self):
+        if not isPythonTarget(self.target):
+            command = shlex.split(self.target)
+            if not command or shutil.which(command[0]) is None:
+                raise RuntimeError("Can't find %s to run as the target" % (command[0] if command else "a command"))
+        (self.control, stubControl) = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.process = subprocess.Popen([sys.executable, STUB_PATH, str(stubControl.fileno()), self.target,
+                                         str(self.casesPerChild), str(self.hangTimeout)],
+                                        pass_fds=[stubControl.fileno()], stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL, start_new_session=True)
+        stubControl.close()
+        if self.control.recv(1) != b"R":
+            raise RuntimeError("Fork server stub exited with status %s while loading %s" % (self.process.wait(), self.target))
+
+    # Returns the connection for one case
+    def connect(self):
+        (connection, targetEnd) = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            socket.send_fds(self.control, [b"C"], [targetEnd.fileno()])
+        finally:
+            targetEnd.close()
+        return connection
+
+    # Closes the case's connection and returns how it went, None if the
+    # target survived, otherwise a description of the crash.  The stub
+    # starts the hang timeout when it's told the connection is closed
+    def finishCase(self, connection):
+        connection.close()
+        try:
+            self.control.send(b"F")
+        except OSError:
+            raise RuntimeError("Fork server stub stopped answering")
+        (readable, writable, errored) = select.select([self.control], [], [], self.hangTimeout + 1)
+        verdict = self.control.recv(struct.calcsize(VERDICT_FORMAT)) if readable else b""
+        if len(verdict) != struct.calcsize(VERDICT_FORMAT):
+            raise RuntimeError("Fork server stub stopped answering")
+        (kind, status) = struct.unpack(VERDICT_FORMAT, verdict)
+        if kind == VERDICT_OK:
+            return None
+        if kind == VERDICT_EXEC_FAILED:
+            # Every case would fail the same way, none of them tested anything
+            raise HaltException("Fork server couldn't run %s" % (self.target))
+        if self.stats:
+            self.stats.increment("Forked targets crashed")
+        if kind == VERDICT_SIGNALED:
+            try:
+                return "Target killed by %s" % (signal.Signals(status).name)
+            except ValueError:
+                return "Target killed by signal %d" % (status)
+        if kind == VERDICT_EXITED:
+            return "Target raised an exception (exit status %d)" % (status)
+        return "Target hung for over %g seconds" % (self.hangTimeout)
+
+    # Same signature as Monitor.monitorTarget()
+    def monitorTarget(self, targetIP, targetPort, signalMain):
+        returnCode = self.process.wait()
+        if not self._stopping:
+            signalMain("Fork server stub exited with status %d" % (returnCode))
+
+    def stop(self):
+        self._stopping = True
+        if self.control:
+            # The stub kills its copy and exits when this closes
+            self.control.close()
+        if self.process:
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
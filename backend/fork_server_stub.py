@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The process side of --forkServer, started by backend/fork_server.py
+#
+# Loads the target once, then forks a fresh copy of itself for every
+# test case (or every --forkServerCases cases), handing the copy one
+# end of the socketpair Mutiny talks to.  A Python target is a file
+# and a function taking the connected socket, "server.py:handler",
+# imported before the first fork so its start-up is only paid once.
+# Anything else is a native command, run per case with the socket as
+# stdin and stdout, inetd style
+#
+# Mutiny sends each case's socket over the control socket (fd passed
+# as the first argument), then a finish byte once it's done talking
+# and has closed its end, and gets back one verdict per case.  The hang
+# timeout only starts at the finish byte, so a long conversation isn't
+# mistaken for a hang
+#
+#------------------------------------------------------------------
+
+import importlib.util
+import os
+import select
+import shlex
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+# Verdicts sent back to Mutiny, with a status
+VERDICT_OK = 0
+# Status is the signal that killed the copy
+VERDICT_SIGNALED = 1
+# Status is the copy's exit status
+VERDICT_EXITED = 2
+# The case didn't finish within the hang timeout, the copy was killed
+VERDICT_HUNG = 3
+# The native command couldn't be run at all
+VERDICT_EXEC_FAILED = 4
+VERDICT_FORMAT = "!Bi"
+
+# Exit status of a Python copy when the handler raised
+EXIT_EXCEPTION = 70
+# Exit status of a native copy when exec failed, as the shell uses
+EXIT_EXEC_FAILED = 127
+
+# Whether target is a Python "file.py:function" rather than a native command
+def isPythonTarget(target):
+    return ":" in target and target.rsplit(":", 1)[0].endswith(".py")
+
+# Imports "file.py:function" and returns the function
+def loadHandler(target, moduleName="forkserver_target"):
+    (path, functionName) = target.rsplit(":", 1)
+    spec = importlib.util.spec_from_file_location(moduleName, path)
+    module = importlib.util.module_from_spec(spec)
+    # Let the target import its neighbours
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    spec.loader.exec_module(module)
+    return getattr(module, functionName)
+
+# Python copy: handle cases sent down channel until there have been
+# casesPerChild of them or the stub hangs up
+def runChild(handler, channel, casesPerChild):
+    for n in range(0, casesPerChild):
+        (data, fds, flags, address) = socket.recv_fds(channel, 1, 1)
+        if not fds:
+            break
+        connection = socket.socket(fileno=fds[0])
+        try:
+            handler(connection)
+        except SystemExit:
+            pass
+        except Exception:
+            traceback.print_exc()
+            os._exit(EXIT_EXCEPTION)
+        connection.close()
+        channel.send(b"D")
+    os._exit(0)
+
+class Stub(object):
+    def __init__(self, control, target, casesPerChild, hangTimeout):
+        self.control = control
+        self.casesPerChild = casesPerChild
+        self.hangTimeout = hangTimeout
+        self.handler = None
+        self.command = None
+        if isPythonTarget(target):
+            self.handler = loadHandler(target)
+        else:
+            self.command = shlex.split(target)
+            self.casesPerChild = 1
+        self.childPid = None
+        self.channel = None
+        self.childCases = 0
+
+    def serve(self):
+        self.control.send(b"R")
+        while True:
+            (data, fds, flags, address) = socket.recv_fds(self.control, 1, 1)
+            if not data:
+                # Mutiny's gone
+                self._killChild()
+                return
+            self._startCase(fds[0])
+            if self.control.recv(1) != b"F":
+                # Mutiny's gone mid case
+                self._killChild()
+                return
+            verdict = self._finishCase()
+            self.control.send(struct.pack(VERDICT_FORMAT, *verdict))
+
+    # Hands the case's socket to a copy of the target
+    def _startCase(self, fd):
+        if self.command:
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    os.dup2(fd, 0)
+                    os.dup2(fd, 1)
+                    os.execvp(self.command[0], self.command)
+                except OSError as e:
+                    sys.stderr.write("Unable to run %s: %s\n" % (self.command[0], str(e)))
+                os._exit(EXIT_EXEC_FAILED)
+            os.close(fd)
+            self.childPid = pid
+            return
+
+        if self.childPid is None:
+            (self.channel, childChannel) = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+            pid = os.fork()
+            if pid == 0:
+                self.control.close()
+                self.channel.close()
+                runChild(self.handler, childChannel, self.casesPerChild)
+            childChannel.close()
+            self.childPid = pid
+            self.childCases = 0
+        socket.send_fds(self.channel, [b"C"], [fd])
+        os.close(fd)
+        self.childCases += 1
+
+    # Mutiny has closed its end, gives the copy hangTimeout to finish
+    # the case and returns the verdict
+    def _finishCase(self):
+        if self.command:
+            return self._waitForExit(self.hangTimeout)
+
+        (readable, writable, errored) = select.select([self.channel], [], [], self.hangTimeout)
+        if not readable:
+            self._killChild()
+            return (VERDICT_HUNG, 0)
+        if self.channel.recv(1) != b"D":
+            # Died before finishing the case
+            return self._waitForExit(None)
+        if self.childCases >= self.casesPerChild:
+            # The copy exits on its own after its last case
+            return self._waitForExit(None)
+        return (VERDICT_OK, 0)
+
+    def _waitForExit(self, timeout):
+        if timeout is not None:
+            # Native commands: wait out the hang timeout without blocking forever
+            deadline = os.times().elapsed + timeout
+            while True:
+                (pid, status) = os.waitpid(self.childPid, os.WNOHANG)
+                if pid:
+                    break
+                if os.times().elapsed > deadline:
+                    self._killChild()
+                    return (VERDICT_HUNG, 0)
+                select.select([], [], [], 0.001)
+        else:
+            (pid, status) = os.waitpid(self.childPid, 0)
+        self.childPid = None
+        if self.channel:
+            self.channel.close()
+            self.channel = None
+        if os.WIFSIGNALED(status):
+            return (VERDICT_SIGNALED, os.WTERMSIG(status))
+        exitStatus = os.WEXITSTATUS(status)
+        if exitStatus == EXIT_EXEC_FAILED and self.command:
+            return (VERDICT_EXEC_FAILED, exitStatus)
+        if exitStatus == EXIT_EXCEPTION and self.handler:
+            return (VERDICT_EXITED, exitStatus)
+        return (VERDICT_OK, exitStatus)
+
+    def _killChild(self):
+        if self.childPid is None:
+            return
+        try:
+            os.kill(self.childPid, signal.SIGKILL)
+            os.waitpid(self.childPid, 0)
+        except OSError:
+            pass
+        self.childPid = None
+        if self.channel:
+            self.channel.close()
+            self.channel = None
+
+# fork_server_stub.py <control fd> <target> <cases per child> <hang timeout>
+if __name__ == "__main__":
+    control = socket.socket(fileno=int(sys.argv[1]))
+    stub = Stub(control, sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    stub.serve()
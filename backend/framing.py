@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Framing for inbound messages, declared in the .fuzzer file with a
+# frame= argument on the inbound line:
+#
+#   inbound frame=recorded 'OK\n'              same length as recorded
+#   inbound frame=length:12 ...                exactly 12 bytes
+#   inbound frame=delimiter:\r\n\r\n ...       up to and including \r\n\r\n
+#   inbound frame=prefix:2:2:big:4 ...         2 byte big endian length at
+#                                              offset 2, plus 4 more bytes
+#
+# Delimiters use the same escapes as message data, spaces as \x20.
+# With a frame, a stream receive returns as soon as the frame is in
+# rather than waiting for receiveTimeout.  The buffer only grows as
+# data actually arrives, and a frame that would be over MAX_FRAME_SIZE
+# (a fuzzed length field, a delimiter that never comes) aborts the run
+#
+#------------------------------------------------------------------
+
+import ast
+import socket
+import time
+from mutiny_classes.mutiny_exceptions import AbortCurrentRunException, ConnectionClosedException
+
+# Largest frame a receive will buffer
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Most the buffer grows by per read
+READ_CHUNK = 64 * 1024
+
+# Data a message's frame is known to need, or how to find where it ends.
+# The base class never knows, so a receive returns whatever came in
+# before the timeout, same as an unframed message
+class Frame(object):
+    # Returns the length of the frame at the start of buffer[:length],
+    # or None if more data is needed to tell
+    def getFrameLength(self, buffer, length):
+        return None
+
+# Raises AbortCurrentRunException if a frame is, or has to be, longer
+# than maxFrameSize.  length is how much has been received so far
+def checkFrameSize(frameLength, length, maxFrameSize):
+    if frameLength is not None and frameLength > maxFrameSize:
+        raise AbortCurrentRunException("Frame of %d bytes is over the %d byte limit" % (frameLength, maxFrameSize))
+    if frameLength is None and length >= maxFrameSize:
+        raise AbortCurrentRunException("No frame end in the first %d bytes received" % (length))
+
+class LengthFrame(Frame):
+    def __init__(self, frameLength):
+        self.frameLength = frameLength
+
+    def getFrameLength(self, buffer, length):
+        return self.frameLength
+
+class DelimiterFrame(Frame):
+    def __init__(self, delimiter):
+        if not delimiter:
+            raise RuntimeError("Frame delimiter can't be empty")
+        self.delimiter = delimiter
+
+    def getFrameLength(self, buffer, length):
+        end = buffer.find(self.delimiter, 0, length)
+        if end == -1:
+            return None
+        return end + len(self.delimiter)
+
+class PrefixFrame(Frame):
+    # adjust - added to the length field's value, for fields that count
+    #   a trailer, or (negative) the header itself
+    def __init__(self, offset, size, byteorder="big", adjust=0):
+        if byteorder not in ["big", "little"]:
+            raise RuntimeError("Frame length field byte order must be big or little")
+        self.offset = offset
+        self.size = size
+        self.byteorder = byteorder
+        self.adjust = adjust
+
+    def getFrameLength(self, buffer, length):
+        headerLength = self.offset + self.size
+        if length < headerLength:
+            return None
+        value = int.from_bytes(bytes(buffer[self.offset:headerLength]), self.byteorder)
+        return max(headerLength, headerLength + value + self.adjust)
+
+# Builds a Frame from a frame= argument, recordedLength is the length
+# of the message in the .fuzzer file
+def parseFrame(spec, recordedLength):
+    (kind, sep, value) = spec.partition(":")
+    try:
+        if kind == "recorded":
+            return LengthFrame(recordedLength)
+        elif kind == "length":
+            return LengthFrame(int(value))
+        elif kind == "delimiter":
+            return DelimiterFrame(ast.literal_eval("b'%s'" % (value.replace("'", "\\'"))))
+        elif kind == "prefix":
+            fields = value.split(":")
+            byteorder = fields[2] if len(fields) > 2 else "big"
+            adjust = int(fields[3]) if len(fields) > 3 else 0
+            return PrefixFrame(int(fields[0]), int(fields[1]), byteorder, adjust)
+    except (ValueError, IndexError, SyntaxError) as e:
+        raise RuntimeError("Invalid frame %s: %s" % (spec, str(e)))
+    raise RuntimeError("Unknown frame %s, expected recorded, length, delimiter or prefix" % (spec))
+
+# Receives framed messages from a stream socket into one reused buffer.
+# Anything read past the end of a frame is kept for the next message
+class StreamReceiver(object):
+    def __init__(self, connection, bufferSize=4096, maxFrameSize=MAX_FRAME_SIZE):
+        self.connection = connection
+        self.maxFrameSize = maxFrameSize
+        self._buffer = bytearray(bufferSize)
+        # Bytes at the start of _buffer that haven't been returned yet
+        self._length = 0
+
+    def hasPending(self):
+        return self._length > 0
+
+    # Returns whatever was read past the last frame
+    def takePending(self):
+        return self._consume(self._length)
+
+    def _consume(self, frameLength):
+        data = self._buffer[:frameLength]
+        remaining = self._length - frameLength
+        self._buffer[:remaining] = self._buffer[frameLength:self._length]
+        self._length = remaining
+        return data
+
+    # Returns the next frame, once it's complete or timeout seconds pass.
+    # On timeout or the server closing the connection, returns what was
+    # received so far, or raises if that's nothing
+    def receive(self, frame, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            frameLength = frame.getFrameLength(self._buffer, self._length)
+            if frameLength is not None and frameLength <= self._length:
+                return self._consume(frameLength)
+            checkFrameSize(frameLength, self._length, self.maxFrameSize)
+
+            if frameLength is not None:
+                # Don't read into the next message if we know where this one ends
+                wanted = min(frameLength - self._length, READ_CHUNK)
+            else:
+                wanted = len(self._buffer) - self._length
+                if wanted == 0:
+                    wanted = min(len(self._buffer), READ_CHUNK)
+            if self._length + wanted > len(self._buffer):
+                # Grow by a chunk at most, the length may be made up
+                self._buffer += bytearray(max(self._length + wanted - len(self._buffer), min(len(self._buffer), READ_CHUNK)))
+
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+                self.connection.settimeout(remaining)
+                received = self.connection.recv_into(memoryview(self._buffer)[self._length:], wanted)
+            except socket.timeout:
+                if self._length == 0:
+                    raise
+                return self.takePending()
+            if received == 0:
+                if self._length == 0:
+                    raise ConnectionClosedException("Server has closed the connection")
+                return self.takePending()
+            self._length += received
@@ -35,6 +35,7 @@
 # the fuzzer, and utility functions used by them.
 #------------------------------------------------------------------
 import ast
+from backend.framing import parseFrame
 
 class MessageSubComponent(object):
     def __init__(self, message, isFuzzed):
@@ -75,6 +76,12 @@ class Message(object):
         # Then 11,22,33 will be subcomponent 0, 44,55,66 will be subcomponent 1
         # If it's a traditional message, it will only have one element (entire message)
         self.subcomponents = []
+        # frame= argument of an inbound message, how to tell where it ends
+        # (see backend/framing.py), None to just read what's there
+        self.frame = None
+        # Only sent between cases that share a connection, to get the
+        # target ready for the next one (see casesPerConnection)
+        self.isReset = False
 
     def getOriginalSubcomponents(self):
         return [subcomponent.message for subcomponent in self.subcomponents]
@@ -158,14 +165,18 @@ class Message(object):
     def deserializeByteArray(cls, string):
         return bytearray(ast.literal_eval(f'b{string}'))
     
-    def getAlteredSerialized(self):
+    # alteredSubcomponents - byte arrays to serialize in place of the
+    #   subcomponents' altered ones, such as a RunRecord's
+    def getAlteredSerialized(self, alteredSubcomponents=None):
+        if alteredSubcomponents is None:
+            alteredSubcomponents = self.getAlteredSubcomponents()
         if len(self.subcomponents) < 1:
             return "{0} {1}\n".format(self.direction, "ERROR: No data in message.")
         else:
-            serializedMessage = "{0}{1} {2}\n".format("fuzz " if self.subcomponents[0].isFuzzed else "", self.direction, self.serializeByteArray(self.subcomponents[0].getAlteredByteArray()))
+            serializedMessage = "{0}{1} {2}\n".format("fuzz " if self.subcomponents[0].isFuzzed else "", self.direction, self.serializeByteArray(bytearray(alteredSubcomponents[0])))
             
-            for subcomponent in self.subcomponents[1:]:
-                serializedMessage += "sub {0}{1}\n".format("fuzz " if subcomponent.isFuzzed else "", self.serializeByteArray(subcomponent.getAlteredByteArray()))
+            for j in range(1, len(self.subcomponents)):
+                serializedMessage += "sub {0}{1}\n".format("fuzz " if self.subcomponents[j].isFuzzed else "", self.serializeByteArray(bytearray(alteredSubcomponents[j])))
             
             return serializedMessage
     
@@ -173,7 +184,7 @@ class Message(object):
         if len(self.subcomponents) < 1:
             return "{0} {1}\n".format(self.direction, "ERROR: No data in message.")
         else:
-            serializedMessage = "{0} {1}{2}\n".format(self.direction, "fuzz " if self.subcomponents[0].isFuzzed else "", self.serializeByteArray(self.subcomponents[0].message))
+            serializedMessage = "{0} {1}{2}{3}{4}\n".format(self.direction, "reset " if self.isReset else "", "frame={0} ".format(self.frame) if self.frame else "", "fuzz " if self.subcomponents[0].isFuzzed else "", self.serializeByteArray(self.subcomponents[0].message))
             
             for subcomponent in self.subcomponents[1:]:
                 serializedMessage += "sub {0}{1}\n".format("fuzz " if subcomponent.isFuzzed else "", self.serializeByteArray(subcomponent.message))
@@ -237,8 +248,21 @@ class Message(object):
             if len(serializedData) < 3:
                 raise RuntimeError("Invalid message data")
         
+        isReset = "reset" in args
+        if isReset and isFuzzed:
+            raise RuntimeError("Invalid message data, reset messages can't be fuzzed")
+        
+        frames = [arg[len("frame="):] for arg in args if arg.startswith("frame=")]
+        if frames and direction != "inbound":
+            raise RuntimeError("Invalid message data, only inbound messages can have a frame")
+        
         self.direction = direction
         self.setMessageFrom(self.Format.Ascii, messageData, isFuzzed)
+        self.isReset = isReset
+        if frames:
+            # Check the syntax now rather than when fuzzing starts
+            parseFrame(frames[0], len(self.getOriginalMessage()))
+            self.frame = frames[0]
     
     # Add another line, used for multiline messages
     def appendFromSerialized(self, serializedData, createNewSubcomponent=True):
@@ -260,6 +284,8 @@ class Message(object):
         isFuzzed = False
         if "fuzz" in args:
             isFuzzed = True
+            if self.isReset:
+                raise RuntimeError("Invalid message data, reset messages can't be fuzzed")
         
         self.appendMessageFrom(self.Format.Ascii, messageData, isFuzzed, createNewSubcomponent=createNewSubcomponent)
 
@@ -287,7 +313,25 @@ class MessageCollection(object):
 
 import os
 import os.path
-from copy import deepcopy
+
+# What happened on one run: the data actually sent and received.
+# Holds references to the run's byte arrays rather than copies, and
+# is replaced rather than cleared when the next run starts
+class RunRecord(object):
+    def __init__(self):
+        # Message number => list of subcomponents as they were sent
+        self.alteredSubcomponents = {}
+        # Message number => data received
+        self.receivedMessageData = {}
+        # The highest message # this fuzz session made it to
+        self.highestMessageNumber = -1
+        # time.time() of each send and receive, for blaming crashes
+        # the monitor reports, see backend/crash_events.py
+        self.sendTimes = []
+        self.receiveTimes = []
+        # Whether a fuzzed message has gone out yet, timeouts after one
+        # say nothing about the target's usual latency
+        self.sentFuzzed = False
 
 # Handles all the logging of the fuzzing session
 # Log messages can be found at sample_apps/<app>/<app>_logs/<date>/
@@ -304,25 +348,33 @@ class Logger(object):
                 print("Unable to create logging directory: %s" % (folderPath))
                 exit()
 
+        self.runRecord = RunRecord()
         self.resetForNewRun()
 
     # Store just the data, forget trying to make a Message object
     # With the subcomponents and everything, it just gets weird, 
     # and we don't need it
     def setReceivedMessageData(self, messageNumber, data):
-        self.receivedMessageData[messageNumber] = data
+        self.runRecord.receivedMessageData[messageNumber] = data
 
     def setHighestMessageNumber(self, messageNumber):
         # The highest message # this fuzz session made it to
-        self._highestMessageNumber = messageNumber
+        self.runRecord.highestMessageNumber = messageNumber
 
     def outputLastLog(self, runNumber, messageCollection, errorMessage):
-        return self._outputLog(runNumber, messageCollection, errorMessage, self._lastReceivedMessageData, self._lastHighestMessageNumber)
+        return self._outputLog(runNumber, messageCollection, errorMessage, self._lastRunRecord)
 
     def outputLog(self, runNumber, messageCollection, errorMessage):
-        return self._outputLog(runNumber, messageCollection, errorMessage, self.receivedMessageData, self._highestMessageNumber)
+        return self._outputLog(runNumber, messageCollection, errorMessage, self.runRecord)
+
+    # For callers that keep each run's RunRecord themselves, such as
+    # the --concurrency engine, which has several runs in flight at once
+    def outputRunLog(self, runNumber, messageCollection, errorMessage, runRecord):
+        return self._outputLog(runNumber, messageCollection, errorMessage, runRecord)
 
-    def _outputLog(self, runNumber, messageCollection, errorMessage, receivedMessageData, highestMessageNumber):
+    def _outputLog(self, runNumber, messageCollection, errorMessage, runRecord):
+        receivedMessageData = runRecord.receivedMessageData
+        highestMessageNumber = runRecord.highestMessageNumber
         with open(os.path.join(self._folderPath, str(runNumber)), "w") as outputFile:
             print("Logging run number %d" % (runNumber))
             outputFile.write("Log from run with seed %d\n" % (runNumber))
@@ -337,8 +389,8 @@ class Logger(object):
             for message in messageCollection.messages:
                 outputFile.write("Packet %d: %s" % (i, message.getSerialized()))
 
-                if message.isFuzzed:
-                    outputFile.write("Fuzzed Packet %d: %s\n" % (i, message.getAlteredSerialized()))
+                if message.isFuzzed and i in runRecord.alteredSubcomponents:
+                    outputFile.write("Fuzzed Packet %d: %s\n" % (i, message.getAlteredSerialized(runRecord.alteredSubcomponents[i])))
                 
                 if i in receivedMessageData:
                     # Compare what was actually sent to what we expected, log if they differ
@@ -356,13 +408,9 @@ class Logger(object):
                 outputFile.write("\n")
                 i += 1
 
+    # Starts a new RunRecord, keeping the current one as the last run
+    # Returns the new RunRecord
     def resetForNewRun(self):
-        try:
-            self._lastReceivedMessageData = deepcopy(self.receivedMessageData)
-            self._lastHighestMessageNumber = self._highestMessageNumber
-        except AttributeError:
-            self._lastReceivedMessageData = {}
-            self._lastHighestMessageNumber = -1
-
-        self.receivedMessageData = {}
-        self.setHighestMessageNumber(-1)
+        self._lastRunRecord = self.runRecord
+        self.runRecord = RunRecord()
+        return self.runRecord
@@ -37,6 +37,7 @@
 
 from backend.fuzzer_types import MessageCollection, Message
 from backend.menu_functions import validateNumberRange
+import ipaddress
 import os.path
 import sys
 
@@ -51,20 +52,30 @@ class FuzzerData(object):
         self.processorDirectory = "default"
         # Number of times a test case causing a crash should be repeated
         self.failureThreshold = 3
-        # How long to wait between retests
+        # Longest to wait for the target to come back before a retest
         self.failureTimeout = 5
+        # Bytes to send to check the target is up after a crash, any
+        # reply means it's ready.  Empty = a connect is enough (tcp, tls)
+        self.healthProbe = bytearray()
         # Protocol (TCP, UDP)
         self.proto = "tcp"
         # Port to use
         self.port = 0
         # Source port to use, -1 = auto
+        # Or a range/list string like "40000-40999" to rotate through
         self.sourcePort = -1
         # Source IP to use, 0.0.0.0 or "" is default/automatic
+        # Or a comma separated list of IPs and CIDR blocks to rotate through
         self.sourceIP = "0.0.0.0"
         # Whether to perform a test run
         self.shouldPerformTestRun = True
         # How long to time out on receive() (seconds)
         self.receiveTimeout = 1.0
+        # Mutation engine (radamsa, libradamsa, native)
+        self.mutator = "radamsa"
+        # Most cases to run on one connection before opening a new one,
+        # 1 = new connection for every case (tcp and tls)
+        self.casesPerConnection = 1
         # Dictionary to save comments made to a .fuzzer file.  Only really does anything if 
         # using readFromFile and then writeToFile in the same program
         # (For example, fuzzerconverter)
@@ -136,6 +147,9 @@ class FuzzerData(object):
                     elif args[0] == "failureTimeout":
                         self.failureTimeout = int(args[1])
                         self._pushComments("failureTimeout")
+                    elif args[0] == "healthProbe":
+                        self.healthProbe = Message.deserializeByteArray(line.split(" ", 1)[1])
+                        self._pushComments("healthProbe")
                     elif args[0] == "proto":
                         self.proto = args[1]
                         self._pushComments("proto")
@@ -143,10 +157,16 @@ class FuzzerData(object):
                         self.port = int(args[1])
                         self._pushComments("port")
                     elif args[0] == "sourcePort":
-                        self.sourcePort = int(args[1])
+                        try:
+                            self.sourcePort = int(args[1])
+                        except ValueError:
+                            self.sourcePort = args[1]
+                        # Check ranges now rather than when fuzzing starts
+                        self.getSourcePorts()
                         self._pushComments("sourcePort")
                     elif args[0] == "sourceIP":
                         self.sourceIP = args[1]
+                        self.getSourceIPs()
                         self._pushComments("sourceIP")
                     elif args[0] == "shouldPerformTestRun":
                         # Use 0 or 1 for setting
@@ -160,6 +180,14 @@ class FuzzerData(object):
                     elif args[0] == "receiveTimeout":
                         self.receiveTimeout = float(args[1])
                         self._pushComments("receiveTimeout")
+                    elif args[0] == "mutator":
+                        self.mutator = args[1]
+                        self._pushComments("mutator")
+                    elif args[0] == "casesPerConnection":
+                        self.casesPerConnection = int(args[1])
+                        if self.casesPerConnection < 1:
+                            raise RuntimeError("casesPerConnection must be at least 1")
+                        self._pushComments("casesPerConnection")
                     elif args[0] == "messagesToFuzz":
                         print("WARNING: It looks like you're using a legacy .fuzzer file with messagesToFuzz set.  This is now deprecated, so please update to the new format")
                         self.messagesToFuzz = validateNumberRange(args[1], flattenList=True)
@@ -217,6 +245,29 @@ class FuzzerData(object):
         else:
             return ""
 
+    # Returns the list of source ports to use, [] to let the OS pick
+    def getSourcePorts(self):
+        if self.sourcePort == -1:
+            return []
+        if isinstance(self.sourcePort, int):
+            return [self.sourcePort]
+        ports = validateNumberRange(self.sourcePort, flattenList=True)
+        if not ports or ports[0] < 0 or ports[-1] > 65535:
+            raise RuntimeError("Invalid sourcePort: {0}".format(self.sourcePort))
+        return ports
+
+    # Returns the list of source IPs to use, [] for the default
+    def getSourceIPs(self):
+        sourceIPs = []
+        for block in [block.strip() for block in self.sourceIP.split(",")]:
+            if block == "" or block == "0.0.0.0":
+                continue
+            if "/" in block:
+                sourceIPs += [str(address) for address in ipaddress.ip_network(block, strict=False).hosts()]
+            else:
+                sourceIPs.append(str(ipaddress.ip_address(block)))
+        return sourceIPs
+
     # Set messagesToFuzz from string (such as "1,3-4")
     def setMessagesToFuzzFromString(self, messagesToFuzzStr):
         self.messagesToFuzz = validateNumberRange(messagesToFuzzStr, flattenList=True)
@@ -267,11 +318,19 @@ class FuzzerData(object):
         
         # Failure Timeout
         if defaultComments:
-            fileDescriptor.write("# How long to wait between retrying test cases causing a crash\n")
+            fileDescriptor.write("# Longest to wait for the target to come back before retrying a test case causing a crash\n")
         else:
             fileDescriptor.write(self._getComments("failureTimeout"))
         fileDescriptor.write("failureTimeout {0}\n".format(self.failureTimeout))
         
+        # Health Probe
+        if self.healthProbe:
+            if defaultComments:
+                fileDescriptor.write("# Sent to check the target is back after a crash, any reply means it's ready\n")
+            else:
+                fileDescriptor.write(self._getComments("healthProbe"))
+            fileDescriptor.write("healthProbe {0}\n".format(Message.serializeByteArray(self.healthProbe)))
+        
         # Receive Timeout
         if defaultComments:
             fileDescriptor.write("# How long for recv() to block when waiting on data from server\n")
@@ -287,6 +346,23 @@ class FuzzerData(object):
         sPTR = 1 if self.shouldPerformTestRun else 0
         fileDescriptor.write("shouldPerformTestRun {0}\n".format(sPTR))
         
+        # Mutator
+        if defaultComments:
+            fileDescriptor.write("# Mutation engine: radamsa, libradamsa to call radamsa in-process (its outputs\n# differ from the radamsa binary's for the same seed),\n")
+            fileDescriptor.write("# or native for fast deterministic bit/byte level mutations (needs numpy)\n")
+        else:
+            fileDescriptor.write(self._getComments("mutator"))
+        fileDescriptor.write("mutator {0}\n".format(self.mutator))
+        
+        # Cases Per Connection
+        if defaultComments:
+            fileDescriptor.write("# How many cases to run on one connection (tcp/tls), each one starting\n")
+            fileDescriptor.write("# at the first fuzzed message.  Messages marked reset are only sent\n")
+            fileDescriptor.write("# between cases on the same connection, 1 = new connection every case\n")
+        else:
+            fileDescriptor.write(self._getComments("casesPerConnection"))
+        fileDescriptor.write("casesPerConnection {0}\n".format(self.casesPerConnection))
+        
         # Protocol
         if defaultComments:
             fileDescriptor.write("# Protocol (udp or tcp)\n")
@@ -303,14 +379,15 @@ class FuzzerData(object):
         
         # Source Port
         if defaultComments:
-            fileDescriptor.write("# Port number to connect from\n")
+            fileDescriptor.write("# Port number to connect from, or a range like 40000-40999 to rotate through\n")
         else:
             fileDescriptor.write(self._getComments("sourcePort"))
         fileDescriptor.write("sourcePort {0}\n".format(self.sourcePort))
 
         # Source IP
         if defaultComments:
-            fileDescriptor.write("# Source IP to connect from\n")
+            fileDescriptor.write("# Source IP to connect from, or a comma separated list of IPs and CIDR\n")
+            fileDescriptor.write("# blocks to rotate through\n")
         else:
             fileDescriptor.write(self._getComments("sourceIP"))
         fileDescriptor.write("sourceIP {0}\n\n".format(self.sourceIP))
@@ -320,6 +397,7 @@ class FuzzerData(object):
             finalMessageNum = len(self.messageCollection.messages)-1
         if defaultComments:
             fileDescriptor.write("# The actual messages in the conversation\n# Each contains a message to be sent to or from the server, printably-formatted\n")
+            fileDescriptor.write("# Inbound messages can add frame=recorded, frame=length:N, frame=delimiter:\\r\\n\n# or frame=prefix:OFFSET:SIZE[:big|little[:ADJUST]] to stop reading as soon\n# as the message is in instead of waiting for receiveTimeout\n")
         for i in range(0, finalMessageNum+1):
             message = self.messageCollection.messages[i]
             if not defaultComments:
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# --harness: fuzzes a Python protocol handler in the Mutiny process,
+# with no sockets in between
+#
+# The handler is "file.py:function", either
+#   - a function taking each outbound message's bytes and returning
+#     the response (bytes, or None for no response), or
+#   - a generator function, started for each connection, that's sent
+#     each outbound message and yields the responses.  Whatever it
+#     yields before the first message is the greeting, and returning
+#     closes the connection
+# Either way connect() returns a HarnessConnection, which quacks
+# enough like a connected stream socket for performRun().  Anything
+# the handler raises is a crash, a LogCrashException naming where
+#
+#------------------------------------------------------------------
+
+import inspect
+import socket
+import time
+import traceback
+from backend.fork_server_stub import loadHandler
+from mutiny_classes.mutiny_exceptions import LogCrashException, MessageProcessorExceptions
+
+class Harness(object):
+    def __init__(self, target, stats=None):
+        self.target = target
+        self.handler = loadHandler(target, "harness_target")
+        self.isSession = inspect.isgeneratorfunction(self.handler)
+        self.stats = stats
+        self.calls = 0
+        self.callSeconds = 0
+
+    # Returns the connection for one run
+    def connect(self):
+        return HarnessConnection(self)
+
+    # Calls the handler (or resumes the session) with data, turning
+    # anything it raises into a LogCrashException
+    def call(self, function, data):
+        startTime = time.perf_counter()
+        try:
+            return function(data)
+        except tuple(MessageProcessorExceptions.all):
+            # The handler knows about Mutiny and said what to do
+            raise
+        except StopIteration:
+            raise
+        except Exception as e:
+            if self.stats:
+                self.stats.increment("Harness exceptions")
+            raise LogCrashException(self.describeException(e))
+        finally:
+            self.calls += 1
+            self.callSeconds += time.perf_counter() - startTime
+
+    def describeException(self, e):
+        frames = traceback.extract_tb(e.__traceback__)
+        # Where it was raised, so crashes can be told apart
+        location = " at %s:%d in %s" % (frames[-1].filename, frames[-1].lineno, frames[-1].name) if frames else ""
+        return "Harness raised %s: %s%s" % (e.__class__.__name__, str(e), location)
+
+    def getSummary(self):
+        if not self.calls:
+            return []
+        return ["Harness: %d calls, %.1f us average" % (self.calls, self.callSeconds / self.calls * 1000000)]
+
+# One run's "connection" to the handler.  Responses are queued when the
+# message is sent, so a receive with nothing queued times out right away
+class HarnessConnection(object):
+    type = socket.SOCK_STREAM
+
+    def __init__(self, harness):
+        self.harness = harness
+        self._pending = bytearray()
+        self._isClosed = False
+        self._session = None
+        if harness.isSession:
+            self._session = harness.handler()
+            self._resume(lambda data: next(self._session), None)
+
+    def _resume(self, function, data):
+        try:
+            response = self.harness.call(function, data)
+        except StopIteration:
+            # The session returned, the target hung up
+            self._isClosed = True
+            return
+        if response:
+            self._pending += response
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        if self._isClosed:
+            raise BrokenPipeError("Harness session has ended")
+        if self._session:
+            self._resume(self._session.send, bytes(data))
+        else:
+            self._resume(self.harness.handler, bytes(data))
+
+    def recv(self, bufferSize):
+        if not self._pending:
+            if self._isClosed:
+                return b""
+            raise socket.timeout("timed out")
+        data = bytes(self._pending[:bufferSize])
+        del self._pending[:bufferSize]
+        return data
+
+    def recv_into(self, buffer, nbytes=0):
+        data = self.recv(nbytes or len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if self._session:
+            self._session.close()
+            self._session = None
+        self._isClosed = True
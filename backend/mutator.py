@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Mutation backends used by mutiny.py to fuzz subcomponents
+#
+# Every backend takes (seed, byteArray) and returns the fuzzed
+# bytearray.  The output for a given seed must never depend on
+# which backend or how many workers produced it, otherwise logged
+# seeds stop being reproducible.
+#
+#------------------------------------------------------------------
+
+import ctypes
+import subprocess
+import threading
+from collections import deque
+
+# Spawns a fresh radamsa process for every mutate() call
+# This is the historical Mutiny behavior
+class RadamsaMutator(object):
+    def __init__(self, radamsaPath):
+        self.radamsaPath = radamsaPath
+
+    def _spawn(self, seed):
+        return subprocess.Popen([self.radamsaPath, "--seed", str(seed)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Fuzz byteArray with the given seed, return fuzzed bytearray
+    def mutate(self, seed, byteArray):
+        radamsa = self._spawn(seed)
+        (fuzzedByteArray, error_output) = radamsa.communicate(input=byteArray)
+        return bytearray(fuzzedByteArray)
+
+    # Hint that mutate() will soon be called with these seeds
+    # seeds - list of upcoming seeds, in the order they'll be used
+    # perSeed - how many mutate() calls each seed will get (one per fuzzed subcomponent)
+    def prefetch(self, seeds, perSeed=1):
+        pass
+
+    # Release any resources held by the mutator
+    def close(self):
+        pass
+
+# Calls radamsa in-process through libradamsa, skipping process
+# creation and the pipe round-trip entirely.  Needs a libradamsa.so
+# built from a radamsa release that has one, radamsa 0.6 as bundled
+# has no library target.  Raises OSError if the library can't be
+# loaded, callers are expected to fall back to RadamsaMutator.
+#
+# Outputs are NOT the same as the radamsa binary's for the same seed:
+# the library keeps mutator state from one call to the next, while each
+# run of the binary starts fresh.  Seeds found with this engine have to
+# be reproduced with it, in the same order.
+#
+# The output buffer is allocated once and reused.  libradamsa cuts
+# outputs off at the buffer size, so an output that fills the buffer
+# is generated again into one twice the size rather than returned
+# truncated.
+# The Owl VM inside the library is not reentrant, hence the lock.
+class LibRadamsaMutator(object):
+    def __init__(self, libraryPath, bufferSize=1024*1024):
+        self._library = ctypes.CDLL(libraryPath)
+        self._library.radamsa_init.argtypes = []
+        self._library.radamsa_init.restype = None
+        self._library.radamsa.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint]
+        self._library.radamsa.restype = ctypes.c_size_t
+        self._library.radamsa_init()
+        self._buffer = ctypes.create_string_buffer(bufferSize)
+        self._lock = threading.Lock()
+
+    def mutate(self, seed, byteArray):
+        data = bytes(byteArray)
+        with self._lock:
+            while True:
+                length = self._library.radamsa(data, len(data), self._buffer, len(self._buffer), seed & 0xffffffff)
+                if length < len(self._buffer):
+                    return bytearray(ctypes.string_at(self._buffer, length))
+                # Might have been cut off
+                self._buffer = ctypes.create_string_buffer(len(self._buffer) * 2)
+
+    def prefetch(self, seeds, perSeed=1):
+        pass
+
+    def close(self):
+        pass
+
+# Keeps a pool of radamsa processes already started with the seeds that
+# are about to be used, so fork/exec and Owl VM startup happen while the
+# previous case is still on the wire.
+# radamsa only takes its seed on the command line and exits after one
+# output, so a warm process is good for exactly one (seed, input) request.
+# Output is identical to RadamsaMutator since it's the same invocation.
+class RadamsaPoolMutator(RadamsaMutator):
+    def __init__(self, radamsaPath, poolSize):
+        super(RadamsaPoolMutator, self).__init__(radamsaPath)
+        self.poolSize = poolSize
+        # seed => deque of idle radamsa processes spawned with that seed
+        self._warm = {}
+        self._warmCount = 0
+
+    def _takeWarm(self, seed):
+        processes = self._warm.get(seed)
+        if not processes:
+            return None
+        radamsa = processes.popleft()
+        self._warmCount -= 1
+        if not processes:
+            del self._warm[seed]
+        return radamsa
+
+    def mutate(self, seed, byteArray):
+        radamsa = self._takeWarm(seed)
+        if radamsa is None:
+            radamsa = self._spawn(seed)
+        (fuzzedByteArray, error_output) = radamsa.communicate(input=byteArray)
+        return bytearray(fuzzedByteArray)
+
+    def prefetch(self, seeds, perSeed=1):
+        # Drop anything warmed for seeds we no longer expect (e.g. range ended)
+        wanted = set(seeds)
+        for seed in list(self._warm.keys()):
+            if seed not in wanted:
+                for radamsa in self._warm.pop(seed):
+                    self._kill(radamsa)
+                    self._warmCount -= 1
+
+        for seed in seeds:
+            if self._warmCount >= self.poolSize:
+                break
+            processes = self._warm.setdefault(seed, deque())
+            while len(processes) < perSeed and self._warmCount < self.poolSize:
+                processes.append(self._spawn(seed))
+                self._warmCount += 1
+
+    def _kill(self, radamsa):
+        try:
+            radamsa.kill()
+            radamsa.communicate()
+        except OSError:
+            pass
+
+    def close(self):
+        for processes in self._warm.values():
+            for radamsa in processes:
+                self._kill(radamsa)
+        self._warm = {}
+        self._warmCount = 0
+
+# Wraps another mutator and runs it ahead of the fuzz loop on worker
+# threads, so the next few seeds are already mutated by the time
+# performRun() asks for them and the socket never waits on radamsa.
+#
+# seeds - iterable of the seeds the main loop will use, in order
+# inputs - the original bytes of every fuzzed subcomponent, in order
+# depth - how many seeds may be mutated ahead of the one in use
+# threads - how many worker threads run the inner mutator
+#
+# Results are keyed by (seed, input), so if a message processor changed a
+# subcomponent before fuzzing, the lookup misses and we mutate inline
+# instead.  Once that happens the producers are stopped for good, since
+# the processor is evidently altering input on every run.
+class PrefetchMutator(object):
+    def __init__(self, mutator, seeds, inputs, depth, threads=1):
+        self.mutator = mutator
+        self.depth = depth
+        self.hits = 0
+        self.misses = 0
+        self._seeds = iter(seeds)
+        self._inputs = []
+        for byteArray in inputs:
+            if bytes(byteArray) not in self._inputs:
+                self._inputs.append(bytes(byteArray))
+        # seed => {input bytes: fuzzed bytearray}, filled by the producers
+        self._ready = {}
+        # Seeds taken by producers but not finished yet
+        self._pending = set()
+        # Seeds taken by producers in schedule order, used to evict
+        # anything the main loop has moved past
+        self._order = deque()
+        # Next seed from the schedule, held back while it's still queued
+        # from the last time round a --loop
+        self._nextSeed = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._threads = []
+        for i in range(0, max(1, threads)):
+            thread = threading.Thread(target=self._produce)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _produce(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    if self._nextSeed is None:
+                        try:
+                            self._nextSeed = next(self._seeds)
+                        except StopIteration:
+                            # Finite schedule, everything's been produced
+                            return
+                    # Wait for room, and for the main loop to move past
+                    # the seed if --loop wrapped around onto it
+                    if len(self._order) < self.depth and self._nextSeed not in self._order:
+                        break
+                    self._condition.wait()
+                seed = self._nextSeed
+                self._nextSeed = None
+                self._pending.add(seed)
+                self._order.append(seed)
+
+            outputs = {}
+            for byteArray in self._inputs:
+                outputs[byteArray] = self.mutator.mutate(seed, byteArray)
+
+            with self._condition:
+                self._pending.discard(seed)
+                if seed in self._order:
+                    self._ready[seed] = outputs
+                self._condition.notify_all()
+
+    def _evictBefore(self, seed):
+        # Caller holds self._condition
+        while self._order and self._order[0] != seed:
+            self._ready.pop(self._order.popleft(), None)
+        self._condition.notify_all()
+
+    def mutate(self, seed, byteArray):
+        with self._condition:
+            if seed in self._order:
+                self._evictBefore(seed)
+                while seed in self._pending:
+                    self._condition.wait()
+                outputs = self._ready.get(seed, {})
+                fuzzedByteArray = outputs.get(bytes(byteArray))
+                if fuzzedByteArray is not None:
+                    self.hits += 1
+                    # Hand out a copy, the cached one may be asked for again on a retry
+                    return bytearray(fuzzedByteArray)
+                if outputs:
+                    # Prefetched the seed, but a message processor changed the input
+                    print("Message processor altered fuzzed input, disabling mutation prefetch")
+                    self._stop()
+        self.misses += 1
+        return self.mutator.mutate(seed, byteArray)
+
+    def prefetch(self, seeds, perSeed=1):
+        pass
+
+    def _stop(self):
+        # Caller holds self._condition
+        self._stopped = True
+        self._ready = {}
+        self._order.clear()
+        self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._stop()
+        self.mutator.close()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Built-in mutation engine for simple binary protocols
+#
+# Maps every seed to one deterministic mutation of the input.  The
+# first seeds walk AFL-style deterministic stages (bit flips, byte
+# flips, byte arithmetic, interesting values) across every position
+# of the input; once those are used up, seeds fall through to a
+# "havoc" stage that stacks random mutations (including block
+# duplication) using the seed as the RNG seed.
+#
+# Stages are located from the seed number arithmetically, nothing is
+# enumerated up front, so seed 1000000 costs the same as seed 0.
+#
+# Needs numpy
+#
+#------------------------------------------------------------------
+
+import random
+
+import numpy
+
+# Same values AFL uses, they tend to hit boundary conditions
+INTERESTING_8 = [-128, -1, 0, 1, 16, 32, 64, 100, 127]
+INTERESTING_16 = INTERESTING_8 + [-32768, -129, 128, 255, 256, 512, 1000, 1024, 4096, 32767]
+INTERESTING_32 = INTERESTING_16 + [-2147483648, -100663046, -32769, 32768, 65535, 65536, 100663045, 2147483647]
+# Largest value added/subtracted by the arithmetic stage
+ARITH_MAX = 35
+# Most mutations stacked in one havoc case (power of 2)
+HAVOC_STACK_POW2 = 7
+# Havoc never grows an input past this many times its original length
+# (or HAVOC_MIN_LENGTH for tiny inputs)
+HAVOC_GROWTH = 16
+HAVOC_MIN_LENGTH = 4096
+
+# Packs each interesting value as little and big endian byte rows
+def _packInteresting(values, width):
+    little = numpy.array(values, dtype=numpy.int64).astype("<u%d" % width).view(numpy.uint8).reshape(-1, width)
+    big = numpy.array(values, dtype=numpy.int64).astype(">u%d" % width).view(numpy.uint8).reshape(-1, width)
+    # Interleave so case r uses value r//2, little endian when r is even
+    return numpy.stack([little, big], axis=1).reshape(-1, width)
+
+INTERESTING_8_BYTES = numpy.array(INTERESTING_8, dtype=numpy.int64).astype(numpy.uint8).reshape(-1, 1)
+INTERESTING_16_BYTES = _packInteresting(INTERESTING_16, 2)
+INTERESTING_32_BYTES = _packInteresting(INTERESTING_32, 4)
+# Same tables as bytes, for the havoc stage
+INTERESTING_BYTES = [[bytes(row) for row in packed] for packed in [INTERESTING_8_BYTES, INTERESTING_16_BYTES, INTERESTING_32_BYTES]]
+
+#------------------------------------------------------------------
+# Deterministic stages
+# Each takes a 2D array with one copy of the input per row and the
+# per-row case index within the stage, and mutates rows in place
+#------------------------------------------------------------------
+
+def _flipBits(width):
+    def stage(mutants, cases):
+        rows = numpy.arange(len(cases))
+        for k in range(0, width):
+            bits = cases + k
+            mutants[rows, bits >> 3] ^= (128 >> (bits & 7)).astype(numpy.uint8)
+    return stage
+
+def _flipBytes(width):
+    def stage(mutants, cases):
+        rows = numpy.arange(len(cases))
+        for k in range(0, width):
+            mutants[rows, cases + k] ^= 0xff
+    return stage
+
+def _arith8(mutants, cases):
+    rows = numpy.arange(len(cases))
+    positions = cases // (2 * ARITH_MAX)
+    remainders = cases % (2 * ARITH_MAX)
+    deltas = (remainders // 2 + 1) * numpy.where(remainders % 2 == 0, 1, -1)
+    mutants[rows, positions] = ((mutants[rows, positions].astype(numpy.int64) + deltas) & 0xff).astype(numpy.uint8)
+
+def _interesting(packed):
+    width = packed.shape[1]
+    def stage(mutants, cases):
+        rows = numpy.arange(len(cases))
+        positions = cases // len(packed)
+        values = packed[cases % len(packed)]
+        for k in range(0, width):
+            mutants[rows, positions + k] = values[:, k]
+    return stage
+
+# (name, case count for an input of length n, stage function)
+STAGES = [
+    ("bitflip 1/1", lambda n: n * 8, _flipBits(1)),
+    ("bitflip 2/1", lambda n: max(0, n * 8 - 1), _flipBits(2)),
+    ("bitflip 4/1", lambda n: max(0, n * 8 - 3), _flipBits(4)),
+    ("byteflip 8/8", lambda n: n, _flipBytes(1)),
+    ("byteflip 16/8", lambda n: max(0, n - 1), _flipBytes(2)),
+    ("byteflip 32/8", lambda n: max(0, n - 3), _flipBytes(4)),
+    ("arith 8/8", lambda n: n * 2 * ARITH_MAX, _arith8),
+    ("interest 8/8", lambda n: n * len(INTERESTING_8_BYTES), _interesting(INTERESTING_8_BYTES)),
+    ("interest 16/8", lambda n: max(0, n - 1) * len(INTERESTING_16_BYTES), _interesting(INTERESTING_16_BYTES)),
+    ("interest 32/8", lambda n: max(0, n - 3) * len(INTERESTING_32_BYTES), _interesting(INTERESTING_32_BYTES)),
+]
+
+HAVOC = "havoc"
+
+# Returns (stage index or HAVOC, case index within the stage) for a seed
+def locateSeed(seed, length):
+    for stageIndex in range(0, len(STAGES)):
+        count = STAGES[stageIndex][1](length)
+        if seed < count:
+            return (stageIndex, seed)
+        seed -= count
+    return (HAVOC, seed)
+
+#------------------------------------------------------------------
+# Havoc stage
+#------------------------------------------------------------------
+
+# Per-seed, since every case changes length differently.  Works on a
+# plain bytearray with random.Random: numpy only pays off on whole
+# arrays, and the individual operations here are tiny
+def _havoc(seed, original):
+    rng = random.Random(seed)
+    data = bytearray(original)
+    maxLength = max(len(original) * HAVOC_GROWTH, HAVOC_MIN_LENGTH)
+    if len(data) == 0:
+        return bytearray(rng.getrandbits(8) for i in range(0, rng.randint(1, 16)))
+
+    for i in range(0, 1 << rng.randint(1, HAVOC_STACK_POW2)):
+        if len(data) == 0:
+            data = bytearray([rng.getrandbits(8)])
+        operation = rng.randrange(8)
+        position = rng.randrange(len(data))
+        if operation == 0:
+            # Flip a single bit
+            data[position] ^= 128 >> rng.randrange(8)
+        elif operation == 1:
+            # Overwrite with an interesting value, any width that fits
+            packed = INTERESTING_BYTES[rng.randrange(3)]
+            value = packed[rng.randrange(len(packed))][:len(data) - position]
+            data[position:position + len(value)] = value
+        elif operation == 2:
+            # Add or subtract a small value
+            data[position] = (data[position] + rng.randint(-ARITH_MAX, ARITH_MAX)) & 0xff
+        elif operation == 3:
+            # Random byte
+            data[position] = rng.getrandbits(8)
+        elif operation == 4 and len(data) > 1:
+            # Delete a block
+            size = rng.randint(1, len(data) - position)
+            del data[position:position + size]
+        elif operation == 5:
+            # Duplicate a block in place, sometimes many times over
+            size = rng.randint(1, len(data) - position)
+            repeat = min(1 << rng.randrange(5), (maxLength - len(data)) // size)
+            data[position + size:position + size] = data[position:position + size] * repeat
+        elif operation == 6:
+            # Copy a block over another part of the input
+            size = rng.randint(1, len(data) - position)
+            destination = rng.randint(0, len(data) - size)
+            data[destination:destination + size] = data[position:position + size]
+        else:
+            # Insert a block of a single random byte
+            size = max(0, min(rng.randint(1, 32), maxLength - len(data)))
+            data[position:position] = bytes([rng.getrandbits(8)]) * size
+    return data
+
+#------------------------------------------------------------------
+# Mutator
+#------------------------------------------------------------------
+
+# Same interface as the mutators in backend/mutator.py
+# Once mutate() sees the seeds for an input going up one at a time, it
+# computes the next batchSize seeds at once with mutateBatch() and
+# serves the following calls from that batch.  Seeds that jump around
+# (--loop, --workers striding) are mutated one at a time, a batch
+# would mostly be thrown away
+class NativeMutator(object):
+    def __init__(self, batchSize=256):
+        self.batchSize = batchSize
+        # input bytes => (first seed in batch, [fuzzed bytearray, ...])
+        self._batches = {}
+        # input bytes => seed it was last mutated with
+        self._lastSeeds = {}
+
+    def mutate(self, seed, byteArray):
+        key = bytes(byteArray)
+        batch = self._batches.get(key)
+        if batch is None or not (batch[0] <= seed < batch[0] + len(batch[1])):
+            if len(self._batches) >= 16:
+                # Message processor is feeding us something new every run
+                self._batches = {}
+                self._lastSeeds = {}
+            if self._lastSeeds.get(key) == seed - 1:
+                batch = (seed, self.mutateBatch(list(range(seed, seed + self.batchSize)), key))
+            else:
+                batch = (seed, self.mutateBatch([seed], key))
+            self._batches[key] = batch
+        self._lastSeeds[key] = seed
+        return bytearray(batch[1][seed - batch[0]])
+
+    # Returns a list with the fuzzed bytes for each seed
+    # Seeds landing in the same deterministic stage are mutated
+    # together as rows of one 2D array
+    def mutateBatch(self, seeds, byteArray):
+        original = numpy.frombuffer(bytes(byteArray), dtype=numpy.uint8)
+        results = [None] * len(seeds)
+        groups = {}
+        for n in range(0, len(seeds)):
+            (stage, case) = locateSeed(seeds[n], len(original))
+            groups.setdefault(stage, []).append((n, case))
+
+        for stage in groups:
+            members = groups[stage]
+            if stage == HAVOC:
+                for (n, case) in members:
+                    results[n] = bytes(_havoc(seeds[n], original))
+                continue
+            cases = numpy.array([case for (n, case) in members], dtype=numpy.int64)
+            mutants = numpy.tile(original, (len(members), 1))
+            STAGES[stage][2](mutants, cases)
+            for row in range(0, len(members)):
+                results[members[row][0]] = mutants[row].tobytes()
+        return results
+
+    def prefetch(self, seeds, perSeed=1):
+        pass
+
+    def close(self):
+        self._batches = {}
+        self._lastSeeds = {}
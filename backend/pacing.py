@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Paces fuzz cases to a target rate (--rate, --burst) with a token
+# bucket, optionally backing off while the target struggles
+# (--adaptiveRate)
+#
+# Unlike sleeping before every case, a case only waits when the bucket
+# is empty, so a slow conversation eats into the wait instead of adding
+# to it.  In adaptive mode the rate is adjusted once per window of
+# cases: halved when the share of failed cases (timeouts, connection
+# errors, crashes) climbs above what it has been, and raised step by
+# step back toward --rate while it doesn't
+#
+#------------------------------------------------------------------
+
+import time
+
+# Cases per adjustment in adaptive mode
+WINDOW_SIZE = 50
+# How far above its usual failure rate a window has to be to back off
+FAILURE_TOLERANCE = 0.1
+# The usual failure rate creeps up this much per window, so a campaign
+# that moves on to seeds the target rejects more often isn't throttled forever
+BASELINE_DRIFT = 0.02
+# Never back off below this fraction of --rate
+MIN_RATE_FRACTION = 1.0 / 64
+# Each good window adds this fraction of --rate back
+RECOVERY_STEP = 0.1
+
+class Pacer(object):
+    # rate - cases per second, 0 doesn't pace at all
+    # burst - how many cases can go back to back after the target's
+    #         been left alone for a while
+    # adaptive - treat rate as a ceiling and adjust below it
+    def __init__(self, rate, burst=1, adaptive=False, stats=None, clock=time.monotonic):
+        self.maxRate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.adaptive = adaptive and rate > 0
+        self.stats = stats
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._lastRefill = None
+        # Total of the waits handed out by reserve()
+        self.pacedSeconds = 0
+        self._windowRuns = 0
+        self._windowFailures = 0
+        # Failure rate the target normally has at a rate it keeps up with
+        self._baseline = None
+
+    # Takes a token, returning how many seconds to wait before sending
+    # the case.  Callers running several cases at once each get their
+    # own slot, the bucket goes into debt rather than handing out the
+    # same one twice
+    def reserve(self):
+        if not self.rate:
+            return 0
+        now = self.clock()
+        if self._lastRefill is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._lastRefill) * self.rate)
+        self._lastRefill = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0
+        delay = -self._tokens / self.rate
+        self.pacedSeconds += delay
+        return delay
+
+    def wait(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    # Called with how each case went, only matters in adaptive mode
+    def recordRun(self, failed):
+        if not self.adaptive:
+            return
+        self._windowRuns += 1
+        if failed:
+            self._windowFailures += 1
+        if self._windowRuns < WINDOW_SIZE:
+            return
+        failureRate = float(self._windowFailures) / self._windowRuns
+        self._windowRuns = 0
+        self._windowFailures = 0
+        if self._baseline is None:
+            self._baseline = failureRate
+            return
+
+        if failureRate > self._baseline + FAILURE_TOLERANCE:
+            self.setRate(max(self.maxRate * MIN_RATE_FRACTION, self.rate / 2))
+            if self.stats:
+                self.stats.increment("Pacing backoffs")
+        else:
+            self._baseline = min(failureRate, self._baseline + BASELINE_DRIFT)
+            self.setRate(min(self.maxRate, self.rate + self.maxRate * RECOVERY_STEP))
+
+    def setRate(self, rate):
+        if self._lastRefill is not None:
+            # Settle the tokens earned at the old rate first
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._lastRefill) * self.rate)
+            self._lastRefill = now
+        self.rate = rate
+
+    # Lines for the stats summary, see Stats.addSection()
+    def getSummary(self):
+        if not self.adaptive:
+            line = "Pacing: %g cases per second, bursts of %d" % (self.rate, self.burst)
+        else:
+            line = "Pacing: %.2f cases per second (at most %g), bursts of %d" % (self.rate, self.maxRate, self.burst)
+        return [line, "\tWaited %.1f seconds for the bucket" % (self.pacedSeconds)]
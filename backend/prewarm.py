@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Opens the next run's connection in the background while the
+# current run is still going (--prewarm)
+#
+# Only one connection is kept ready, for one seed.  If the main loop
+# asks for a different seed (a retried or skipped case) the prepared
+# connection is closed and the run connects on its own as usual
+#
+#------------------------------------------------------------------
+
+import threading
+from concurrent.futures import Future
+
+class ConnectionPrewarmer(object):
+    # openConnection - callable(seed) that calls preConnect() for seed and
+    #   returns a tuple starting with the connected socket
+    def __init__(self, openConnection, stats=None):
+        self._openConnection = openConnection
+        self.stats = stats
+        self._seed = None
+        self._future = None
+
+    # Start opening a connection for seed, unless one already is
+    def prepare(self, seed):
+        if self._future is not None:
+            if self._seed == seed:
+                return
+            self.discard()
+        self._seed = seed
+        self._future = Future()
+        # Daemon, so a connect that never completes can't hold up exiting
+        task = threading.Thread(target=self._open, args=(seed, self._future))
+        task.daemon = True
+        task.start()
+
+    def _open(self, seed, future):
+        try:
+            future.set_result(self._openConnection(seed))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # Returns what openConnection(seed) returned, or None if nothing was
+    # prepared for seed.  Exceptions from openConnection (e.g. connection
+    # refused) are raised here, in the run they belong to
+    def take(self, seed):
+        if self._future is None:
+            return None
+        if self._seed != seed:
+            self.discard()
+            return None
+        future = self._future
+        self._future = None
+        self._seed = None
+        if self.stats:
+            self.stats.increment("Prewarmed connections used")
+        return future.result()
+
+    # Close the prepared connection, if any
+    def discard(self):
+        if self._future is None:
+            return
+        future = self._future
+        self._future = None
+        self._seed = None
+        try:
+            future.result()[0].close()
+        except Exception:
+            # Never connected, nothing to close
+            pass
+        if self.stats:
+            self.stats.increment("Prewarmed connections discarded")
@@ -43,10 +43,15 @@ import sys
 import os.path
 import threading
 import socket
+import collections
 
 from os import listdir
-from threading import Event
 from mutiny_classes.mutiny_exceptions import MessageProcessorExceptions
+from backend.crash_events import CrashEvent, CrashEventsPending
+
+# Every callback Mutiny makes on a MessageProcessor
+MESSAGE_PROCESSOR_HOOKS = ["preConnect", "preFuzzSubcomponentProcess", "preFuzzProcess",
+                           "preSendSubcomponentProcess", "preSendProcess", "postReceiveProcess"]
 
 class ProcDirector(object):
     def __init__(self, processDir):
@@ -77,26 +82,88 @@ class ProcDirector(object):
         self.messageProcessor = sys.modules['message_processor'].MessageProcessor
         self.exceptionProcessor = sys.modules['exception_processor'].ExceptionProcessor
         self.monitor = sys.modules['monitor'].Monitor 
-        self.crashQueue = Event()
+
+        # MessageProcessor callbacks that do something, the rest can be skipped
+        defaultProcessor = imp.load_source("default_message_processor", os.path.join(defaultDir, "message_processor.py")).MessageProcessor
+        self.messageProcessorHooks = self._findOverriddenHooks(self.messageProcessor, defaultProcessor)
+        skippedHooks = [hook for hook in MESSAGE_PROCESSOR_HOOKS if hook not in self.messageProcessorHooks]
+        if skippedHooks:
+            print("Skipping default message processor callbacks: %s" % (", ".join(skippedHooks)))
     
+    # Returns the set of hooks in MESSAGE_PROCESSOR_HOOKS that processorClass
+    # implements differently from defaultClass.  A custom processor is
+    # usually a copy of the default file, so compare the code rather
+    # than the function objects
+    @staticmethod
+    def _findOverriddenHooks(processorClass, defaultClass):
+        hooks = set()
+        for hook in MESSAGE_PROCESSOR_HOOKS:
+            code = getattr(getattr(processorClass, hook, None), "__code__", None)
+            defaultCode = getattr(defaultClass, hook).__code__
+            if code is None or code.co_code != defaultCode.co_code or code.co_consts != defaultCode.co_consts or code.co_names != defaultCode.co_names:
+                hooks.add(hook)
+        # The default postReceiveProcess() fills postReceiveStore, which
+        # only matters if some other callback might read it
+        if hooks:
+            hooks.add("postReceiveProcess")
+        return hooks
+
     class MonitorWrapper(object):
         def __init__(self, targetIP, targetPort, monitor):
-            # crashDetectedEvent signals main thread on a detected crash,
-            # interrupt_main() and CTRL+C, otherwise raise the same signal
             # monitor is the actual user custom monitor that implements monitorTarget
             self.monitor = monitor
-            self.crashEvent = threading.Event()
-            self.task = threading.Thread(target=self.monitor.monitorTarget,args=(targetIP,targetPort,self.signalCrashDetectedOnMain))
-            self.task.daemon = True
-            self.task.start()
+            # CrashEvents the monitors have reported, oldest first.  The
+            # main thread picks them up at its next check point, see
+            # checkCrashEvents()
+            self._crashEvents = collections.deque()
+            self._crashCondition = threading.Condition()
+            # restartEvent tells the main thread to look the target up again
+            self.restartEvent = threading.Event()
+            self.targetIP = targetIP
+            self.targetPort = targetPort
+            self.task = self.addMonitor(monitor)
+
+        # Runs another monitor on its own thread, reporting through
+        # the same events, e.g. the --targetCommand supervisor
+        def addMonitor(self, monitor):
+            monitor.signalTargetRestarted = self.signalTargetRestarted
+            task = threading.Thread(target=monitor.monitorTarget,args=(self.targetIP,self.targetPort,self.signalCrashDetectedOnMain))
+            task.daemon = True
+            task.start()
+            return task
 
         # Don't override this function
-        def signalCrashDetectedOnMain(self):
-            # Raises a KeyboardInterrupt exception on main thread
-            self.crashEvent.set()
-            # Ugly but have to import here for this to work in monitorTarget on a custom processor
-            import _thread
-            _thread.interrupt_main()
+        # message - optional details of the crash for the log, e.g. exit status
+        # The rest are optional too, see CrashEvent
+        def signalCrashDetectedOnMain(self, message=None, timestamp=None, signal=None, corePath=None, logExcerpt=None):
+            with self._crashCondition:
+                self._crashEvents.append(CrashEvent(message, timestamp, signal, corePath, logExcerpt))
+                self._crashCondition.notify_all()
+
+        # Don't override this function either
+        def signalTargetRestarted(self):
+            # Picked up before the next run, doesn't interrupt the current one
+            self.restartEvent.set()
+
+        def hasCrashEvents(self):
+            return len(self._crashEvents) > 0
+
+        # Called by the main thread wherever a run can stop early
+        def checkCrashEvents(self):
+            if self._crashEvents:
+                raise CrashEventsPending("The monitor reported a crash")
+
+        # Returns whether there's a crash event within timeout seconds
+        def waitForCrashEvents(self, timeout):
+            with self._crashCondition:
+                return self._crashCondition.wait_for(self.hasCrashEvents, timeout)
+
+        # Returns and forgets the reported CrashEvents
+        def takeCrashEvents(self):
+            with self._crashCondition:
+                crashEvents = list(self._crashEvents)
+                self._crashEvents.clear()
+            return crashEvents
     
     def startMonitor(self, host, port):
         self.monitorWrapper = self.MonitorWrapper(host, port, self.monitor())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# One raw socket for the whole campaign, for proto set to a name in
+# backend/packets.PROTO, a protocol number, or L2raw
+#
+# Raw sockets have no connection to set up, so there's no reason to
+# make a new one every run.  Where the OS allows it (Linux), a BPF
+# socket filter makes the kernel drop everything that doesn't come
+# from the target, so receives don't wake up on unrelated traffic
+#
+#------------------------------------------------------------------
+
+import ctypes
+import socket
+import struct
+from backend.packets import PROTO
+
+# From linux/filter.h and asm-generic/socket.h
+SO_ATTACH_FILTER = 26
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_JEQ_K = 0x15
+BPF_RET_K = 0x06
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+
+class RawTransport(object):
+    # proto - fuzzerData.proto
+    # target - TargetEndpoint, the filter follows its addresses
+    def __init__(self, proto, target, stats=None):
+        self.proto = proto
+        self.target = target
+        self.stats = stats
+        # Address family => socket
+        self._sockets = {}
+        # Address family => the IPv4 sources its filter lets through
+        self._filteredSources = {}
+
+    # Returns the campaign's socket for family, opening it the first
+    # time.  Anything still queued from earlier runs is thrown away so
+    # a run only sees replies to what it sent
+    def getSocket(self, family):
+        connection = self._sockets.get(family)
+        if connection is None:
+            connection = self._openSocket(family)
+            self._sockets[family] = connection
+        self._updateFilter(family, connection)
+        self._drain(connection)
+        return connection
+
+    def _openSocket(self, family):
+        if self.proto == "L2raw":
+            # 0x0300 is ETH_P_ALL in network byte order
+            return socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0x0300)
+        if self.proto in PROTO:
+            connection = socket.socket(family, socket.SOCK_RAW, PROTO[self.proto])
+            if family == socket.AF_INET:
+                # The kernel builds the IP header, the messages are the payload
+                connection.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 0)
+            return connection
+        # A protocol number
+        connection = socket.socket(family, socket.SOCK_RAW, int(self.proto))
+        if family == socket.AF_INET:
+            connection.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 0)
+        return connection
+
+    # (Re)attach the BPF filter if the target's addresses changed
+    def _updateFilter(self, family, connection):
+        if family != socket.AF_INET and self.proto != "L2raw":
+            # IPv6 raw sockets don't see the IP header to filter on
+            return
+        sources = tuple([host for (endpointFamily, address, host) in self.target.endpoints if endpointFamily == socket.AF_INET])
+        if not sources or self._filteredSources.get(family) == sources:
+            return
+        self._filteredSources[family] = sources
+        try:
+            attachSourceFilter(connection, sources, isLayer2=(self.proto == "L2raw"))
+        except (OSError, AttributeError, ValueError) as e:
+            print("Unable to attach a BPF filter to the raw socket, receiving everything: %s" % (str(e)))
+
+    def _drain(self, connection):
+        dropped = 0
+        connection.setblocking(False)
+        try:
+            while True:
+                connection.recv(65535)
+                dropped += 1
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            connection.setblocking(True)
+        if dropped and self.stats:
+            self.stats.increment("Stale raw packets dropped", dropped)
+
+    def close(self):
+        for connection in self._sockets.values():
+            connection.close()
+        self._sockets = {}
+        self._filteredSources = {}
+
+# Builds the classic BPF program accepting only IPv4 packets from one
+# of sources (dotted quads).  isLayer2 - packets start with an ethernet
+# header (AF_PACKET) instead of the IP header
+def buildSourceFilter(sources, isLayer2=False):
+    count = len(sources)
+    instructions = []
+    if isLayer2:
+        # Only IPv4, then the source address is 14 bytes further in
+        instructions.append((BPF_LD_H_ABS, 0, 0, 12))
+        instructions.append((BPF_JEQ_K, 0, count + 1, ETH_P_IP))
+        instructions.append((BPF_LD_W_ABS, 0, 0, 26))
+    else:
+        instructions.append((BPF_LD_W_ABS, 0, 0, 12))
+    for n in range(0, count):
+        # Jump over the rest of the comparisons and the reject to the accept
+        address = struct.unpack("!I", socket.inet_aton(sources[n]))[0]
+        instructions.append((BPF_JEQ_K, count - n, 0, address))
+    instructions.append((BPF_RET_K, 0, 0, 0))
+    instructions.append((BPF_RET_K, 0, 0, 0xffff))
+    return instructions
+
+def attachSourceFilter(connection, sources, isLayer2=False):
+    instructions = buildSourceFilter(sources, isLayer2)
+    program = ctypes.create_string_buffer(b"".join([struct.pack("HBBI", *instruction) for instruction in instructions]))
+    # struct sock_fprog, the kernel copies the program during the call
+    fprog = struct.pack("HP", len(instructions), ctypes.addressof(program))
+    connection.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
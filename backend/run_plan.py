@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# A MessageCollection compiled once per session into the parts of a
+# run that never change, so that performing a run only has to deal
+# with what the seed and the message processor change.  The collection
+# itself is never modified, what each run sends goes in its RunRecord
+#
+#------------------------------------------------------------------
+
+from mutiny_classes.message_processor import MessageProcessorExtraParams
+from backend.proc_director import MESSAGE_PROCESSOR_HOOKS
+from backend.framing import parseFrame
+
+# Everything about one message that stays the same from run to run
+class MessagePlan(object):
+    __slots__ = ["number", "isOutbound", "isFuzzed", "hasSubcomponents", "originalSubcomponents",
+                 "originalMessage", "originalWhole", "subcomponentIsFuzzed", "fuzzedSlots", "frame", "isReset"]
+
+    # firstFuzzedIndex - index of the message's first fuzzed subcomponent
+    #   across the whole collection
+    def __init__(self, number, message, firstFuzzedIndex):
+        self.number = number
+        self.isOutbound = message.isOutbound()
+        self.isFuzzed = message.isFuzzed
+        self.hasSubcomponents = len(message.subcomponents) > 1
+        # bytes rather than bytearray, as they're shared by every run
+        self.originalSubcomponents = tuple([bytes(subcomponent.message) for subcomponent in message.subcomponents])
+        self.originalMessage = b"".join(self.originalSubcomponents)
+        # The whole message as a single subcomponent, for postReceiveProcess()
+        self.originalWhole = (self.originalMessage,)
+        self.subcomponentIsFuzzed = tuple([subcomponent.isFuzzed for subcomponent in message.subcomponents])
+        # (subcomponent number, index across the collection) for each fuzzed subcomponent
+        fuzzedSlots = []
+        for j in range(0, len(message.subcomponents)):
+            if message.subcomponents[j].isFuzzed and self.isOutbound:
+                fuzzedSlots.append((j, firstFuzzedIndex + len(fuzzedSlots)))
+        self.fuzzedSlots = tuple(fuzzedSlots)
+        # Frame to receive an inbound message with, None = single read
+        self.frame = parseFrame(message.frame, len(self.originalMessage)) if message.frame else None
+        self.isReset = message.isReset
+
+class RunPlan(object):
+    # hooks - MessageProcessor callbacks to make, None for all of them,
+    #   see ProcDirector.messageProcessorHooks
+    def __init__(self, messageCollection, hooks=None):
+        self.hooks = frozenset(hooks if hooks is not None else MESSAGE_PROCESSOR_HOOKS)
+        self._preFuzzSubcomponent = "preFuzzSubcomponentProcess" in self.hooks
+        self._preFuzz = "preFuzzProcess" in self.hooks
+        self._preSendSubcomponent = "preSendSubcomponentProcess" in self.hooks
+        self._preSend = "preSendProcess" in self.hooks
+        # Whether the processor can change what outbound messages send
+        self.hasOutboundHooks = self._preFuzzSubcomponent or self._preFuzz or self._preSendSubcomponent or self._preSend
+        messages = []
+        fuzzedInputs = []
+        for message in messageCollection.messages:
+            plan = MessagePlan(len(messages), message, len(fuzzedInputs))
+            fuzzedInputs += [plan.originalSubcomponents[j] for (j, fuzzedIndex) in plan.fuzzedSlots]
+            messages.append(plan)
+        self.messages = tuple(messages)
+        # Message numbers a run goes through on a new connection
+        self.connectionMessages = tuple([plan.number for plan in messages if not plan.isReset])
+        # And on a connection an earlier case already used: the reset
+        # messages, then everything from the first fuzzed message on
+        firstFuzzed = min([plan.number for plan in messages if plan.isFuzzed] or [0])
+        self.reuseMessages = tuple([plan.number for plan in messages if plan.isReset] +
+                                   [number for number in self.connectionMessages if number >= firstFuzzed])
+        # Original bytes of every fuzzed subcomponent, in the order runs fuzz them
+        self.fuzzedInputs = tuple(fuzzedInputs)
+
+    # Runs the preFuzz, fuzzing and preSend steps on outbound message
+    # messageNumber and returns the bytes to send
+    # runRecord - the run's RunRecord, gets what was actually sent for
+    #   fuzzed messages so it can be logged
+    # mutate - callable(fuzzedIndex, byteArray) returning the fuzzed
+    #   byteArray, None to skip fuzzing (test run)
+    def prepareOutbound(self, messageNumber, runRecord, messageProcessor, mutate=None):
+        buffers = self.prepareOutboundBuffers(messageNumber, runRecord, messageProcessor, mutate)
+        if len(buffers) == 1 and isinstance(buffers[0], bytearray):
+            return buffers[0]
+        return bytearray().join(buffers)
+
+    # Same as prepareOutbound(), but returns the message as a list of
+    # buffers to send one after the other.  They're only joined if
+    # there's a preSendProcess() callback that needs the whole message
+    def prepareOutboundBuffers(self, messageNumber, runRecord, messageProcessor, mutate=None):
+        plan = self.messages[messageNumber]
+        originalSubcomponents = plan.originalSubcomponents
+
+        if not plan.isFuzzed and not self.hasOutboundHooks:
+            # Nothing can change this message, it goes out as recorded
+            return [plan.originalMessage]
+
+        if self.hasOutboundHooks:
+            # Callbacks may edit what they're given in place
+            actualSubcomponents = [bytearray(subcomponent) for subcomponent in originalSubcomponents]
+        else:
+            actualSubcomponents = list(originalSubcomponents)
+        if plan.hasSubcomponents:
+            # For message with subcomponents, call prefuzz on each subcomponent
+            # Every callback gets its own snapshot of actualSubcomponents,
+            # so changes to subcomponent[0] show up for subcomponent[1], etc
+            if self._preFuzzSubcomponent:
+                for j in range(0, len(actualSubcomponents)):
+                    actualSubcomponents[j] = messageProcessor.preFuzzSubcomponentProcess(actualSubcomponents[j], MessageProcessorExtraParams(messageNumber, j, plan.subcomponentIsFuzzed[j], originalSubcomponents, actualSubcomponents[:]))
+        elif self._preFuzz:
+            # If no subcomponents, call prefuzz on ENTIRE message
+            actualSubcomponents[0] = messageProcessor.preFuzzProcess(actualSubcomponents[0], MessageProcessorExtraParams(messageNumber, -1, plan.isFuzzed, originalSubcomponents, actualSubcomponents[:]))
+
+        if mutate:
+            for (j, fuzzedIndex) in plan.fuzzedSlots:
+                actualSubcomponents[j] = mutate(fuzzedIndex, actualSubcomponents[j])
+
+        # Always call preSend() regardless for subcomponents if there are any
+        if plan.hasSubcomponents and self._preSendSubcomponent:
+            for j in range(0, len(actualSubcomponents)):
+                actualSubcomponents[j] = messageProcessor.preSendSubcomponentProcess(actualSubcomponents[j], MessageProcessorExtraParams(messageNumber, j, plan.subcomponentIsFuzzed[j], originalSubcomponents, actualSubcomponents[:]))
+
+        if plan.isFuzzed:
+            runRecord.alteredSubcomponents[messageNumber] = actualSubcomponents
+
+        # Always let the user make any final modifications pre-send, fuzzed or not
+        if self._preSend:
+            return [messageProcessor.preSendProcess(bytearray().join(actualSubcomponents), MessageProcessorExtraParams(messageNumber, -1, plan.isFuzzed, originalSubcomponents, actualSubcomponents))]
+        return actualSubcomponents
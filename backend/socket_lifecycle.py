@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Socket options and source addresses for every connection Mutiny
+# opens, so fast tcp fuzzing doesn't run out of local ports
+#
+# A closed tcp socket sits in TIME_WAIT for a minute or so, holding
+# on to its source port.  --rstClose skips TIME_WAIT by closing with
+# a RST (SO_LINGER 0), --reuseAddr sets SO_REUSEADDR/SO_REUSEPORT, and
+# a sourcePort range and/or sourceIP list gives each connection the
+# next source address in turn, skipping any that are still busy
+#
+#------------------------------------------------------------------
+
+import errno
+import socket
+import struct
+
+class SocketLifecycle(object):
+    # sourceIPs - list of source IPs to rotate through, [] for the default
+    # sourcePorts - list of source ports to rotate through, [] to let the OS pick
+    # rstClose - close tcp connections with a RST instead of leaving TIME_WAIT behind
+    # reuseAddress - set SO_REUSEADDR and SO_REUSEPORT before binding
+    def __init__(self, sourceIPs, sourcePorts, rstClose=False, reuseAddress=False, stats=None):
+        self.sourceIPs = sourceIPs if sourceIPs else ["0.0.0.0"]
+        self.sourcePorts = sourcePorts if sourcePorts else [0]
+        self.rstClose = rstClose
+        self.reuseAddress = reuseAddress
+        self.stats = stats
+        self._poolSize = len(self.sourceIPs) * len(self.sourcePorts)
+        self._nextIndex = 0
+        self._bindCount = 0
+        # Binds that found the address still in use
+        self._busyCount = 0
+
+    # Whether connections get bound to a source address at all
+    def isBinding(self):
+        return self.sourceIPs != ["0.0.0.0"] or self.sourcePorts != [0]
+
+    # Set options on a new socket and bind it to the next free source
+    # address, if any are configured.  Raises the last bind() error if
+    # every address in the pool is busy
+    def prepare(self, connection):
+        if self.rstClose and connection.type == socket.SOCK_STREAM:
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        if self.reuseAddress:
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"):
+                connection.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if not self.isBinding() or connection.family == socket.AF_UNIX:
+            return
+        lastError = None
+        for attempt in range(0, self._poolSize):
+            address = self._nextAddress()
+            try:
+                connection.bind(address)
+                self._bindCount += 1
+                return
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                lastError = e
+                self._busyCount += 1
+                if self.stats:
+                    self.stats.increment("Busy source addresses skipped")
+        if self.stats:
+            self.stats.increment("Source address pool exhausted")
+        raise lastError
+
+    # Opens a socket with makeSocket(), prepares it and connects it to
+    # address.  If the source address is taken for that destination
+    # (TIME_WAIT from an earlier connection to it), moves on to the next
+    def connect(self, makeSocket, address):
+        for attempt in range(0, self._poolSize):
+            connection = makeSocket()
+            try:
+                self.prepare(connection)
+            except:
+                # prepare() already went through the whole pool
+                connection.close()
+                raise
+            try:
+                connection.connect(address)
+                return connection
+            except OSError as e:
+                connection.close()
+                if attempt == self._poolSize - 1 or not self.shouldRetryConnect(e):
+                    raise
+
+    # Whether a failed connect() is worth retrying from the next source
+    # address, counting it towards the pool pressure stats either way
+    def shouldRetryConnect(self, error):
+        if error.errno != errno.EADDRINUSE and error.errno != errno.EADDRNOTAVAIL:
+            return False
+        if self.stats:
+            self.stats.increment("Connects failed for lack of a free source address")
+        if not self.isBinding():
+            # The OS picked the port, and it's out of them
+            return False
+        self._busyCount += 1
+        return True
+
+    @property
+    def poolSize(self):
+        return self._poolSize
+
+    # Returns the (ip, port) after the last one handed out
+    def _nextAddress(self):
+        index = self._nextIndex % self._poolSize
+        self._nextIndex += 1
+        # Go through every port of an IP before moving on to the next IP
+        return (self.sourceIPs[index // len(self.sourcePorts)], self.sourcePorts[index % len(self.sourcePorts)])
+
+    # Lines for the session stats
+    def getSummary(self):
+        lines = []
+        if self.isBinding():
+            lines.append("Source address pool: %d addresses, %d binds, %d found busy" % (self._poolSize, self._bindCount, self._busyCount))
+        timeWait = countTimeWaitSockets()
+        if timeWait is not None:
+            portRange = getEphemeralPortRange()
+            if portRange:
+                lines.append("Sockets in TIME_WAIT: %d (ephemeral port range has %d ports)" % (timeWait, portRange[1] - portRange[0] + 1))
+            else:
+                lines.append("Sockets in TIME_WAIT: %d" % (timeWait))
+        return lines
+
+# TIME_WAIT sockets on this machine, None if it can't be told (not Linux)
+def countTimeWaitSockets():
+    count = None
+    for path in ["/proc/net/tcp", "/proc/net/tcp6"]:
+        try:
+            with open(path) as tcpTable:
+                # Skip the header, the state is the 4th column, 06 = TIME_WAIT
+                states = [line.split()[3] for line in tcpTable.readlines()[1:]]
+        except (IOError, IndexError):
+            continue
+        count = (count or 0) + states.count("06")
+    return count
+
+# (low, high) local ports the OS picks from, None if unknown
+def getEphemeralPortRange():
+    try:
+        with open("/proc/sys/net/ipv4/ip_local_port_range") as rangeFile:
+            (low, high) = rangeFile.read().split()
+        return (int(low), int(high))
+    except (IOError, ValueError):
+        return None
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Running statistics for a fuzzing session
+#
+# Anything in Mutiny can bump a counter or register a section of
+# its own; the summary is printed when the session ends
+#
+#------------------------------------------------------------------
+
+import time
+from collections import OrderedDict
+
+class Stats(object):
+    def __init__(self):
+        self.startTime = time.time()
+        # Counter name => value, printed in insertion order
+        self.counters = OrderedDict()
+        # Callables returning a list of extra lines for the summary
+        self._sections = []
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get(self, name):
+        return self.counters.get(name, 0)
+
+    # section - callable returning a list of strings, called on every summary
+    def addSection(self, section):
+        self._sections.append(section)
+
+    def getSummary(self):
+        elapsed = time.time() - self.startTime
+        lines = ["Elapsed: %.1f seconds" % (elapsed)]
+        runs = self.get("Runs performed")
+        if runs and elapsed > 0:
+            lines.append("Cases per second: %.1f" % (runs / elapsed))
+        for name in self.counters:
+            lines.append("%s: %d" % (name, self.counters[name]))
+        for section in self._sections:
+            lines += section()
+        return lines
+
+    def printSummary(self):
+        print("\n** Session stats **")
+        for line in self.getSummary():
+            print("\t%s" % (line))
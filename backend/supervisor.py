@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Launches the target itself (--targetCommand) and restarts it when it
+# dies, so crashy targets don't need restarting by hand
+#
+# Runs as a monitor alongside the custom one.  Its thread sits in
+# waitpid() on the target, so a crash or exit is noticed the moment
+# it happens, and is reported through signalMain() with the time it
+# exited, the exit status and the end of the target's stderr.  The
+# target is then started again and probed with TargetHealth until
+# it's ready.  A run that fails while the target is down waits for
+# the report and the restart (waitForCrashReport()), so the crash is
+# logged against the run that sent the case and the next run finds
+# the target up again
+#
+#------------------------------------------------------------------
+
+import collections
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from mutiny_classes.mutiny_exceptions import ConnectionClosedException, HaltException
+
+# Lines of the target's stderr to keep for crash reports
+STDERR_LINES = 10
+STDERR_LINE_LENGTH = 200
+# Give up after the target fails to come up this many times in a row
+MAX_FAILED_STARTS = 5
+# A dying target's sockets close before it can be waited for, so a
+# connection error gives it this long to finish exiting
+EXIT_GRACE = 0.1
+
+class TargetSupervisor(object):
+    # command - shell-style command line to launch the target with
+    # targetHealth - TargetHealth to check the target is ready with
+    def __init__(self, command, targetHealth, stats=None):
+        self.command = shlex.split(command)
+        self.targetHealth = targetHealth
+        self.stats = stats
+        self.process = None
+        self._stderrReader = None
+        self._stderrLines = collections.deque(maxlen=STDERR_LINES)
+        self._stopping = False
+        # Cleared from the target's exit until it's been restarted
+        self._running = threading.Event()
+        # Set once restarting has been given up on
+        self._gaveUp = threading.Event()
+        self.restartCount = 0
+        # Seconds from each restart until the target answered
+        self._readyLatencies = []
+
+    # Starts the target and waits for it to be ready, before fuzzing
+    def start(self):
+        startTime = time.monotonic()
+        if not self._launch():
+            raise RuntimeError("Target didn't come up within %d seconds: %s" % (self.targetHealth.maxWait, " ".join(self.command)))
+        self._running.set()
+        print("Target launched (pid %d) and ready in %.2f seconds" % (self.process.pid, time.monotonic() - startTime))
+
+    # Same signature as Monitor.monitorTarget(), see ProcDirector.MonitorWrapper.addMonitor()
+    def monitorTarget(self, targetIP, targetPort, signalMain):
+        while not self._stopping:
+            returnCode = self.process.wait()
+            exitTime = time.time()
+            if self._stopping:
+                return
+            self._running.clear()
+            message = self._describeExit(returnCode)
+            # The reader may still be draining what the target wrote last
+            self._stderrReader.join(0.1)
+            logExcerpt = " | ".join(self._stderrLines) if self._stderrLines else None
+            print("\n%s, restarting it" % (message))
+            if returnCode < 0:
+                # The crash event names the signal itself
+                signalMain("Target killed", timestamp=exitTime, signal=-returnCode, logExcerpt=logExcerpt)
+            else:
+                signalMain(message, timestamp=exitTime, logExcerpt=logExcerpt)
+
+            # Only the exit above is a crash, a restart that doesn't
+            # come up is just tried again
+            failedStarts = 0
+            while True:
+                startTime = time.monotonic()
+                isReady = self._launch()
+                if self._stopping:
+                    return
+                if isReady:
+                    break
+                self._terminate()
+                failedStarts += 1
+                if failedStarts >= MAX_FAILED_STARTS:
+                    print("Target failed to start %d times in a row, no longer restarting it" % (failedStarts))
+                    self._gaveUp.set()
+                    return
+            self.restartCount += 1
+            self._readyLatencies.append(time.monotonic() - startTime)
+            if self.stats:
+                self.stats.increment("Target restarts")
+            self._running.set()
+
+    # Whether the target has died and isn't back yet.  Doesn't wait for
+    # the monitor thread to notice, a run that just failed may have got
+    # there first
+    def hasExited(self):
+        if not self._running.is_set():
+            return True
+        try:
+            # WNOWAIT leaves the target for the monitor thread to reap
+            return os.waitid(os.P_PID, self.process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+        except ChildProcessError:
+            # Already reaped
+            return True
+
+    # Call when a run fails with error.  If the target died, waits until
+    # the crash is in monitor's queue and the target has been restarted.
+    # Raises HaltException once the target couldn't be restarted and its
+    # crash has been taken from the queue
+    def waitForCrashReport(self, monitor, error=None):
+        if not self.hasExited():
+            if not isinstance(error, (ConnectionError, ConnectionClosedException)):
+                return
+            deadline = time.monotonic() + EXIT_GRACE
+            while not self.hasExited():
+                if time.monotonic() > deadline:
+                    return
+                time.sleep(0.001)
+        monitor.waitForCrashEvents(1)
+        deadline = time.monotonic() + MAX_FAILED_STARTS * (self.targetHealth.maxWait + 1)
+        while not self._running.wait(0.05):
+            if self._gaveUp.is_set():
+                if not monitor.hasCrashEvents():
+                    raise HaltException("Target failed to start %d times in a row" % (MAX_FAILED_STARTS))
+                return
+            if time.monotonic() > deadline:
+                return
+
+    # Returns whether the target answered before it died or timed out
+    def _launch(self):
+        self._stderrLines.clear()
+        # Its own session, so CTRL+C on Mutiny doesn't take the target down too
+        self.process = subprocess.Popen(self.command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.PIPE, start_new_session=True)
+        self._stderrReader = threading.Thread(target=self._readStderr, args=(self.process.stderr,))
+        self._stderrReader.daemon = True
+        self._stderrReader.start()
+        return self.targetHealth.waitUntilReady() and self.process.poll() is None
+
+    def _readStderr(self, stream):
+        for line in iter(stream.readline, b""):
+            # Fuzzed data echoed to stderr can be huge, the start is enough
+            self._stderrLines.append(line.decode("utf-8", "replace").rstrip()[:STDERR_LINE_LENGTH])
+        stream.close()
+
+    def _describeExit(self, returnCode):
+        if returnCode < 0:
+            try:
+                return "Target killed by %s" % (signal.Signals(-returnCode).name)
+            except ValueError:
+                return "Target killed by signal %d" % (-returnCode)
+        return "Target exited with status %d" % (returnCode)
+
+    def _terminate(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def stop(self):
+        self._stopping = True
+        self._terminate()
+
+    # Lines for the stats summary, see Stats.addSection()
+    def getSummary(self):
+        if not self._readyLatencies:
+            return []
+        return ["Target restart to ready: %.1f ms average, %.1f ms worst over %d restarts" % (
+                sum(self._readyLatencies) / len(self._readyLatencies) * 1000, max(self._readyLatencies) * 1000, len(self._readyLatencies))]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The address(es) of the target, resolved once per campaign instead
+# of on every run
+#
+# target_host may be a comma separated list of replicas of the same
+# service, in which case runs go round-robin across them.  A path
+# (anything with a "/" in it) is a unix socket.  Addresses are only
+# looked up again when the monitor reports that the target restarted,
+# see signalTargetRestarted in mutiny_classes/monitor.py
+#
+#------------------------------------------------------------------
+
+import socket
+
+class TargetEndpoint(object):
+    # hosts - target_host from the command line
+    # port - fuzzerData.port
+    # restartEvent - threading.Event set by the monitor when the target
+    #   restarted, None if addresses never change
+    def __init__(self, hosts, port, restartEvent=None):
+        self.hosts = [host.strip() for host in hosts.split(",") if host.strip()]
+        self.port = port
+        self.restartEvent = restartEvent
+        # List of (family, address, host) in the same order as self.hosts
+        # host is the resolved IP (or unix socket path) handed to preConnect()
+        self.endpoints = []
+        self._nextIndex = 0
+        self.resolve()
+
+    # Look up every host, raises socket.gaierror if any can't be resolved
+    def resolve(self):
+        self.endpoints = [self._resolveHost(host) for host in self.hosts]
+
+    def _resolveHost(self, host):
+        # Just in case filename is like "./asdf" !=> AF_INET
+        if "/" in host:
+            return (socket.AF_UNIX, host, host)
+        addrs = socket.getaddrinfo(host, self.port)
+        (family, address) = (addrs[0][0], addrs[0][4])
+        if address[0] == "::1":
+            (family, address) = (socket.AF_INET, ("127.0.0.1", self.port))
+        return (family, address, address[0])
+
+    # Returns the (family, address, host) to use for the next run
+    def next(self):
+        if self.restartEvent is not None and self.restartEvent.is_set():
+            self.restartEvent.clear()
+            print("Target restarted, resolving %s again" % (", ".join(self.hosts)))
+            try:
+                self.resolve()
+            except socket.gaierror as e:
+                # Keep the old addresses, the target may be coming back up
+                print("Unable to resolve target: %s" % (str(e)))
+        endpoint = self.endpoints[self._nextIndex % len(self.endpoints)]
+        self._nextIndex += 1
+        return endpoint
+
+    def __str__(self):
+        return ", ".join([host if family == socket.AF_UNIX else "%s port %s" % (host, address[1])
+                          for (family, address, host) in self.endpoints])
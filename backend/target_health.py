@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Waits for the target to be ready again after a crash, instead of
+# sleeping a flat failureTimeout before every retry
+#
+# The target is probed with exponential backoff and jitter until it
+# answers or failureTimeout runs out.  A probe is a connect (tcp, tls,
+# unix stream sockets), followed by sending the .fuzzer file's
+# healthProbe message and waiting for any reply when one is set.
+# Datagram and raw protos can only be probed with a healthProbe,
+# without one the full failureTimeout is waited, as before
+#
+# Each crash is an incident, from when it's detected until fuzzing
+# moves on, split into time spent waiting for the target and time
+# spent rerunning the case
+#
+#------------------------------------------------------------------
+
+import random
+import socket
+import time
+
+# First delay between probes, doubled after each failed probe
+INITIAL_DELAY = 0.01
+# Longest delay between probes
+MAX_DELAY = 1.0
+# Longest a single probe can take
+PROBE_TIMEOUT = 1.0
+
+class Incident(object):
+    def __init__(self, startTime):
+        self.startTime = startTime
+        # Seconds spent in waitUntilReady()
+        self.waited = 0
+
+class TargetHealth(object):
+    # target - TargetEndpoint
+    # tlsTransport - TlsTransport for proto tls, only needed with a healthProbe
+    def __init__(self, fuzzerData, target, tlsTransport=None, stats=None):
+        self.proto = fuzzerData.proto
+        self.maxWait = fuzzerData.failureTimeout
+        self.probeMessage = fuzzerData.healthProbe
+        self.target = target
+        self.tlsTransport = tlsTransport
+        self.stats = stats
+        self.incidentCount = 0
+        self.waitedSeconds = 0
+        self.retryingSeconds = 0
+
+    # Whether the target can be checked at all, if not waitUntilReady()
+    # just sleeps for failureTimeout
+    def canProbe(self):
+        if self.proto == "tcp" or self.proto == "tls":
+            return True
+        return self.proto == "udp" and len(self.probeMessage) > 0
+
+    def beginIncident(self):
+        return Incident(time.monotonic())
+
+    # Returns whether the target answered within failureTimeout
+    def waitUntilReady(self, incident=None):
+        startTime = time.monotonic()
+        isReady = False
+        if not self.canProbe():
+            time.sleep(self.maxWait)
+        else:
+            deadline = startTime + self.maxWait
+            delay = INITIAL_DELAY
+            while True:
+                if self.stats:
+                    self.stats.increment("Target health probes")
+                if self.probe(min(PROBE_TIMEOUT, max(0.001, deadline - time.monotonic()))):
+                    isReady = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Equal jitter, so retries after a crash don't line up
+                # with whatever is restarting the target
+                time.sleep(min(remaining, delay / 2 + random.uniform(0, delay / 2)))
+                delay = min(MAX_DELAY, delay * 2)
+        waited = time.monotonic() - startTime
+        if incident:
+            incident.waited += waited
+        return isReady
+
+    # Fuzzing moved on from the case that crashed
+    def endIncident(self, incident):
+        elapsed = time.monotonic() - incident.startTime
+        self.incidentCount += 1
+        self.waitedSeconds += incident.waited
+        self.retryingSeconds += elapsed - incident.waited
+        print("Lost %.2f seconds to the crash: %.2f waiting for the target, %.2f retrying" % (elapsed, incident.waited, elapsed - incident.waited))
+
+    # One probe of every endpoint, True if they all answered
+    def probe(self, timeout):
+        for (family, address, host) in self.target.endpoints:
+            if not self._probeEndpoint(family, address, timeout):
+                return False
+        return True
+
+    def _probeEndpoint(self, family, address, timeout):
+        connection = socket.socket(family, socket.SOCK_DGRAM if self.proto == "udp" else socket.SOCK_STREAM)
+        try:
+            connection.settimeout(timeout)
+            if self.proto == "tls" and self.probeMessage:
+                connection = self.tlsTransport.wrapSocket(connection)
+            connection.connect(address)
+            if self.probeMessage:
+                connection.sendall(self.probeMessage)
+                return len(connection.recv(4096)) > 0
+            return True
+        except (OSError, ValueError):
+            return False
+        finally:
+            connection.close()
+
+    # Lines for the stats summary, see Stats.addSection()
+    def getSummary(self):
+        if not self.incidentCount:
+            return []
+        total = self.waitedSeconds + self.retryingSeconds
+        return ["Time lost to %d crashes: %.1f seconds, %.1f waiting for the target and %.1f retrying" % (
+                self.incidentCount, total, self.waitedSeconds, self.retryingSeconds)]
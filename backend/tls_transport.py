@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# One client SSLContext for the whole campaign (proto tls)
+#
+# Certificates aren't verified, same as the old per-run
+# ssl.wrap_socket().  With resumeSessions, the session (ticket) from
+# the last connection is offered on the next one, so the target can
+# skip the full handshake.  Works for plain sockets and for the
+# SSLObjects asyncio makes under --concurrency
+#
+#------------------------------------------------------------------
+
+import ssl
+
+# SSLContext that hands resumableSession to every new connection
+class _ResumingContext(ssl.SSLContext):
+    resumableSession = None
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        if self.resumableSession is not None and kwargs.get("session") is None:
+            kwargs["session"] = self.resumableSession
+        return super(_ResumingContext, self).wrap_socket(sock, *args, **kwargs)
+
+    def wrap_bio(self, incoming, outgoing, *args, **kwargs):
+        if self.resumableSession is not None and kwargs.get("session") is None:
+            kwargs["session"] = self.resumableSession
+        return super(_ResumingContext, self).wrap_bio(incoming, outgoing, *args, **kwargs)
+
+class TlsTransport(object):
+    # resumeSessions - offer the last connection's session on the next one
+    # stats - Stats to count full and resumed handshakes in, or None
+    def __init__(self, resumeSessions=False, stats=None):
+        self.resumeSessions = resumeSessions
+        self.stats = stats
+        self.context = _ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.context.check_hostname = False
+        self.context.verify_mode = ssl.CERT_NONE
+        try:
+            # Don't refuse old targets the old ssl.wrap_socket() would talk to
+            self.context.minimum_version = ssl.TLSVersion.MINIMUM_SUPPORTED
+        except (AttributeError, ValueError):
+            pass
+
+    # Wraps an unconnected socket, the handshake happens on connect()
+    def wrapSocket(self, sock):
+        return self.context.wrap_socket(sock)
+
+    # sslObject - SSLSocket or SSLObject that finished its handshake
+    def recordHandshake(self, sslObject):
+        if self.stats is None:
+            return
+        if sslObject.session_reused:
+            self.stats.increment("TLS sessions resumed")
+        else:
+            self.stats.increment("TLS full handshakes")
+
+    # Call once the conversation is over, TLS 1.3 servers only send
+    # their ticket after the handshake so it's not there any sooner
+    def saveSession(self, sslObject):
+        if not self.resumeSessions or sslObject is None:
+            return
+        try:
+            session = sslObject.session
+        except (ValueError, ssl.SSLError):
+            return
+        if session is not None and (session.has_ticket or sslObject.version() != "TLSv1.3"):
+            self.context.resumableSession = session
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Runs several copies of mutiny.py in parallel (--workers N) and
+# collects what they report
+#
+# Every worker is a full Mutiny process with its own socket, message
+# processor, monitor and logger subdirectory, fuzzing its own share
+# of the seeds.  Workers report crashes, halts and their final stats
+# to the parent as JSON lines over a pipe; a halt from any worker
+# stops all of them.
+#
+# Crash attribution is approximate.  All workers fuzz the same target,
+# so when it dies every worker whose monitor notices blames the seed
+# it happened to be running, and the case that really caused it may
+# be in another worker.  Crashes reported close together by different
+# workers are flagged in the summary; rerun those seeds on their own
+# to find the culprit.
+#
+#------------------------------------------------------------------
+
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+
+# Used by a worker to report to the parent
+class WorkerChannel(object):
+    def __init__(self, workerIndex, fd):
+        self.workerIndex = workerIndex
+        self._file = os.fdopen(fd, "w", 1)
+
+    # event - "crash", "halt" or "stats", fields depend on the event
+    def send(self, event, **fields):
+        fields["event"] = event
+        fields["worker"] = self.workerIndex
+        try:
+            self._file.write(json.dumps(fields) + "\n")
+        except (IOError, OSError, ValueError):
+            # Parent is gone, nobody left to tell
+            pass
+
+class WorkerPool(object):
+    # commandLines - one argv list per worker, the status fd number is
+    #   appended to each as "--workerStatusFd N"
+    # outputPaths - per worker file to send stdout/stderr to, or None
+    #   to share the parent's terminal
+    def __init__(self, commandLines, outputPaths):
+        self.commandLines = commandLines
+        self.outputPaths = outputPaths
+        # Counter name => total over all workers
+        self.counters = {}
+        # (worker, seed, message, time received) for every crash logged
+        self.crashes = []
+        self.haltReason = None
+        self._workers = []
+
+    def _spawn(self, workerIndex):
+        (readFd, writeFd) = os.pipe()
+        commandLine = self.commandLines[workerIndex] + ["--workerStatusFd", str(writeFd)]
+        output = None
+        if self.outputPaths[workerIndex]:
+            output = open(self.outputPaths[workerIndex], "w")
+        process = subprocess.Popen(commandLine, pass_fds=(writeFd,), stdout=output, stderr=subprocess.STDOUT if output else None)
+        os.close(writeFd)
+        if output:
+            output.close()
+        return (process, os.fdopen(readFd, "r"))
+
+    def _handle(self, line):
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            return
+        if fields["event"] == "crash":
+            self.crashes.append((fields["worker"], fields["seed"], fields["message"], time.time()))
+            print("[worker %d] crash logged for seed %d: %s" % (fields["worker"], fields["seed"], fields["message"]))
+        elif fields["event"] == "halt":
+            print("[worker %d] halting at seed %d: %s" % (fields["worker"], fields["seed"], fields["message"]))
+            if self.haltReason is None:
+                self.haltReason = fields["message"]
+                self.stop()
+        elif fields["event"] == "stats":
+            for name in fields["counters"]:
+                self.counters[name] = self.counters.get(name, 0) + fields["counters"][name]
+
+    # Crashes another worker also reported within window seconds, any of
+    # which could have been caused by the other worker's case
+    def ambiguousCrashes(self, window):
+        ambiguous = []
+        for crash in self.crashes:
+            for other in self.crashes:
+                if other[0] != crash[0] and abs(other[3] - crash[3]) <= window:
+                    ambiguous.append(crash)
+                    break
+        return ambiguous
+
+    # Interrupt every worker still running, they log and exit cleanly on SIGINT
+    def stop(self):
+        for (process, statusFile) in self._workers:
+            if process.poll() is None:
+                try:
+                    process.send_signal(signal.SIGINT)
+                except OSError:
+                    pass
+
+    # Start all workers and block until they've all exited
+    def run(self):
+        self._workers = [self._spawn(i) for i in range(0, len(self.commandLines))]
+        openFiles = [statusFile for (process, statusFile) in self._workers]
+        while openFiles:
+            try:
+                (readable, writable, errored) = select.select(openFiles, [], [])
+            except KeyboardInterrupt:
+                # Workers got the same SIGINT from the terminal, make sure
+                # and keep reading so their final stats still come in
+                self.stop()
+                continue
+            for statusFile in readable:
+                line = statusFile.readline()
+                if line:
+                    self._handle(line)
+                else:
+                    # Worker exited
+                    statusFile.close()
+                    openFiles.remove(statusFile)
+        for (process, statusFile) in self._workers:
+            process.wait()
+        return [process.returncode for (process, statusFile) in self._workers]
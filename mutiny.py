@@ -35,6 +35,7 @@
 #
 #------------------------------------------------------------------
 
+import atexit
 import datetime
 import errno
 import importlib
@@ -42,57 +43,106 @@ import os.path
 import os
 import signal
 import socket
+import struct
 import subprocess
 import sys
 import threading
 import time
 import argparse
 import ssl
-from copy import deepcopy
 from backend.proc_director import ProcDirector
-from backend.fuzzer_types import Message, MessageCollection, Logger
+from backend.fuzzer_types import Message, MessageCollection, Logger, RunRecord
 from backend.packets import PROTO,IP
+from backend.raw_transport import RawTransport
+from backend.pacing import Pacer
+from backend.target_health import TargetHealth
+from backend.supervisor import TargetSupervisor
+from backend.fork_server import ForkServer
+from backend.harness import Harness
+from backend.crash_events import RunTimeline, CrashEventsPending
 from mutiny_classes.mutiny_exceptions import *
 from mutiny_classes.message_processor import MessageProcessorExtraParams
 from backend.fuzzerdata import FuzzerData
 from backend.menu_functions import validateNumberRange
+from backend.bloom_filter import BloomFilterChain
+from backend.stats import Stats
+from backend.adaptive_timeout import AdaptiveTimeouts, MIN_TIMEOUT
+from backend.worker_pool import WorkerPool, WorkerChannel
+from backend.mutator import RadamsaMutator, RadamsaPoolMutator, PrefetchMutator, LibRadamsaMutator
+from backend.async_engine import AsyncEngine
+from backend.run_plan import RunPlan
+from backend.framing import StreamReceiver
+from backend.target_endpoint import TargetEndpoint
+from backend.tls_transport import TlsTransport
+from backend.prewarm import ConnectionPrewarmer
+from backend.connection_reuse import ConnectionReuse
+from backend.socket_lifecycle import SocketLifecycle
 
 # Path to Radamsa binary
 RADAMSA=os.path.abspath( os.path.join(__file__, "../radamsa-0.6/bin/radamsa") )
+# Path to libradamsa, used with "mutator libradamsa"
+LIBRADAMSA=os.path.abspath( os.path.join(__file__, "../radamsa-0.6/lib/libradamsa.so") )
 # Whether to print debug info
 DEBUG_MODE=False
 # Test number to start from, 0 default
 MIN_RUN_NUMBER=0
 # Test number to go to, -1 is unlimited
 MAX_RUN_NUMBER=-1
+# How far to advance the test number each run, > 1 for --workers
+RUN_STEP=1
 # For seed loop, finite range to repeat   
 SEED_LOOP = []
 # For dumpraw option, dump into log directory by default, else 'dumpraw'
 DUMPDIR = ""
+# Most buffers to hand sendmsg() at once, stays under IOV_MAX
+SENDMSG_MAX_BUFFERS = 1024
+# How many cases to size the --dedup filter for when the range is unbounded
+DEDUP_DEFAULT_CAPACITY = 1000000
 
-# Takes a socket and outbound data packet (byteArray), sends it out.
+# Takes a socket and outbound data packet, as a list of buffers to send
+# one after the other, sends it out.
 # If debug mode is enabled, we print out the raw bytes
-def sendPacket(connection, addr, outPacketData):
+def sendPacket(connection, addr, outPacketBuffers):
     connection.settimeout(fuzzerData.receiveTimeout)
     if connection.type == socket.SOCK_STREAM:
-        connection.send(outPacketData)
+        if len(outPacketBuffers) == 1:
+            connection.sendall(outPacketBuffers[0])
+        elif hasattr(connection, "sendmsg") and not isinstance(connection, ssl.SSLSocket):
+            sendAllBuffers(connection, outPacketBuffers)
+        else:
+            connection.sendall(bytearray().join(outPacketBuffers))
     else:
-        connection.sendto(outPacketData,addr)
+        # Has to go out as one datagram
+        connection.sendto(bytearray().join(outPacketBuffers),addr)
 
-    print("\tSent %d byte packet" % (len(outPacketData)))
+    print("\tSent %d byte packet" % (sum([len(buffer) for buffer in outPacketBuffers])))
     if DEBUG_MODE:
+        outPacketData = bytearray().join(outPacketBuffers)
         print("\tSent: %s" % (outPacketData))
         print("\tRaw Bytes: %s" % (Message.serializeByteArray(outPacketData)))
 
+# sendall() for a list of buffers, using scatter-gather sendmsg() so
+# they never get copied into one
+def sendAllBuffers(connection, buffers):
+    views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+    first = 0
+    while first < len(views):
+        sent = connection.sendmsg(views[first:first+SENDMSG_MAX_BUFFERS])
+        # Skip whatever went out, sendmsg() can stop anywhere
+        while first < len(views) and sent >= len(views[first]):
+            sent -= len(views[first])
+            first += 1
+        if sent:
+            views[first] = views[first][sent:]
 
-def receivePacket(connection, addr, bytesToRead):
+def receivePacket(connection, addr, bytesToRead, timeout):
     readBufSize = 4096
-    connection.settimeout(fuzzerData.receiveTimeout)
+    connection.settimeout(timeout)
 
     if connection.type == socket.SOCK_STREAM or connection.type == socket.SOCK_DGRAM:
         response = bytearray(connection.recv(readBufSize))
     else:
-        response = bytearray(connection.recvfrom(readBufSize,addr))
+        response = bytearray(connection.recvfrom(readBufSize)[0])
     
     
     if len(response) == 0:
@@ -113,191 +163,260 @@ def receivePacket(connection, addr, bytesToRead):
         print("\tReceived: %s" % (response))
     return response
 
+# Runs the preFuzz, fuzzing and preSend steps on outbound message
+# messageNumber and returns the buffers to send, see
+# RunPlan.prepareOutboundBuffers()
+def prepareOutboundMessage(messageNumber, runRecord, messageProcessor, seed, precomputedMutations=None):
+    mutate = None
+    # Skip fuzzing for seed == -1
+    if seed > -1:
+        def mutate(fuzzedIndex, byteArray):
+            if precomputedMutations != None and byteArray == fuzzedSubcomponents[fuzzedIndex]:
+                # Already mutated this exact input for this seed
+                return bytearray(precomputedMutations[fuzzedIndex])
+            return mutator.mutate(seed, byteArray)
+    return runPlan.prepareOutboundBuffers(messageNumber, runRecord, messageProcessor, mutate)
+
 # Perform a fuzz run.  
 # If seed is -1, don't perform fuzzing (test run)
-def performRun(fuzzerData, host, logger, messageProcessor, seed=-1):
+# precomputedMutations, if given, holds the output of the mutator for
+# each fuzzed subcomponent's original bytes (see precomputeMutations())
+# nextSeed, if given, is the seed of the run expected after this one,
+# whose connection is opened early with --prewarm
+# runNumber identifies the run to blame when casesPerConnection > 1
+def performRun(fuzzerData, target, logger, messageProcessor, seed=-1, precomputedMutations=None, nextSeed=None, runNumber=-1):
     # Before doing anything, set up logger
     # Otherwise, if connection is refused, we'll log last, but it will be wrong
     if logger != None:
-        logger.resetForNewRun()
-    
-    addrs = socket.getaddrinfo(host,fuzzerData.port)
-    host = addrs[0][4][0]
-    if host == "::1":
-        host = "127.0.0.1"
+        runRecord = logger.resetForNewRun()
+    else:
+        runRecord = RunRecord()
+    runTimeline.add(runNumber, seed, runRecord)
+    # A crash reported since the last run, see logCrashEvents()
+    monitor.checkCrashEvents()
     
-    # cheap testing for ipv6/ipv4/unix
-    # don't think it's worth using regex for this, since the user
-    # will have to actively go out of their way to subvert this.
-    if "." in host:
-        socket_family = socket.AF_INET
-        addr = (host,fuzzerData.port)
-    elif ":" in host:
-        socket_family = socket.AF_INET6 
-        addr = (host,fuzzerData.port)
+    reused = connectionReuse.take() if connectionReuse else None
+    if reused:
+        # Picking up where the last case left off, see casesPerConnection
+        (connection, addr, receiver) = reused
+        messageNumbers = runPlan.reuseMessages
     else:
-        socket_family = socket.AF_UNIX
-        addr = (host)
+        connection = prewarmer.take(seed) if prewarmer else None
+        wasPrewarmed = connection is not None
+        if wasPrewarmed:
+            (connection, addr) = connection
+        else:
+            (connection, addr) = connectToTarget(fuzzerData, target, messageProcessor, seed)
+        if prewarmer and nextSeed is not None:
+            # Overlap the next run's connect (and handshake) with this one
+            prewarmer.prepare(nextSeed)
+        # Reads inbound messages that declare a frame, stream sockets only
+        receiver = StreamReceiver(connection) if connection.type == socket.SOCK_STREAM else None
+        messageNumbers = runPlan.connectionMessages
+
+    if forkServer:
+        # Whatever else went wrong, the copy of the target crashing is
+        # what this run gets logged for
+        try:
+            performConversation(fuzzerData, logger, messageProcessor, runRecord, connection, addr, receiver, seed, precomputedMutations, messageNumbers)
+        finally:
+            crashMessage = forkServer.finishCase(connection)
+            if crashMessage:
+                raise LogCrashException(crashMessage)
+        return
 
-    #just in case filename is like "./asdf" !=> AF_INET
-    if "/" in host:
-        socket_family = socket.AF_UNIX
-        addr = (host)
+    try:
+        gotResponse = performConversation(fuzzerData, logger, messageProcessor, runRecord, connection, addr, receiver, seed, precomputedMutations, messageNumbers)
+    except (ConnectionError, ConnectionClosedException) as e:
+        if reused:
+            # Either the target hung up between cases (keep-alive limit,
+            # idle timeout) or this case broke it.  Try again on a new
+            # connection, and if that fails, blame this case too
+            connectionReuse.close()
+            connectionReuse.caseFinished(runNumber, runRecord, False)
+            stats.increment("Reused connections closed by the target")
+            raise RetryCurrentRunException("Reused connection failed (%s), retrying on a new connection" % (str(e)))
+        if not wasPrewarmed or isinstance(e, ConnectionClosedException):
+            raise
+        # The target may have gone away (e.g. crashed on the last run)
+        # after this connection was opened, give the run a fresh one
+        # so it's the connect that fails, like it would have without --prewarm
+        stats.increment("Prewarmed connections retried")
+        raise RetryCurrentRunException("Prewarmed connection failed (%s), retrying on a new connection" % (str(e)))
+    except:
+        if connectionReuse:
+            # Don't know what state the conversation is in, start over
+            connectionReuse.close()
+        raise
+
+    if connectionReuse:
+        if not reused:
+            connectionReuse.keep(connection, addr, receiver)
+        connectionReuse.caseFinished(runNumber, runRecord, gotResponse)
+    elif not rawTransport:
+        connection.close()
+
+# Calls preConnect() for seed, then opens the connection for a run.
+# Returns (connection, addr)
+def connectToTarget(fuzzerData, target, messageProcessor, seed):
+    # Resolved once at startup, see backend/target_endpoint.py
+    (socket_family, addr, host) = target.next()
     
     # Call messageprocessor preconnect callback if it exists
-    try:
-        messageProcessor.preConnect(seed, host, fuzzerData.port) 
-    except AttributeError:
-        pass
+    if "preConnect" in runPlan.hooks:
+        try:
+            messageProcessor.preConnect(seed, host, fuzzerData.port) 
+        except AttributeError:
+            pass
+
+    if forkServer:
+        # The other end goes to a fresh copy of the target
+        return (forkServer.connect(), None)
+    if harness:
+        return (harness.connect(), None)
     
     # for TCP/UDP/RAW support
     if fuzzerData.proto == "tcp":
-        connection = socket.socket(socket_family,socket.SOCK_STREAM)
-        # Don't connect yet, until after we do any binding below
+        # Binds (as necessary) and connects, see backend/socket_lifecycle.py
+        connection = socketLifecycle.connect(lambda: socket.socket(socket_family,socket.SOCK_STREAM), addr)
     elif fuzzerData.proto == "tls":
-        try:
-            _create_unverified_https_context = ssl._create_unverified_context
-        except AttributeError:
-            # Legacy Python that doesn't verify HTTPS certificates by default
-            pass
-        else:
-            # Handle target environment that doesn't support HTTPS verification
-            ssl._create_default_https_context = _create_unverified_https_context
-        tcpConnection = socket.socket(socket_family,socket.SOCK_STREAM)
-        connection = ssl.wrap_socket(tcpConnection)
-        # Don't connect yet, until after we do any binding below
+        connection = socketLifecycle.connect(lambda: tlsTransport.wrapSocket(socket.socket(socket_family,socket.SOCK_STREAM)), addr)
+        tlsTransport.recordHandshake(connection)
     elif fuzzerData.proto == "udp":
         connection = socket.socket(socket_family,socket.SOCK_DGRAM)
-    # PROTO = dictionary of assorted L3 proto => proto number
-    # e.g. "icmp" => 1
-    elif fuzzerData.proto in PROTO:
-        connection = socket.socket(socket_family,socket.SOCK_RAW,PROTO[fuzzerData.proto]) 
-        if fuzzerData.proto != "raw":
-            connection.setsockopt(socket.IPPROTO_IP,socket.IP_HDRINCL,0)
-        addr = (host,0)
-        try:
-            connection = socket.socket(socket_family,socket.SOCK_RAW,PROTO[fuzzerData.proto]) 
-        except Exception as e:
-            print(e)
-            print("Unable to create raw socket, please verify that you have sudo access")
-            sys.exit(0)
-    elif fuzzerData.proto == "L2raw":
-        connection = socket.socket(socket.AF_PACKET,socket.SOCK_RAW,0x0300)
     else:
-        addr = (host,0)
+        # PROTO names (e.g. "icmp" => 1), L2raw, or a protocol number.
+        # One socket for the whole campaign, see backend/raw_transport.py
+        if fuzzerData.proto != "L2raw":
+            addr = (host,0)
         try:
-            #test if it's a valid number 
-            connection = socket.socket(socket_family,socket.SOCK_RAW,int(fuzzerData.proto)) 
-            connection.setsockopt(socket.IPPROTO_IP,socket.IP_HDRINCL,0)
+            connection = rawTransport.getSocket(socket_family)
         except Exception as e:
             print(e)
             print("Unable to create raw socket, please verify that you have sudo access")
             sys.exit(0)
         
-    if fuzzerData.proto == "tcp" or fuzzerData.proto == "udp" or fuzzerData.proto == "tls":
+    if fuzzerData.proto == "udp":
+        # Socket options, and binding to sourceIP/sourcePort if they're set
         # Specifying source port or address is only supported for tcp and udp currently
-        if fuzzerData.sourcePort != -1:
-            # Only support right now for tcp or udp, but bind source port address to something
-            # specific if requested
-            if fuzzerData.sourceIP != "" or fuzzerData.sourceIP != "0.0.0.0":
-                connection.bind((fuzzerData.sourceIP, fuzzerData.sourcePort))
-            else:
-                # User only specified a port, not an IP
-                connection.bind(('0.0.0.0', fuzzerData.sourcePort))
-        elif fuzzerData.sourceIP != "" and fuzzerData.sourceIP != "0.0.0.0":
-            # No port was specified, so 0 should auto-select
-            connection.bind((fuzzerData.sourceIP, 0))
-    if fuzzerData.proto == "tcp" or fuzzerData.proto == "tls":
-        # Now that we've had a chance to bind as necessary, connect
-        connection.connect(addr)
-
-    i = 0   
-    for i in range(0, len(fuzzerData.messageCollection.messages)):
-        message = fuzzerData.messageCollection.messages[i]
-        
-        # Go ahead and revert any fuzzing or messageprocessor changes before proceeding
-        message.resetAlteredMessage()
+        socketLifecycle.prepare(connection)
+    return (connection, addr)
 
-        if message.isOutbound():
-            # Primarily used for deciding how to handle preFuzz/preSend callbacks
-            doesMessageHaveSubcomponents = len(message.subcomponents) > 1
+# Sends and receives messageNumbers on connection.  Returns whether
+# the target answered after the last message sent
+def performConversation(fuzzerData, logger, messageProcessor, runRecord, connection, addr, receiver, seed, precomputedMutations, messageNumbers):
+    gotResponse = False
+    # --dedup: the fuzzed messages as they go out
+    caseKey = None
+    if deduplicator and seed > -1:
+        caseKey = bytearray()
+        lastFuzzed = max([n for n in messageNumbers if runPlan.messages[n].isFuzzed and runPlan.messages[n].isOutbound] or [-1])
+    for i in messageNumbers:
+        plan = runPlan.messages[i]
 
-            # Get original subcomponents for outbound callback only once
-            originalSubcomponents = [subcomponent.getOriginalByteArray() for subcomponent in message.subcomponents]
-            
-            if doesMessageHaveSubcomponents:
-                # For message with subcomponents, call prefuzz on fuzzed subcomponents
-                for j in range(0, len(message.subcomponents)):
-                    subcomponent = message.subcomponents[j] 
-                    # Note: we WANT to fetch subcomponents every time on purpose
-                    # This way, if user alters subcomponent[0], it's reflected when
-                    # we call the function for subcomponent[1], etc
-                    actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
-                    prefuzz = messageProcessor.preFuzzSubcomponentProcess(subcomponent.getAlteredByteArray(), MessageProcessorExtraParams(i, j, subcomponent.isFuzzed, originalSubcomponents, actualSubcomponents))
-                    subcomponent.setAlteredByteArray(prefuzz)
-            else:
-                # If no subcomponents, call prefuzz on ENTIRE message
-                actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
-                prefuzz = messageProcessor.preFuzzProcess(actualSubcomponents[0], MessageProcessorExtraParams(i, -1, message.isFuzzed, originalSubcomponents, actualSubcomponents))
-                message.subcomponents[0].setAlteredByteArray(prefuzz)
-
-            # Skip fuzzing for seed == -1
-            if seed > -1:
-                # Now run the fuzzer for each fuzzed subcomponent
-                for subcomponent in message.subcomponents:
-                    if subcomponent.isFuzzed:
-                        radamsa = subprocess.Popen([RADAMSA, "--seed", str(seed)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                        byteArray = subcomponent.getAlteredByteArray()
-                        (fuzzedByteArray, error_output) = radamsa.communicate(input=byteArray)
-                        fuzzedByteArray = bytearray(fuzzedByteArray)
-                        subcomponent.setAlteredByteArray(fuzzedByteArray)
-            
-            # Fuzzing has now been done if this message is fuzzed
-            # Always call preSend() regardless for subcomponents if there are any
-            if doesMessageHaveSubcomponents:
-                for j in range(0, len(message.subcomponents)):
-                    subcomponent = message.subcomponents[j] 
-                    # See preFuzz above - we ALWAYS regather this to catch any updates between
-                    # callbacks from the user
-                    actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
-                    presend = messageProcessor.preSendSubcomponentProcess(subcomponent.getAlteredByteArray(), MessageProcessorExtraParams(i, j, subcomponent.isFuzzed, originalSubcomponents, actualSubcomponents))
-                    subcomponent.setAlteredByteArray(presend)
-            
-            # Always let the user make any final modifications pre-send, fuzzed or not
-            actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
-            byteArrayToSend = messageProcessor.preSendProcess(message.getAlteredMessage(), MessageProcessorExtraParams(i, -1, message.isFuzzed, originalSubcomponents, actualSubcomponents))
+        if plan.isOutbound:
+            buffersToSend = prepareOutboundMessage(i, runRecord, messageProcessor, seed, precomputedMutations)
+            if caseKey is not None and plan.isFuzzed:
+                addToCaseKey(caseKey, buffersToSend)
+                if i == lastFuzzed:
+                    checkCaseKey(bytes(caseKey))
 
             if args.dumpraw:
                 loc = os.path.join(DUMPDIR,"%d-outbound-seed-%d"%(i,args.dumpraw))
-                if message.isFuzzed:
+                if plan.isFuzzed:
                     loc+="-fuzzed"
                 with open(loc,"wb") as f:
-                    f.write(repr(str(byteArrayToSend))[1:-1])
+                    for buffer in buffersToSend:
+                        f.write(buffer)
 
-            sendPacket(connection, addr, byteArrayToSend)
+            # Before sending, the target can crash before sendPacket() returns
+            runRecord.sendTimes.append(time.time())
+            sendPacket(connection, addr, buffersToSend)
+            if plan.isFuzzed and seed > -1:
+                runRecord.sentFuzzed = True
+            if caseKey is not None and i == lastFuzzed:
+                # Only now has the whole case been sent
+                deduplicator.add(bytes(caseKey))
+            gotResponse = False
         else: 
             # Receiving packet from server
-            messageByteArray = message.getAlteredMessage()
-            data = receivePacket(connection,addr,len(messageByteArray))
-            if data == messageByteArray:
+            timeout = receiveTimeouts.getTimeout(i) if receiveTimeouts else fuzzerData.receiveTimeout
+            startTime = time.monotonic()
+            try:
+                if receiver and plan.frame:
+                    data = receiver.receive(plan.frame, timeout)
+                    print("\tReceived %d byte frame" % (len(data)))
+                elif receiver and receiver.hasPending():
+                    # Already read past the last frame, that's what's there
+                    data = receiver.takePending()
+                    print("\tReceived %d bytes" % (len(data)))
+                else:
+                    data = receivePacket(connection,addr,len(plan.originalMessage),timeout)
+            except socket.timeout:
+                if timeout < fuzzerData.receiveTimeout:
+                    stats.increment("Receives cut short by adaptive timeout")
+                if receiveTimeouts:
+                    receiveTimeouts.recordTimeout(i, timeout, runRecord.sentFuzzed)
+                raise
+            runRecord.receiveTimes.append(time.time())
+            if receiveTimeouts:
+                receiveTimeouts.record(i, time.monotonic() - startTime)
+            if data == plan.originalMessage:
                 print("\tReceived expected response")
+            gotResponse = True
+            if connectionReuse:
+                connectionReuse.responseReceived()
             if logger != None:
                 logger.setReceivedMessageData(i, data)
         
-            messageProcessor.postReceiveProcess(data, MessageProcessorExtraParams(i, -1, False, [messageByteArray], [data]))
+            if "postReceiveProcess" in runPlan.hooks:
+                messageProcessor.postReceiveProcess(data, MessageProcessorExtraParams(i, -1, False, plan.originalWhole, [data]))
 
             if args.dumpraw:
                 loc = os.path.join(DUMPDIR,"%d-inbound-seed-%d"%(i,args.dumpraw))
                 with open(loc,"wb") as f:
-                    f.write(repr(str(data))[1:-1])
+                    f.write(data)
 
         if logger != None:  
             logger.setHighestMessageNumber(i)
-        
-
-        i += 1
+        monitor.checkCrashEvents()
     
-    connection.close()
+    if tlsTransport:
+        tlsTransport.saveSession(connection)
+    return gotResponse
+
+# --dedup: a case is identified by the bytes of each of its fuzzed
+# messages, as they're sent
+def addToCaseKey(caseKey, buffers):
+    message = bytearray().join(buffers)
+    caseKey += struct.pack("<I", len(message)) + message
+
+# --dedup: the key of seed's case, if it can be known before connecting,
+# i.e. the message processor doesn't change outbound messages.  None
+# otherwise, the case is then checked in performConversation()
+def precomputeCaseKey(seed, precomputedMutations):
+    if runPlan.hasOutboundHooks:
+        return None
+    caseKey = bytearray()
+    scratchRecord = RunRecord()
+    for i in runPlan.connectionMessages:
+        if runPlan.messages[i].isFuzzed:
+            addToCaseKey(caseKey, prepareOutboundMessage(i, scratchRecord, messageProcessor, seed, precomputedMutations))
+    return bytes(caseKey)
+
+# --dedup: aborts the run if caseKey was already sent, unless it's this
+# iteration's own case being retried
+def checkCaseKey(caseKey):
+    global currentCaseKey
+    if caseKey != currentCaseKey and caseKey in deduplicator:
+        stats.increment("Duplicate cases skipped")
+        raise AbortCurrentRunException("Skipping case, its fuzzed messages came out the same as an earlier case's")
+    currentCaseKey = caseKey
+
+# Mutates every fuzzed subcomponent's original bytes with seed, in the
+# order performRun() visits them
+def precomputeMutations(seed):
+    return [mutator.mutate(seed, byteArray) for byteArray in fuzzedSubcomponents]
 
 # Usage case
 if len(sys.argv) < 3:
@@ -309,13 +428,39 @@ epi = "==" * 24 + '\n'
 
 parser = argparse.ArgumentParser(description=desc,epilog=epi)
 parser.add_argument("prepped_fuzz", help="Path to file.fuzzer")
-parser.add_argument("target_host", help="Target to fuzz")
-parser.add_argument("-s","--sleeptime",help="Time to sleep between fuzz cases (float)",type=float,default=0)
+parser.add_argument("target_host", help="Target to fuzz, a comma separated list of replicas is fuzzed round-robin")
+parser.add_argument("-s","--sleeptime",help="Seconds between fuzz cases, same as --rate 1/sleeptime (float)",type=float,default=0)
+parser.add_argument("--rate", help="Fuzz cases per second across all workers and conversations in flight, 0 = as fast as possible (float)",type=float,default=0)
+parser.add_argument("--burst", help="Cases allowed back to back after the target has been idle, with --rate (int)",type=int,default=1)
+parser.add_argument("--adaptiveRate", help="Treat --rate as a ceiling, backing off while timeouts and errors climb and speeding back up while the target keeps up",action="store_true")
 seed_constraint = parser.add_mutually_exclusive_group()
 seed_constraint.add_argument("-r", "--range", help="Run only the specified cases. Acceptable arg formats: [ X | X- | X-Y ], for integers X,Y") 
 seed_constraint.add_argument("-l", "--loop", help="Loop/repeat the given finite number range. Acceptible arg format: [ X | X-Y | X,Y,Z-Q,R | ...]")
 seed_constraint.add_argument("-d", "--dumpraw", help="Test single seed, dump to 'dumpraw' folder",type=int)
 
+parser.add_argument("--radamsaPool", help="Number of radamsa processes to pre-spawn for upcoming seeds, 0 (default) spawns one per mutation (int)",type=int,default=0)
+parser.add_argument("-m", "--mutator", help="Mutation engine to use, overrides the .fuzzer file: radamsa, libradamsa (outputs differ from radamsa's for the same seed) or native")
+parser.add_argument("--dedup", help="Skip cases whose fuzzed messages would go out byte for byte the same as an earlier case's, remembering sent cases in this file across sessions.  If the message processor changes outbound messages, a case is only checked after connecting, just before its last fuzzed message is sent")
+parser.add_argument("-w", "--workers", help="Number of worker processes to split the seeds across, crashes are blamed on whichever seed the worker that noticed was running (int)",type=int,default=1)
+# Internal, passed by the parent to each worker in --workers mode
+parser.add_argument("--workerIndex", help=argparse.SUPPRESS, type=int)
+parser.add_argument("--workerCount", help=argparse.SUPPRESS, type=int)
+parser.add_argument("--workerStatusFd", help=argparse.SUPPRESS, type=int)
+parser.add_argument("--logDir", help=argparse.SUPPRESS)
+parser.add_argument("-c", "--concurrency", help="Number of conversations to keep in flight at once on an asyncio event loop (int)",type=int,default=1)
+parser.add_argument("--adaptiveTimeout", help="Learn each inbound message's timeout as this many times its p99 response time, backed off on timeouts before any fuzzed data is sent, between --adaptiveTimeoutFloor and receiveTimeout (float, 0 = off)",type=float,default=0)
+parser.add_argument("--adaptiveTimeoutFloor", help="Lowest timeout --adaptiveTimeout will learn, in seconds (float, default %g)" % (MIN_TIMEOUT),type=float,default=MIN_TIMEOUT)
+parser.add_argument("--tlsResume", help="Resume the previous run's TLS session instead of a full handshake on every run (proto tls)",action="store_true")
+parser.add_argument("--prewarm", help="Open the next run's connection (and TLS handshake) while the current run is going, don't use on targets that only take one client at a time (tcp/tls)",action="store_true")
+parser.add_argument("--rstClose", help="Close tcp connections with a RST (SO_LINGER 0) so they don't tie up ports in TIME_WAIT",action="store_true")
+parser.add_argument("--reuseAddr", help="Set SO_REUSEADDR and SO_REUSEPORT on every socket, e.g. to rebind sourcePort right away",action="store_true")
+parser.add_argument("--awaitRestart", help="When the target refuses a connection, wait up to failureTimeout for it to come back (e.g. restarted by the monitor) and log the previous run as a crash, instead of halting",action="store_true")
+parser.add_argument("--targetCommand", help="Launch the target with this command and restart it whenever it exits, logging each exit as a crash")
+parser.add_argument("--forkServer", help="Fork a fresh copy of a local target for every case instead of connecting to target_host: file.py:function to call with the connected socket, or a native command to run with it as stdin/stdout (tcp)")
+parser.add_argument("--forkServerCases", help="Cases each forked copy of the target handles before a fresh one, with --forkServer (int)",type=int,default=1)
+parser.add_argument("--harness", help="Fuzz a Python handler in-process instead of connecting to target_host: file.py:function taking each outbound message and returning the response, or a generator function that's sent the messages and yields the responses")
+parser.add_argument("--prefetch", help="Mutate this many upcoming seeds on background threads, 0 mutates inline (int)",type=int,default=0)
+
 verbosity = parser.add_mutually_exclusive_group()
 verbosity.add_argument("-q", "--quiet", help="Don't log the outputs",action="store_true")
 verbosity.add_argument("--logAll", help="Log all the outputs",action="store_true")
@@ -340,6 +485,57 @@ def getRunNumbersFromArgs(strArgs):
         return (int(strArgs),int(strArgs)) 
 #----------------------------------------------------
 
+#----------------------------------------------------
+# Returns the seed that iteration i of the main loop
+# will fuzz with, or None if there isn't one
+def getSeedForIteration(i):
+    if args.dumpraw:
+        return args.dumpraw
+    if i == MIN_RUN_NUMBER-RUN_STEP and fuzzerData.shouldPerformTestRun:
+        # Test run, nothing gets fuzzed
+        return None
+    if SEED_LOOP:
+        return SEED_LOOP[i%len(SEED_LOOP)]
+    if MAX_RUN_NUMBER >= 0 and i > MAX_RUN_NUMBER:
+        return None
+    return i
+
+# Yields the seeds the main loop will fuzz with, in order,
+# starting at iteration i.  Infinite for --loop and open ranges
+def iterSeeds(i):
+    if args.dumpraw:
+        yield args.dumpraw
+        return
+    while True:
+        seed = getSeedForIteration(i)
+        if seed is None:
+            if i >= MIN_RUN_NUMBER:
+                return
+        else:
+            yield seed
+        i += RUN_STEP
+
+# Yields (iteration, seed) for every fuzzed run from iteration i on,
+# in the order the main loop would perform them
+def iterCases(i):
+    seed = getSeedForIteration(i)
+    while seed is not None:
+        yield (i, seed)
+        i += RUN_STEP
+        seed = getSeedForIteration(i)
+
+# Returns up to count distinct seeds the main loop will
+# fuzz with, starting at iteration i
+def getUpcomingSeeds(i, count):
+    seeds = []
+    for seed in iterSeeds(i):
+        if len(seeds) >= count or seed in seeds:
+            # Enough, or wrapped around the --loop set
+            break
+        seeds.append(seed)
+    return seeds
+#----------------------------------------------------
+
 #Populate global arguments from parseargs
 fuzzerFilePath = args.prepped_fuzz
 host = args.target_host
@@ -349,9 +545,22 @@ if args.range:
 elif args.loop:
     SEED_LOOP = validateNumberRange(args.loop,True) 
 
-#Check for dependency binaries
-if not os.path.exists(RADAMSA):
-    sys.exit("Could not find radamsa in %s... did you build it?" % RADAMSA)
+# In --workers mode, each worker takes every workerCount'th seed
+workerChannel = None
+if args.workerIndex is not None:
+    workerChannel = WorkerChannel(args.workerIndex, args.workerStatusFd)
+    if SEED_LOOP:
+        SEED_LOOP = SEED_LOOP[args.workerIndex::args.workerCount]
+        if not SEED_LOOP:
+            sys.exit(0)
+    else:
+        MIN_RUN_NUMBER += args.workerIndex
+        RUN_STEP = args.workerCount
+        if MAX_RUN_NUMBER >= 0 and MIN_RUN_NUMBER > MAX_RUN_NUMBER:
+            sys.exit(0)
+    if args.dedup:
+        # Workers see disjoint seeds, so each keeps its own filter
+        args.dedup = "%s.worker-%d" % (args.dedup, args.workerIndex)
 
 #Logging options
 isReproduce = False
@@ -364,11 +573,158 @@ elif args.logAll:
 
 
 outputDataFolderPath = os.path.join("%s_%s" % (os.path.splitext(fuzzerFilePath)[0], "logs"), datetime.datetime.now().strftime("%Y-%m-%d,%H%M%S"))
+if args.logDir:
+    outputDataFolderPath = args.logDir
 fuzzerFolder = os.path.abspath(os.path.dirname(fuzzerFilePath))
 
+#----------------------------------------------------
+# --workers: crashes reported by different workers this many seconds
+# apart are flagged as possibly caused by each other's cases
+CRASH_ATTRIBUTION_WINDOW = 5.0
+
+# Parent side of --workers: start one mutiny.py per worker,
+# wait for them all and summarize.  Never returns
+def runWorkers():
+    if args.dumpraw:
+        sys.exit("--workers can't be used with --dumpraw")
+    if args.targetCommand:
+        sys.exit("--workers can't be used with --targetCommand, every worker would launch its own target")
+    if not isReproduce:
+        print("Logging to %s, one subdirectory per worker" % (outputDataFolderPath))
+        os.makedirs(outputDataFolderPath)
+
+    commandLines = []
+    outputPaths = []
+    for workerIndex in range(0, args.workers):
+        commandLine = [sys.executable, os.path.abspath(__file__)] + sys.argv[1:]
+        commandLine += ["--workers", "1", "--workerIndex", str(workerIndex), "--workerCount", str(args.workers)]
+        if isReproduce:
+            outputPaths.append(None)
+        else:
+            commandLine += ["--logDir", os.path.join(outputDataFolderPath, "worker-%d" % (workerIndex))]
+            outputPaths.append(os.path.join(outputDataFolderPath, "worker-%d.out" % (workerIndex)))
+        commandLines.append(commandLine)
+
+    print("Starting %d workers" % (args.workers))
+    stats = Stats()
+    pool = WorkerPool(commandLines, outputPaths)
+    pool.run()
+
+    stats.counters.update(pool.counters)
+    stats.printSummary()
+    # Workers share the target, so a crash one of them saw may have been
+    # caused by whatever another worker sent around the same time
+    ambiguous = pool.ambiguousCrashes(CRASH_ATTRIBUTION_WINDOW)
+    for crash in pool.crashes:
+        (workerIndex, seed, message, received) = crash
+        print("\tCrash: seed %d (worker %d): %s" % (seed, workerIndex, message))
+        if crash in ambiguous:
+            print("\t\tAnother worker crashed within %.0f seconds, this seed may not be the cause" % (CRASH_ATTRIBUTION_WINDOW))
+    if pool.haltReason:
+        print("Halted: %s" % (pool.haltReason))
+    sys.exit(0)
+
+if args.concurrency > 1 and args.dumpraw:
+    sys.exit("--concurrency can't be used with --dumpraw")
+
+if args.forkServer and args.concurrency > 1:
+    sys.exit("--concurrency can't be used with --forkServer")
+if args.forkServer and args.targetCommand:
+    sys.exit("--forkServer and --targetCommand can't be used together, the fork server already runs the target")
+
+if args.harness and args.concurrency > 1:
+    sys.exit("--concurrency can't be used with --harness")
+if args.harness and (args.targetCommand or args.forkServer):
+    sys.exit("--harness can't be used with --targetCommand or --forkServer, it calls the target itself")
+
+if args.workers > 1 and args.workerIndex is None:
+    runWorkers()
+
+# Tell the --workers parent about something, if there is one
+def reportToParent(event, **fields):
+    if workerChannel:
+        workerChannel.send(event, **fields)
+
+# Seed being fuzzed at iteration i, -1 for the test run
+def getReportedSeed(i):
+    seed = getSeedForIteration(i)
+    return -1 if seed is None else seed
+
+# --awaitRestart: run i's connection was refused.  If the target comes
+# back within failureTimeout, the previous run is logged as the crash
+# (only the first time for run i) and True is returned to retry run i
+def awaitTargetRestart(i, failureCount, incident):
+    print("Connection refused, waiting up to %d seconds for the target to come back..." % (fuzzerData.failureTimeout))
+    if not targetHealth.waitUntilReady(incident):
+        print("Target didn't come back")
+        return False
+    message = "Connection refused, target came back after %.2f seconds" % (incident.waited)
+    print(message)
+    if failureCount == 0:
+        logPreviousRun(i, message)
+    return True
+
+# The target was already down when run i started, so log the run
+# before it, unless that was the test run
+def logPreviousRun(i, errorMessage):
+    if i <= MIN_RUN_NUMBER:
+        return
+    reportToParent("crash", seed=getReportedSeed(i-RUN_STEP), message=errorMessage)
+    if logger:
+        logger.outputLastLog(i-RUN_STEP, fuzzerData.messageCollection, errorMessage)
+    logUnconfirmedRuns(i-RUN_STEP, errorMessage)
+
+# Logs each crash the monitors have reported against the run(s) it's
+# blamed on, see backend/crash_events.py.  Returns whether run i was
+def logCrashEvents(i):
+    isRunBlamed = False
+    for crashEvent in monitor.takeCrashEvents():
+        crashMessage = crashEvent.describe()
+        print(crashMessage)
+        runs = runTimeline.findRuns(crashEvent.timestamp)
+        if not runs:
+            # Before anything was sent, all we can do is log this run
+            isRunBlamed = True
+            reportToParent("crash", seed=getReportedSeed(i), message=crashMessage)
+            if logger:
+                logger.outputLog(i, fuzzerData.messageCollection, crashMessage)
+            continue
+        for (runNumber, seed, runRecord) in runs:
+            message = crashMessage
+            if len(runs) > 1:
+                message += " (one of %d runs the target hadn't answered)" % (len(runs))
+            if runNumber == i:
+                isRunBlamed = True
+            else:
+                print("Blaming run %d, which was sent before the crash" % (runNumber))
+            reportToParent("crash", seed=seed, message=message)
+            if logger:
+                logger.outputRunLog(runNumber, fuzzerData.messageCollection, message, runRecord)
+    if connectionReuse:
+        # Already blamed if they hadn't been answered
+        connectionReuse.takeUnconfirmedRuns()
+    return isRunBlamed
+
+# With casesPerConnection, any case sent since the target last answered
+# could be the one that crashed it, log them along with loggedRunNumber
+def logUnconfirmedRuns(loggedRunNumber, errorMessage):
+    if not connectionReuse:
+        return
+    loggedRunNumbers = set([loggedRunNumber])
+    for (runNumber, runRecord) in connectionReuse.takeUnconfirmedRuns():
+        if runNumber in loggedRunNumbers:
+            continue
+        loggedRunNumbers.add(runNumber)
+        message = "%s (sent before run %d, no response from the target since)" % (errorMessage, loggedRunNumber)
+        reportToParent("crash", seed=getReportedSeed(runNumber), message=message)
+        if logger:
+            logger.outputRunLog(runNumber, fuzzerData.messageCollection, message, runRecord)
+#----------------------------------------------------
+
 ########## Declare variables for scoping, "None"s will be assigned below
 messageProcessor = None
 monitor = None
+mutator = None
 
 ###Here we read in the fuzzer file into a dictionary for easier variable propagation
 optionDict = {"unfuzzedBytes":{}, "message":[]}
@@ -376,6 +732,12 @@ optionDict = {"unfuzzedBytes":{}, "message":[]}
 fuzzerData = FuzzerData()
 print("Reading in fuzzer data from %s..." % (fuzzerFilePath))
 fuzzerData.readFromFile(fuzzerFilePath)
+mutatorName = args.mutator if args.mutator else fuzzerData.mutator
+
+#Check for dependency binaries
+# libradamsa still needs radamsa to fall back on
+if mutatorName != "native" and not os.path.exists(RADAMSA):
+    sys.exit("Could not find radamsa in %s... did you build it?" % RADAMSA)
 
 ######## Processor Setup ################
 # The processor just acts as a container #
@@ -398,10 +760,20 @@ else:
 #Create class director, which import/overrides processors as appropriate
 procDirector = ProcDirector(processorDirectory)
 
+try:
+    target = TargetEndpoint(host, fuzzerData.port)
+except socket.gaierror as e:
+    sys.exit("Unable to resolve target %s: %s" % (host, str(e)))
+print("Target: %s" % (target))
+
 ########## Launch child monitor thread
     ### monitor.task = spawned thread
-    ### monitor.crashEvent = threading.Event()
-monitor = procDirector.startMonitor(host,fuzzerData.port)
+    ### monitor.takeCrashEvents() = crashes it's reported, see backend/crash_events.py
+    ### monitor.restartEvent = threading.Event(), see signalTargetRestarted()
+monitor = procDirector.startMonitor(target.hosts[0],fuzzerData.port)
+target.restartEvent = monitor.restartEvent
+# Recent runs, to work out which of them a reported crash was down to
+runTimeline = RunTimeline()
 
 #! make it so logging message does not appear if reproducing (i.e. -r x-y cmdline arg is set)
 logger = None 
@@ -425,59 +797,289 @@ if args.dumpraw:
 exceptionProcessor = procDirector.exceptionProcessor()
 messageProcessor = procDirector.messageProcessor()
 
-# Set up signal handler for CTRL+C and signals from child monitor thread
-# since this is the same signal, we use the monitor.crashEvent flag()
-# to differentiate between a CTRL+C and a interrupt_main() call from child 
+######## Mutator Setup ###################
+runPlan = RunPlan(fuzzerData.messageCollection, procDirector.messageProcessorHooks)
+# Each seed is handed to the mutator once per fuzzed subcomponent
+fuzzedSubcomponents = runPlan.fuzzedInputs
+fuzzedSubcomponentCount = len(fuzzedSubcomponents)
+# How many seeds ahead the radamsa pool gets warmed, 0 = not in use
+poolLookahead = 0
+
+# Engine picked by the user, None means the radamsa binary
+engine = None
+if mutatorName == "native":
+    try:
+        from backend.native_mutator import NativeMutator
+    except ImportError as e:
+        sys.exit("The native mutator requires numpy: %s" % (str(e)))
+    engine = NativeMutator()
+elif mutatorName == "libradamsa":
+    try:
+        engine = LibRadamsaMutator(LIBRADAMSA)
+        print("Using libradamsa from %s" % (LIBRADAMSA))
+        print("Its outputs differ from the radamsa binary's, reproduce crashes with --mutator libradamsa")
+    except OSError as e:
+        print("Unable to load libradamsa (%s), falling back to %s" % (str(e), RADAMSA))
+elif mutatorName != "radamsa":
+    sys.exit("Unknown mutator: %s" % (mutatorName))
+
+if args.prefetch > 0 and fuzzedSubcomponentCount:
+    # Producer threads spend most of their time blocked on radamsa,
+    # so more threads than cores is fine
+    firstIteration = MIN_RUN_NUMBER-RUN_STEP if fuzzerData.shouldPerformTestRun else MIN_RUN_NUMBER
+    mutator = PrefetchMutator(engine if engine else RadamsaMutator(RADAMSA), iterSeeds(firstIteration), fuzzedSubcomponents, args.prefetch, threads=min(args.prefetch, 4))
+elif engine:
+    mutator = engine
+elif args.radamsaPool > 0:
+    mutator = RadamsaPoolMutator(RADAMSA, args.radamsaPool)
+    poolLookahead = max(1, args.radamsaPool // max(1, fuzzedSubcomponentCount))
+else:
+    mutator = RadamsaMutator(RADAMSA)
+atexit.register(mutator.close)
+
+######## Duplicate Case Elimination ######
+# Bloom filter of the mutations sent so far, None = disabled
+deduplicator = None
+if args.dedup:
+    if args.concurrency > 1:
+        print("Ignoring --dedup, it isn't supported with --concurrency")
+    elif args.loop or args.dumpraw:
+        print("Ignoring --dedup, --loop and --dumpraw repeat cases on purpose")
+    elif fuzzedSubcomponentCount:
+        expectedCases = MAX_RUN_NUMBER-MIN_RUN_NUMBER+1 if MAX_RUN_NUMBER >= 0 else DEDUP_DEFAULT_CAPACITY
+        if os.path.exists(args.dedup):
+            deduplicator = BloomFilterChain.load(args.dedup)
+            print("Loaded %d previously sent cases from %s" % (deduplicator.count, args.dedup))
+            # Sized for an earlier session's range, which may be smaller
+            if deduplicator.reserve(expectedCases):
+                print("Extending it with room for %d more cases" % (expectedCases))
+        else:
+            deduplicator = BloomFilterChain(expectedCases)
+        atexit.register(deduplicator.save, args.dedup)
+
+stats = Stats()
+atexit.register(stats.printSummary)
+
+# Learned per message receive timeouts, None = always receiveTimeout
+receiveTimeouts = None
+if args.adaptiveTimeout > 0:
+    if args.adaptiveTimeoutFloor <= 0:
+        sys.exit("--adaptiveTimeoutFloor must be above 0")
+    receiveTimeouts = AdaptiveTimeouts(fuzzerData.receiveTimeout, args.adaptiveTimeout, minTimeout=args.adaptiveTimeoutFloor)
+    stats.addSection(receiveTimeouts.getSummary)
+
+# Paces the cases to --rate, see backend/pacing.py
+rate = args.rate
+if args.sleeptime > 0:
+    if rate:
+        sys.exit("--sleeptime and --rate can't be used together")
+    rate = 1.0 / args.sleeptime
+if args.adaptiveRate and not rate:
+    sys.exit("--adaptiveRate needs a --rate to work under")
+if args.workerCount:
+    # Each worker gets its share of the campaign's rate
+    rate /= args.workerCount
+pacer = Pacer(rate, burst=args.burst, adaptive=args.adaptiveRate, stats=stats)
+if rate:
+    stats.addSection(pacer.getSummary)
+
+# One SSLContext for the whole session, None unless proto tls
+tlsTransport = None
+if fuzzerData.proto == "tls" and not args.harness:
+    tlsTransport = TlsTransport(resumeSessions=args.tlsResume, stats=stats)
+    try:
+        # Handle target environment that doesn't support HTTPS verification,
+        # processors making their own https requests may count on this
+        ssl._create_default_https_context = ssl._create_unverified_context
+    except AttributeError:
+        # Legacy Python that doesn't verify HTTPS certificates by default
+        pass
+
+# Probes the target back to health after a crash, see backend/target_health.py
+targetHealth = TargetHealth(fuzzerData, target, tlsTransport, stats)
+stats.addSection(targetHealth.getSummary)
+if args.awaitRestart and args.concurrency > 1:
+    print("Ignoring --awaitRestart, it isn't supported with --concurrency")
+
+# Launches and restarts the target, see backend/supervisor.py
+supervisor = None
+if args.targetCommand:
+    supervisor = TargetSupervisor(args.targetCommand, targetHealth, stats)
+    atexit.register(supervisor.stop)
+    try:
+        supervisor.start()
+    except (OSError, RuntimeError) as e:
+        sys.exit("Unable to launch the target: %s" % (str(e)))
+    monitor.addMonitor(supervisor)
+    stats.addSection(supervisor.getSummary)
+
+# Forks a copy of a local target for every case, see backend/fork_server.py
+forkServer = None
+if args.forkServer:
+    if fuzzerData.proto != "tcp":
+        sys.exit("--forkServer needs proto tcp, the target gets a connected stream socket")
+    forkServer = ForkServer(args.forkServer, args.forkServerCases, hangTimeout=fuzzerData.failureTimeout, stats=stats)
+    atexit.register(forkServer.stop)
+    try:
+        forkServer.start()
+    except (OSError, RuntimeError) as e:
+        sys.exit("Unable to start the fork server: %s" % (str(e)))
+    print("Fork server loaded %s, forking a copy every %d cases" % (args.forkServer, args.forkServerCases))
+    monitor.addMonitor(forkServer)
+
+# Calls a Python target in-process, see backend/harness.py
+harness = None
+if args.harness:
+    try:
+        harness = Harness(args.harness, stats)
+    except Exception as e:
+        sys.exit("Unable to load %s: %s" % (args.harness, str(e)))
+    print("Fuzzing %s in-process, proto %s is ignored" % (args.harness, fuzzerData.proto))
+    stats.addSection(harness.getSummary)
+
+# Socket options and source address rotation for every connection
+socketLifecycle = SocketLifecycle(fuzzerData.getSourceIPs(), fuzzerData.getSourcePorts(),
+                                  rstClose=args.rstClose, reuseAddress=args.reuseAddr, stats=stats)
+if (fuzzerData.proto == "tcp" or fuzzerData.proto == "tls") and not harness:
+    stats.addSection(socketLifecycle.getSummary)
+
+# The campaign's raw socket, None unless proto is a layer 2/3 protocol
+rawTransport = None
+if fuzzerData.proto not in ("tcp", "tls", "udp") and not harness:
+    rawTransport = RawTransport(fuzzerData.proto, target, stats)
+
+# Keeps the connection open between cases, None unless casesPerConnection > 1
+connectionReuse = None
+if fuzzerData.casesPerConnection > 1:
+    if args.concurrency > 1:
+        print("Ignoring casesPerConnection, it isn't supported with --concurrency")
+    elif fuzzerData.proto != "tcp" and fuzzerData.proto != "tls" and not harness:
+        print("Ignoring casesPerConnection, it only applies to tcp and tls")
+    elif forkServer:
+        print("Ignoring casesPerConnection, use --forkServerCases with --forkServer")
+    else:
+        connectionReuse = ConnectionReuse(fuzzerData.casesPerConnection, stats)
+
+# Opens the next run's connection early, None unless --prewarm
+prewarmer = None
+if args.prewarm:
+    if connectionReuse:
+        print("Ignoring --prewarm, casesPerConnection already keeps the connection open")
+    elif args.concurrency > 1:
+        print("Ignoring --prewarm, --concurrency already overlaps connections")
+    elif fuzzerData.proto != "tcp" and fuzzerData.proto != "tls":
+        print("Ignoring --prewarm, it only applies to tcp and tls")
+    elif forkServer:
+        print("Ignoring --prewarm, --forkServer connections don't take any time to open")
+    elif harness:
+        print("Ignoring --prewarm, --harness connections don't take any time to open")
+    elif len(fuzzerData.getSourcePorts()) == 1:
+        print("Ignoring --prewarm, two connections can't both use sourcePort %d" % (fuzzerData.sourcePort))
+    else:
+        # preConnect() for the next seed runs on the prewarm thread,
+        # right before that seed's connection is opened
+        prewarmer = ConnectionPrewarmer(lambda seed: connectToTarget(fuzzerData, target, messageProcessor, seed), stats)
+atexit.register(lambda: reportToParent("stats", counters=dict(stats.counters)))
+
+# Set up signal handler for CTRL+C, monitors report crashes through
+# their queue instead, see checkCrashEvents()
 def sigint_handler(signal, frame):
-    if not monitor.crashEvent.isSet():
-        # No event = quit
-        # Quit on ctrl-c
-        print("\nSIGINT received, stopping\n")
-        sys.exit(0)
+    # Quit on ctrl-c
+    print("\nSIGINT received, stopping\n")
+    sys.exit(0)
 
 signal.signal(signal.SIGINT, sigint_handler)
 
+########## Concurrent fuzzing, see backend/async_engine.py
+if args.concurrency > 1:
+    try:
+        asyncEngine = AsyncEngine(fuzzerData, target, args.concurrency, runPlan, prepareOutboundMessage, procDirector.messageProcessor,
+                                  exceptionProcessor, monitor, stats, logger=logger, logAll=logAll,
+                                  pacer=pacer, reportEvent=reportToParent,
+                                  receiveTimeouts=receiveTimeouts, tlsTransport=tlsTransport,
+                                  socketLifecycle=socketLifecycle, targetHealth=targetHealth)
+    except ValueError as e:
+        sys.exit(str(e))
+    print("Keeping up to %d conversations in flight" % (args.concurrency))
+    asyncEngine.run(iterCases(MIN_RUN_NUMBER), MIN_RUN_NUMBER-RUN_STEP if fuzzerData.shouldPerformTestRun else None)
+    exit()
+
 ########## Begin fuzzing
-i = MIN_RUN_NUMBER-1 if fuzzerData.shouldPerformTestRun else MIN_RUN_NUMBER
+i = MIN_RUN_NUMBER-RUN_STEP if fuzzerData.shouldPerformTestRun else MIN_RUN_NUMBER
 failureCount = 0
+# From the first crash of the current case until fuzzing moves on
+incident = None
 loop_len = len(SEED_LOOP) # if --loop
 
+# Iteration whose case was checked against deduplicator, so retries of
+# the same seed aren't mistaken for duplicates
+dedupIteration = None
+# Its key, once known (see checkCaseKey()).  Keys are only added to
+# deduplicator once the case has actually been sent, so a case that
+# never went out isn't skipped when the session is resumed
+currentCaseKey = None
+precomputedMutations = None
+
 while True:
-    lastMessageCollection = deepcopy(fuzzerData.messageCollection)
+    if deduplicator and i != dedupIteration:
+        seed = getSeedForIteration(i)
+        precomputedMutations = None
+        if seed is not None:
+            dedupIteration = i
+            precomputedMutations = precomputeMutations(seed)
+            currentCaseKey = None
+            caseKey = precomputeCaseKey(seed, precomputedMutations)
+            if caseKey is not None and caseKey in deduplicator:
+                print("\n\nSkipping seed %d, its fuzzed messages came out the same as an earlier case's" % (seed))
+                stats.increment("Duplicate cases skipped")
+                i += RUN_STEP
+                if MAX_RUN_NUMBER >= 0 and i > MAX_RUN_NUMBER:
+                    exit()
+                continue
+            currentCaseKey = caseKey
+
+    if fuzzedSubcomponentCount and poolLookahead:
+        # Warm up radamsa for this seed and the next few while we're here
+        mutator.prefetch(getUpcomingSeeds(i, poolLookahead), fuzzedSubcomponentCount)
     wasCrashDetected = False
-    print("\n** Sleeping for %.3f seconds **" % args.sleeptime)
-    time.sleep(args.sleeptime)
+    pacer.wait()
     
+    stats.increment("Runs performed")
+    nextSeed = getSeedForIteration(i+RUN_STEP) if prewarmer else None
     try:
         try:
             if args.dumpraw:
                 print("\n\nPerforming single raw dump case: %d" % args.dumpraw)
-                performRun(fuzzerData, host, logger, messageProcessor, seed=args.dumpraw)  
-            elif i == MIN_RUN_NUMBER-1:
+                performRun(fuzzerData, target, logger, messageProcessor, seed=args.dumpraw, runNumber=i)  
+            elif i == MIN_RUN_NUMBER-RUN_STEP:
                 print("\n\nPerforming test run without fuzzing...")
-                performRun(fuzzerData, host, logger, messageProcessor, seed=-1) 
+                performRun(fuzzerData, target, logger, messageProcessor, seed=-1, nextSeed=nextSeed, runNumber=i) 
             elif loop_len: 
                 print("\n\nFuzzing with seed %d" % (SEED_LOOP[i%loop_len]))
-                performRun(fuzzerData, host, logger, messageProcessor, seed=SEED_LOOP[i%loop_len]) 
+                performRun(fuzzerData, target, logger, messageProcessor, seed=SEED_LOOP[i%loop_len], nextSeed=nextSeed, runNumber=i) 
             else:
                 print("\n\nFuzzing with seed %d" % (i))
-                performRun(fuzzerData, host, logger, messageProcessor, seed=i) 
+                performRun(fuzzerData, target, logger, messageProcessor, seed=i, precomputedMutations=precomputedMutations, nextSeed=nextSeed, runNumber=i) 
             #if --quiet, (logger==None) => AttributeError
             if logAll:
                 try:
                     logger.outputLog(i, fuzzerData.messageCollection, "LogAll ")
                 except AttributeError:
                     pass
+            pacer.recordRun(failed=False)
                  
         except Exception as e:
-            if monitor.crashEvent.isSet():
-                print("Crash event detected")
-                try:
-                    logger.outputLog(i, fuzzerData.messageCollection, "Crash event detected")
-                    #exit()
-                except AttributeError: 
-                    pass
-                monitor.crashEvent.clear()
+            pacer.recordRun(failed=True)
+            if supervisor:
+                supervisor.waitForCrashReport(monitor, e)
+            if monitor.hasCrashEvents():
+                isRunBlamed = logCrashEvents(i)
+                if not isRunBlamed and failureCount < fuzzerData.failureThreshold and (
+                        isinstance(e, CrashEventsPending) or (supervisor and isinstance(e, ConnectionRefusedError))):
+                    # The crash was down to an earlier run, this one was
+                    # cut short or couldn't connect, so run it again
+                    failureCount += 1
+                    continue
 
             elif logAll:
                 try:
@@ -485,22 +1087,35 @@ while True:
                 except AttributeError:
                     pass
             
-            if e.__class__ in MessageProcessorExceptions.all:
+            if isinstance(e, CrashEventsPending):
+                # Logged above, nothing more to do with this run
+                pass
+            elif e.__class__ in MessageProcessorExceptions.all:
                 # If it's a MessageProcessorException, assume the MP raised it during the run
                 # Otherwise, let the MP know about the exception
                 raise e
             else:
+                if args.awaitRestart and isinstance(e, ConnectionRefusedError) and targetHealth.canProbe() and failureCount < fuzzerData.failureThreshold:
+                    if incident is None:
+                        incident = targetHealth.beginIncident()
+                    if awaitTargetRestart(i, failureCount, incident):
+                        failureCount += 1
+                        continue
                 exceptionProcessor.processException(e)
                 # Will not get here if processException raises another exception
                 print("Exception ignored: %s" % (str(e)))
         
     except LogCrashException as e:
+        if incident is None:
+            incident = targetHealth.beginIncident()
         if failureCount == 0:
             try:
                 print("MessageProcessor detected a crash")
+                reportToParent("crash", seed=getReportedSeed(i), message=str(e))
                 logger.outputLog(i, fuzzerData.messageCollection, str(e))
             except AttributeError:  
                 pass   
+            logUnconfirmedRuns(i, str(e))
 
         if logAll:
             try:
@@ -523,44 +1138,55 @@ while True:
         continue
         
     except LogAndHaltException as e:
+        reportToParent("halt", seed=getReportedSeed(i), message=str(e))
         if logger:
             logger.outputLog(i, fuzzerData.messageCollection, str(e))
             print("Received LogAndHaltException, logging and halting")
         else:
             print("Received LogAndHaltException, halting but not logging (quiet mode)")
+        logUnconfirmedRuns(i, str(e))
         exit()
         
     except LogLastAndHaltException as e:
+        reportToParent("halt", seed=getReportedSeed(i-RUN_STEP), message=str(e))
         if logger:
             if i > MIN_RUN_NUMBER:
                 print("Received LogLastAndHaltException, logging last run and halting")
                 if MIN_RUN_NUMBER == MAX_RUN_NUMBER:
                     #in case only 1 case is run
-                    logger.outputLastLog(i, lastMessageCollection, str(e))
+                    logger.outputLastLog(i, fuzzerData.messageCollection, str(e))
                     print("Logged case %d" % i)
                 else:
-                    logger.outputLastLog(i-1, lastMessageCollection, str(e))
+                    logger.outputLastLog(i-RUN_STEP, fuzzerData.messageCollection, str(e))
             else:
                 print("Received LogLastAndHaltException, skipping logging (due to last run being a test run) and halting")
         else:
             print("Received LogLastAndHaltException, halting but not logging (quiet mode)")
+        logUnconfirmedRuns(i-RUN_STEP, str(e))
         exit()
 
     except HaltException as e:
+        reportToParent("halt", seed=getReportedSeed(i), message=str(e))
         print("Received HaltException halting")
         exit()
 
-    if wasCrashDetected:
-        if failureCount < fuzzerData.failureThreshold:
-            print("Failure %d of %d allowed for seed %d" % (failureCount, fuzzerData.failureThreshold, i))
-            print("The test run didn't complete, continuing after %d seconds..." % (fuzzerData.failureTimeout))
-            time.sleep(fuzzerData.failureTimeout)
+    if wasCrashDetected and failureCount < fuzzerData.failureThreshold:
+        print("Failure %d of %d allowed for seed %d" % (failureCount, fuzzerData.failureThreshold, i))
+        if harness or forkServer:
+            # Nothing to wait for, the target runs on demand
+            print("The test run didn't complete, retrying...")
         else:
-            print("Failed %d times, moving to next test." % (failureCount))
-            failureCount = 0
-            i += 1
+            print("The test run didn't complete, continuing once the target is ready (at most %d seconds)..." % (fuzzerData.failureTimeout))
+            if not targetHealth.waitUntilReady(incident) and targetHealth.canProbe():
+                print("Target still isn't answering, retrying anyway")
     else:
-        i += 1
+        if wasCrashDetected:
+            print("Failed %d times, moving to next test." % (failureCount))
+        failureCount = 0
+        i += RUN_STEP
+        if incident:
+            targetHealth.endIncident(incident)
+            incident = None
     
     # Stop if we have a maximum and have hit it
     if MAX_RUN_NUMBER >= 0 and i > MAX_RUN_NUMBER:
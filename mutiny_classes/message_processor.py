@@ -67,11 +67,32 @@ class MessageProcessorExtraParams(object):
         # transmitted after fuzzing
         self.actualSubcomponents = actualSubcomponents
 
-        # Convenience variable that is literally just all the originalSubcomponents combined
-        self.originalMessage = bytearray().join(self.originalSubcomponents)
-        
-        # Convenience variable that is literally just all the actualSubcomponents combined
-        self.actualMessage = bytearray().join(self.actualSubcomponents)
+        # originalMessage and actualMessage below are only joined if used
+        self._originalMessage = None
+        self._actualMessage = None
+
+    # Convenience variable that is literally just all the originalSubcomponents combined
+    @property
+    def originalMessage(self):
+        if self._originalMessage is None:
+            self._originalMessage = bytearray().join(self.originalSubcomponents)
+        return self._originalMessage
+
+    # Processors could always assign these, keep that working
+    @originalMessage.setter
+    def originalMessage(self, value):
+        self._originalMessage = value
+
+    # Convenience variable that is literally just all the actualSubcomponents combined
+    @property
+    def actualMessage(self):
+        if self._actualMessage is None:
+            self._actualMessage = bytearray().join(self.actualSubcomponents)
+        return self._actualMessage
+
+    @actualMessage.setter
+    def actualMessage(self, value):
+        self._actualMessage = value
 
 class MessageProcessor(object):
     def __init__(self):
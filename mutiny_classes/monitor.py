@@ -48,5 +48,20 @@ class Monitor(object):
         #       signalMain()
         #
         # Calling signalMain() at any time will indicate to Mutiny
-        # that the target has crashed and a crash should be logged
+        # that the target has crashed and a crash should be logged.
+        # signalMain("details") adds details (exit status, a log line,
+        # etc) to the logged crash.  It can also be given
+        #   timestamp=  time.time() the crash happened, if it was before
+        #               the call (e.g. a core file's mtime)
+        #   signal=     signal number the target died on
+        #   corePath=   where the target dumped core
+        #   logExcerpt= the end of the target's log
+        # The crash is logged against the run(s) that had sent the
+        # target something it hadn't answered by then, so a late
+        # signalMain() still blames the right seed
+        #
+        # If the target comes back up somewhere else (e.g. a restarted
+        # container with a new IP), call self.signalTargetRestarted()
+        # and Mutiny will resolve the target's address again before
+        # the next run
         pass
@@ -117,11 +117,11 @@ def client_handler(cli_sock,cli_addr=None,udp=False):
         ip = cli_addr[0]
         port = cli_addr[1] 
         cli_sock.settimeout(TIMEOUT)
-        fs = fuzz_session(ip,port,-1,-1,None)
+        fs = fuzz_session(ip.encode(),port,-1,-1,None)
     except:
         ip = "fdsa"
         cli_sock.settimeout(TIMEOUT)
-        fs = fuzz_session(ip,-1,-1,-1,None)
+        fs = fuzz_session(ip.encode(),-1,-1,-1,None)
 
 #generate log file name
     timestamp = localtime()
@@ -139,14 +139,14 @@ def client_handler(cli_sock,cli_addr=None,udp=False):
 # 4 byte - number of test cases 
     if not udp:
         try:
-            msg = cli_sock.recv(4096).split('.')
+            msg = cli_sock.recv(4096).split(b'.')
             print("asdf")
         except:
             pass
     else:
         try:
             msg,addr = cli_sock.recvfrom(4096)
-            msg = msg.split('.')
+            msg = msg.split(b'.')
             print("Msg from %s:%d"%addr)
         except Exception as e:
             return
@@ -203,9 +203,9 @@ def client_handler(cli_sock,cli_addr=None,udp=False):
         print("status: %d" % (i,))
     
     if udp:
-        cli_sock.sendto("[^.^] Launching %d testcases for pid %d" % (fs.tc_len,fs.tc_len),addr) 
+        cli_sock.sendto(("[^.^] Launching %d testcases for pid %d" % (fs.tc_len,fs.tc_len)).encode(),addr) 
     else:
-        cli_sock.send("[^.^] Launching %d testcases for pid %d" % (fs.tc_len,fs.tc_len)) 
+        cli_sock.send(("[^.^] Launching %d testcases for pid %d" % (fs.tc_len,fs.tc_len)).encode()) 
     
 if __name__ == '__main__':
     
@@ -113,14 +113,14 @@ class MessageProcessor(object):
         
         # If message indicates fault, raise LogCrashException("reason")
         if extraParams.messageNumber == 3 or extraParams.messageNumber == 5:
-            if len(message) == 0 or (message != bytearray("OK\n") and message != bytearray("INVALID\n")):
+            if len(message) == 0 or (message != bytearray(b"OK\n") and message != bytearray(b"INVALID\n")):
                 print(message)
                 raise LogCrashException("Server response was not OK or INVALID")
             
         # The server should have sent a message number, store it
         if extraParams.messageNumber == 1:
-            self.sessionNumber = str(message[:-1])
+            self.sessionNumber = bytes(message[:-1])
             # A little kludgy, the expected message contains the token
             # from the originally recorded session, makes for an easy
             # substitution in preFuzzProcess() later
-            self.oldSessionNumber = str(extraParams.originalMessage[:-1])
+            self.oldSessionNumber = bytes(extraParams.originalMessage[:-1])
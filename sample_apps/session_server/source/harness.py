@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+#
+# server.py's conversation as a --harness session, e.g.
+#   ./mutiny.py --harness sample_apps/session_server/source/harness.py:session \
+#       sample_apps/session_server/data/session_server-3.fuzzer localhost
+#
+
+import random
+
+STATE_COMMANDS = (b"auth", b"quit", b"do_stuff")
+
+def session():
+	data = yield
+	while data.rstrip() != STATE_COMMANDS[0]:
+		data = yield b"INVALID\n"
+	token = str(random.randint(1, 100)).encode()
+	data = yield token + b"\n"
+	while True:
+		data = data.rstrip()
+		if data[-len(token):] != token:
+			data = yield b"INVALID\n"
+		elif data[0:len(STATE_COMMANDS[1])] == STATE_COMMANDS[1]:
+			yield b"OK\n"
+			return
+		elif data[0:len(STATE_COMMANDS[2])] == STATE_COMMANDS[2]:
+			data = yield b"OK\n"
+		else:
+			data = yield b"INVALID\n"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test blaming monitor crash reports: the run the target hadn't
+# answered gets the blame even when the report comes in later, runs
+# the target answered don't, and events queued from another thread
+# are picked up at the next check point
+#
+#------------------------------------------------------------------
+
+import sys
+import threading
+sys.path.append("../..")
+from backend.crash_events import RunTimeline, CrashEventsPending
+from backend.fuzzer_types import RunRecord
+from backend.proc_director import ProcDirector
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+# activity - list of ("send" or "receive", time)
+def addRun(timeline, runNumber, activity):
+    runRecord = RunRecord()
+    for (kind, timestamp) in activity:
+        if kind == "send":
+            runRecord.sendTimes.append(timestamp)
+        else:
+            runRecord.receiveTimes.append(timestamp)
+    timeline.add(runNumber, runNumber, runRecord)
+
+def blamedRuns(timeline, timestamp):
+    return [runNumber for (runNumber, seed, runRecord) in timeline.findRuns(timestamp)]
+
+def testBlame():
+    print(("\n{}Blaming crashes...{}".format(Color.BOLD, Color.END)))
+    timeline = RunTimeline()
+    addRun(timeline, 1, [("send", 1.0), ("receive", 1.1), ("send", 1.2), ("receive", 1.3)])
+    # Never answered, e.g. the target crashed on it
+    addRun(timeline, 2, [("send", 2.0), ("receive", 2.1), ("send", 2.2)])
+    # Couldn't connect
+    addRun(timeline, 3, [])
+    checks = [
+        # Nothing sent yet
+        (0.5, []),
+        # Everything answered, the last run to send is all there is
+        (1.25, [1]),
+        (1.4, [1]),
+        # Reported well after run 2 went unanswered, while run 3 was failing
+        (9.0, [2]),
+    ]
+    isPass = True
+    for (timestamp, expected) in checks:
+        blamed = blamedRuns(timeline, timestamp)
+        print(("\tCrash at {}: blamed {}".format(timestamp, blamed)))
+        if blamed != expected:
+            isPass = False
+
+    # Conversations in flight at once all get blamed, if they were sent
+    # since the target last answered anything
+    addRun(timeline, 4, [("send", 10.0)])
+    addRun(timeline, 5, [("send", 10.1), ("receive", 10.15)])
+    addRun(timeline, 6, [("send", 10.2)])
+    addRun(timeline, 7, [("send", 10.22), ("receive", 10.3)])
+    blamed = blamedRuns(timeline, 10.25)
+    print(("\tCrash at 10.25: blamed {}".format(blamed)))
+    isPass = isPass and blamed == [6, 7]
+    printResult("Blame Test", isPass)
+
+class SignalingMonitor(object):
+    def monitorTarget(self, targetIP, targetPort, signalMain):
+        signalMain("Target died", timestamp=1.5, signal=11, corePath="/tmp/core.1", logExcerpt="segfault at 0")
+
+def testQueue():
+    print(("\n{}Queueing crash events...{}".format(Color.BOLD, Color.END)))
+    monitor = ProcDirector.MonitorWrapper("127.0.0.1", 0, SignalingMonitor())
+    isPass = monitor.waitForCrashEvents(1)
+    try:
+        monitor.checkCrashEvents()
+        isPass = False
+    except CrashEventsPending:
+        pass
+    crashEvents = monitor.takeCrashEvents()
+    isPass = isPass and len(crashEvents) == 1 and not monitor.hasCrashEvents()
+    description = crashEvents[0].describe()
+    print(("\t{}".format(description)))
+    isPass = isPass and crashEvents[0].timestamp == 1.5
+    isPass = isPass and description == "Crash event detected: Target died (signal SIGSEGV, core dumped to /tmp/core.1, log: segfault at 0)"
+    # Nothing left to stop the next run
+    monitor.checkCrashEvents()
+    printResult("Queue Test", isPass)
+
+def main():
+    testBlame()
+    testQueue()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Benchmark of --forkServer against restarting the target for every
+# case, using sample_apps/pidlisten
+#
+# Both send the same valid session init and wait for the reply, the
+# fork server with a fresh copy per case and with 10 cases per copy.
+# Also checks the fork server reports a copy dying on a signal, with
+# crashingHandler() below.  pid_listener's 8192 test case count bug
+# only corrupts the heap, whether that kills it depends on the layout.
+# And that a conversation longer than the hang timeout isn't a hang,
+# for Python and native targets, while a native target that doesn't
+# exit once the conversation is over still is
+#
+#------------------------------------------------------------------
+
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+from backend.fork_server import ForkServer
+
+PID_LISTENER = os.path.abspath(os.path.join(__file__, "../../../sample_apps/pidlisten/source/pid_listener.py"))
+PORT = 9999
+CASES = 200
+RESTART_CASES = 20
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+# Fork server target, loaded from this file
+def crashingHandler(connection):
+    if connection.recv(4096).startswith(b"crash"):
+        os.kill(os.getpid(), signal.SIGSEGV)
+    connection.sendall(b"OK\n")
+
+def echoHandler(connection):
+    while True:
+        data = connection.recv(4096)
+        if not data:
+            return
+        connection.sendall(data)
+
+def runCase(connection, message):
+    connection.sendall(message)
+    return connection.recv(4096)
+
+# Seconds per case starting the server, waiting for it to listen, and
+# stopping it again afterwards
+def benchmarkRestarts():
+    startTime = time.monotonic()
+    for n in range(0, RESTART_CASES):
+        process = subprocess.Popen([sys.executable, PID_LISTENER], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        while True:
+            try:
+                connection = socket.create_connection(("127.0.0.1", PORT))
+                break
+            except ConnectionRefusedError:
+                if process.poll() is not None:
+                    raise RuntimeError("pid_listener.py exited, is port %d free?" % (PORT))
+                time.sleep(0.001)
+        runCase(connection, b"1234.4321")
+        # RST, so the next copy isn't kept from binding by this connection
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        connection.close()
+        process.kill()
+        process.wait()
+    return (time.monotonic() - startTime) / RESTART_CASES
+
+def benchmarkForkServer(casesPerChild):
+    forkServer = ForkServer(PID_LISTENER + ":client_handler", casesPerChild=casesPerChild)
+    forkServer.start()
+    try:
+        startTime = time.monotonic()
+        for n in range(0, CASES):
+            connection = forkServer.connect()
+            runCase(connection, b"1234.4321")
+            forkServer.finishCase(connection)
+        return (time.monotonic() - startTime) / CASES
+    finally:
+        forkServer.stop()
+
+def testCrashVerdict():
+    forkServer = ForkServer(os.path.abspath(__file__) + ":crashingHandler")
+    forkServer.start()
+    try:
+        connection = forkServer.connect()
+        try:
+            runCase(connection, b"crash")
+        except ConnectionError:
+            pass
+        crashMessage = forkServer.finishCase(connection)
+        print(("\t{}".format(crashMessage)))
+        connection = forkServer.connect()
+        isAlive = runCase(connection, b"hello") == b"OK\n"
+        survivorMessage = forkServer.finishCase(connection)
+    finally:
+        forkServer.stop()
+    printResult("Crash Verdict Test", crashMessage is not None and isAlive and survivorMessage is None)
+
+# Target, hangTimeout, delay between Mutiny's two messages
+def testLongConversation(name, target, hangTimeout, delay, expectHang):
+    forkServer = ForkServer(target, hangTimeout=hangTimeout)
+    forkServer.start()
+    try:
+        connection = forkServer.connect()
+        # Read the echoes, closing with them unread would reset the connection
+        connection.settimeout(delay + 0.5)
+        for message in [b"one", b"two"]:
+            connection.sendall(message)
+            time.sleep(delay)
+            try:
+                connection.recv(4096)
+            except socket.timeout:
+                pass
+        verdict = forkServer.finishCase(connection)
+    finally:
+        forkServer.stop()
+    print(("\t{}: {}".format(name, verdict)))
+    printResult("{} Hang Timeout Test".format(name), (verdict is not None) == expectHang)
+
+def main():
+    testCrashVerdict()
+    testLongConversation("Python Conversation", os.path.abspath(__file__) + ":echoHandler", 0.5, 1.0, False)
+    testLongConversation("Native Conversation", "cat", 0.5, 1.0, False)
+    testLongConversation("Native Hang", "sleep 10", 0.5, 0, True)
+    restartTime = benchmarkRestarts()
+    forkTime = benchmarkForkServer(1)
+    persistentTime = benchmarkForkServer(10)
+    print(("\tRestart per case:           {:.2f} ms/case".format(restartTime * 1000)))
+    print(("\tFork server:                {:.2f} ms/case ({:.0f}x)".format(forkTime * 1000, restartTime / forkTime)))
+    print(("\tFork server, 10 cases/copy: {:.2f} ms/case ({:.0f}x)".format(persistentTime * 1000, restartTime / persistentTime)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test framed receives: each kind of frame has to come back whole
+# when the server sends it in pieces, without reading into the next
+# message, and well before receiveTimeout
+#
+#------------------------------------------------------------------
+
+import socket
+import sys
+import threading
+import time
+sys.path.append("../..")
+from backend.framing import StreamReceiver, parseFrame
+from mutiny_classes.mutiny_exceptions import AbortCurrentRunException
+
+# Long enough that waiting it out would be obvious
+RECEIVE_TIMEOUT = 2.0
+# Gap between the pieces the "server" sends
+PIECE_DELAY = 0.05
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+def sendPieces(connection, pieces):
+    for piece in pieces:
+        connection.sendall(piece)
+        time.sleep(PIECE_DELAY)
+
+# pieces - what the server sends, with a delay between each
+# expected - list of (frame spec, recorded length, expected frame)
+def testFrames(name, pieces, expected):
+    print(("\n{}Receiving {} frames...{}".format(Color.BOLD, name, Color.END)))
+    (client, server) = socket.socketpair()
+    sender = threading.Thread(target=sendPieces, args=(server, pieces))
+    sender.start()
+    receiver = StreamReceiver(client, bufferSize=8)
+    isPass = True
+    startTime = time.time()
+    for (spec, recordedLength, expectedFrame) in expected:
+        data = receiver.receive(parseFrame(spec, recordedLength), RECEIVE_TIMEOUT)
+        if data != expectedFrame:
+            print(("\t{0}: expected {1} got {2}".format(spec, repr(expectedFrame), repr(bytes(data)))))
+            isPass = False
+    elapsed = time.time() - startTime
+    print(("\tReceived {0} frames in {1:.2f} seconds".format(len(expected), elapsed)))
+    if elapsed > len(pieces) * PIECE_DELAY + RECEIVE_TIMEOUT / 2:
+        isPass = False
+    sender.join()
+    client.close()
+    server.close()
+    printResult("{} Frame Test".format(name), isPass)
+
+# A fuzzed length field or a missing delimiter has to abort the run
+# instead of buffering whatever the server claims is coming
+def testOversized(name, pieces, spec, maxFrameSize):
+    print(("\n{}Receiving oversized {} frame...{}".format(Color.BOLD, name, Color.END)))
+    (client, server) = socket.socketpair()
+    sender = threading.Thread(target=sendPieces, args=(server, pieces))
+    sender.start()
+    receiver = StreamReceiver(client, bufferSize=8, maxFrameSize=maxFrameSize)
+    isPass = False
+    try:
+        data = receiver.receive(parseFrame(spec, 0), RECEIVE_TIMEOUT)
+        print(("\tExpected an abort, got {0} bytes".format(len(data))))
+    except AbortCurrentRunException as e:
+        print(("\tAborted: {0}, buffer is {1} bytes".format(str(e), len(receiver._buffer))))
+        isPass = len(receiver._buffer) <= 2 * maxFrameSize
+    sender.join()
+    client.close()
+    server.close()
+    printResult("Oversized {} Frame Test".format(name), isPass)
+
+def main():
+    testFrames("Delimiter", [b"HTTP/1.1 200 OK\r\n", b"Server: x\r\n\r", b"\nBYE\n"],
+               [("delimiter:\\r\\n\\r\\n", 0, b"HTTP/1.1 200 OK\r\nServer: x\r\n\r\n"), ("delimiter:\\n", 0, b"BYE\n")])
+    testFrames("Length", [b"abc", b"defgh", b"ij"],
+               [("length:4", 0, b"abcd"), ("recorded", 6, b"efghij")])
+    testFrames("Prefix", [b"\x00\x05he", b"llo\x07\x00\x00", b"\x00world!!"],
+               [("prefix:0:2", 0, b"\x00\x05hello"), ("prefix:0:4:little:-4", 0, b"\x07\x00\x00\x00wor")])
+    testOversized("Prefix", [b"\xff\xff\xff\xffdata"], "prefix:0:4", 1024)
+    testOversized("Delimiter", [b"x" * 600, b"y" * 600], "delimiter:\\r\\n", 1024)
+
+if __name__ == "__main__":
+    main()
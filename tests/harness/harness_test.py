@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test --harness connections: responses to plain handlers and
+# sessions, timeouts and hang ups where a socket would have them,
+# and exceptions turning into crashes that say where they came from
+#
+#------------------------------------------------------------------
+
+import os
+import socket
+import sys
+sys.path.append("../..")
+from backend.framing import StreamReceiver, parseFrame
+from backend.harness import Harness
+from mutiny_classes.mutiny_exceptions import LogCrashException
+
+TARGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "targets.py")
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+def timesOut(connection):
+    try:
+        connection.recv(4096)
+    except socket.timeout:
+        return True
+    return False
+
+def crashMessage(connection, data):
+    try:
+        connection.sendall(data)
+    except LogCrashException as e:
+        return str(e)
+    return ""
+
+def testHandler():
+    print(("\n{}Calling a handler...{}".format(Color.BOLD, Color.END)))
+    harness = Harness(TARGETS + ":echo")
+    connection = harness.connect()
+    connection.sendall(bytearray(b"hi"))
+    isPass = connection.recv(4096) == b"HI"
+    connection.sendall(b"quiet")
+    isPass = isPass and timesOut(connection)
+    message = crashMessage(connection, b"crash")
+    print(("\t{}".format(message)))
+    isPass = isPass and message.startswith("Harness raised ValueError: bad input at ") and "in echo" in message
+    isPass = isPass and harness.getSummary()[0].startswith("Harness: 3 calls")
+    printResult("Handler Test", isPass)
+
+def testSession():
+    print(("\n{}Running a session...{}".format(Color.BOLD, Color.END)))
+    harness = Harness(TARGETS + ":session")
+    connection = harness.connect()
+    receiver = StreamReceiver(connection)
+    isPass = receiver.receive(parseFrame("delimiter:\\n", 0), 1) == b"HELLO\n"
+    connection.sendall(b"stuff\n")
+    isPass = isPass and connection.recv(4096) == b"OK\n"
+    connection.sendall(b"bye\n")
+    isPass = isPass and connection.recv(4096) == b"BYE\n"
+    # Like a socket, the hang up shows once there's something else to send
+    isPass = isPass and timesOut(connection)
+    connection.sendall(b"more\n")
+    isPass = isPass and connection.recv(4096) == b""
+    try:
+        connection.sendall(b"more\n")
+        isPass = False
+    except BrokenPipeError:
+        pass
+    connection.close()
+
+    # Each connection is a new session
+    connection = harness.connect()
+    isPass = isPass and connection.recv(4096) == b"HELLO\n"
+    message = crashMessage(connection, b"not a number\n")
+    print(("\t{}".format(message)))
+    isPass = isPass and message.startswith("Harness raised ValueError: ") and "in session" in message
+    connection.close()
+    printResult("Session Test", isPass)
+
+def main():
+    testHandler()
+    testSession()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# Handlers for harness_test.py
+
+def echo(data):
+    if data.startswith(b"crash"):
+        raise ValueError("bad input")
+    if data.startswith(b"quiet"):
+        return None
+    return data.upper()
+
+def session():
+    data = yield b"HELLO\n"
+    while data != b"bye\n":
+        data = yield b"OK\n" if len(data) < 10 else int(data)
+    yield b"BYE\n"
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test the in-process libradamsa engine: every seed gives an output,
+# and outputs longer than the output buffer come back whole instead of
+# cut off at the buffer size
+#
+# libradamsa's outputs aren't compared with the radamsa binary's, they
+# differ (see LibRadamsaMutator).  Reports a skip if the library isn't
+# there, radamsa 0.6 as bundled can't build it
+#
+#------------------------------------------------------------------
+
+import os
+import sys
+sys.path.append("../..")
+from backend.mutator import LibRadamsaMutator
+
+LIBRADAMSA=os.path.abspath( os.path.join(__file__, "../../../radamsa-0.6/lib/libradamsa.so") )
+
+ITERATIONS = 500
+
+INPUTS = [
+    "auth\n",
+    "GET /test1234 HTTP/1.1\r\nFrom: joebob@test.com\r\nUser-Agent: Mozilla/1.2\r\n\r\n",
+    "\x00\x01\x02\x03\xde\xad\xbe\xef",
+]
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+def testSeeds(libraryMutator, inputValue):
+    inputValue = bytearray(inputValue.encode('latin-1'))
+    print(("\n{}Mutating {} with seeds 0-{}...{}".format(Color.BOLD, repr(bytes(inputValue)), ITERATIONS-1, Color.END)))
+    changed = 0
+    for seed in range(0, ITERATIONS):
+        output = libraryMutator.mutate(seed, inputValue)
+        if not isinstance(output, bytearray):
+            print(("\tSeed {0}: got {1}".format(seed, type(output))))
+            printResult("Seed Test", False)
+            return False
+        if output != inputValue:
+            changed += 1
+    print(("\t{0} of {1} outputs differ from the input".format(changed, ITERATIONS)))
+    printResult("Seed Test", changed > 0)
+    return changed > 0
+
+# Outputs bigger than the output buffer have to come back whole
+def testLongOutputs(libraryPath):
+    libraryMutator = LibRadamsaMutator(libraryPath, bufferSize=16)
+    inputValue = bytearray(b"A" * 64)
+    print(("\n{}Mutating 64 bytes with a 16 byte output buffer...{}".format(Color.BOLD, Color.END)))
+    longOutputs = 0
+    for seed in range(0, 100):
+        if len(libraryMutator.mutate(seed, inputValue)) > 16:
+            longOutputs += 1
+    print(("\t{0} of 100 outputs longer than the buffer".format(longOutputs)))
+    printResult("Long Output Test", longOutputs > 0)
+    return longOutputs > 0
+
+def main():
+    try:
+        libraryMutator = LibRadamsaMutator(LIBRADAMSA)
+    except OSError as e:
+        print(("\nSkipping libradamsa tests, unable to load {} ({})\n".format(LIBRADAMSA, str(e))))
+        return
+
+    isPass = True
+    for inputValue in INPUTS:
+        isPass = testSeeds(libraryMutator, inputValue) and isPass
+    isPass = testLongOutputs(LIBRADAMSA) and isPass
+    if not isPass:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
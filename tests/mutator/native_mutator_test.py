@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test the native mutator: every seed must map to the same output
+# whether it's computed alone or as part of a batch, and the first
+# seeds must walk the deterministic stages in order
+#
+# Needs numpy
+#
+#------------------------------------------------------------------
+
+import sys
+sys.path.append("../..")
+from backend.native_mutator import NativeMutator, locateSeed, STAGES, HAVOC
+
+INPUTS = [
+    "auth\n",
+    "GET /test1234 HTTP/1.1\r\nFrom: joebob@test.com\r\n\r\n",
+    "\x00\x01\x02\x03\xde\xad\xbe\xef",
+    "",
+]
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+def testBatchMatchesSingle(inputValue):
+    print(("\n{}Comparing batched and single mutations of {}...{}".format(Color.BOLD, repr(bytes(inputValue)), Color.END)))
+    # Cover the deterministic stages and a good way into havoc
+    length = len(inputValue)
+    lastSeed = sum([stage[1](length) for stage in STAGES]) + 200
+    seeds = list(range(0, lastSeed)) + [1000000, 1000001]
+    batched = NativeMutator(batchSize=64)
+    batchResults = batched.mutateBatch(seeds, inputValue)
+    mismatches = 0
+    for n in range(0, len(seeds)):
+        single = NativeMutator(batchSize=1).mutate(seeds[n], inputValue)
+        viaCache = batched.mutate(seeds[n], inputValue)
+        if not (single == viaCache == batchResults[n]):
+            if mismatches < 5:
+                print(("\tSeed {0}: single {1} batch {2}".format(seeds[n], repr(bytes(single)), repr(batchResults[n]))))
+            mismatches += 1
+    print(("\t{0} of {1} seeds differ".format(mismatches, len(seeds))))
+    printResult("Batch Determinism Test", mismatches == 0)
+
+def testWalkingBitFlips(inputValue):
+    print(("\n{}Checking walking bit flips on {}...{}".format(Color.BOLD, repr(bytes(inputValue)), Color.END)))
+    mutator = NativeMutator()
+    isPass = True
+    for seed in range(0, len(inputValue) * 8):
+        expected = bytearray(inputValue)
+        expected[seed >> 3] ^= 128 >> (seed & 7)
+        if locateSeed(seed, len(inputValue)) != (0, seed) or mutator.mutate(seed, inputValue) != expected:
+            print(("\tSeed {0} is not a single bit flip".format(seed)))
+            isPass = False
+            break
+    # And the deterministic stages run out exactly where havoc starts
+    lastSeed = sum([stage[1](len(inputValue)) for stage in STAGES])
+    if locateSeed(lastSeed, len(inputValue)) != (HAVOC, 0):
+        print(("\tSeed {0} should be the first havoc seed".format(lastSeed)))
+        isPass = False
+    printResult("Walking Bit Flip Test", isPass)
+
+def main():
+    for inputValue in INPUTS:
+        inputValue = bytearray(inputValue.encode('latin-1'))
+        testBatchMatchesSingle(inputValue)
+        testWalkingBitFlips(inputValue)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Microbenchmark of the Python overhead of a single run, without any
+# sockets or mutation engine: every outbound message goes through the
+# default message processor with a trivial mutation, every inbound
+# message through postReceiveProcess()
+#
+# Compares the compiled RunPlan, with and without skipping the default
+# callbacks, against the old way of rebuilding everything from the
+# MessageCollection on every run, and checks that all three send
+# exactly the same bytes
+#
+#------------------------------------------------------------------
+
+import os
+import sys
+import timeit
+sys.path.append("../..")
+from backend.fuzzerdata import FuzzerData
+from backend.run_plan import RunPlan
+from backend.fuzzer_types import RunRecord
+from backend.proc_director import ProcDirector
+from mutiny_classes.message_processor import MessageProcessor, MessageProcessorExtraParams
+
+SAMPLE_APPS = os.path.abspath(os.path.join(__file__, "../../../sample_apps"))
+FUZZER_FILES = [
+    "server/data/server-0.fuzzer",
+    "session_server/data/session_server-3.fuzzer",
+    "subcomponent_server/data/subcomponent-0.fuzzer",
+]
+
+RUNS = 20000
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   BOLD = '\033[1m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print(("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END)))
+
+# Stands in for the mutator, cheap so only the overhead is measured
+def fakeMutate(seed, byteArray):
+    return bytearray(byteArray[::-1]) + bytearray(str(seed).encode())
+
+# One run the way performRun() did it before RunPlan
+def legacyRun(messageCollection, messageProcessor, seed, sent):
+    for i in range(0, len(messageCollection.messages)):
+        message = messageCollection.messages[i]
+        message.resetAlteredMessage()
+        if message.isOutbound():
+            doesMessageHaveSubcomponents = len(message.subcomponents) > 1
+            originalSubcomponents = [subcomponent.getOriginalByteArray() for subcomponent in message.subcomponents]
+            if doesMessageHaveSubcomponents:
+                for j in range(0, len(message.subcomponents)):
+                    subcomponent = message.subcomponents[j]
+                    actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
+                    prefuzz = messageProcessor.preFuzzSubcomponentProcess(subcomponent.getAlteredByteArray(), MessageProcessorExtraParams(i, j, subcomponent.isFuzzed, originalSubcomponents, actualSubcomponents))
+                    subcomponent.setAlteredByteArray(prefuzz)
+            else:
+                actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
+                prefuzz = messageProcessor.preFuzzProcess(actualSubcomponents[0], MessageProcessorExtraParams(i, -1, message.isFuzzed, originalSubcomponents, actualSubcomponents))
+                message.subcomponents[0].setAlteredByteArray(prefuzz)
+            for subcomponent in message.subcomponents:
+                if subcomponent.isFuzzed:
+                    subcomponent.setAlteredByteArray(fakeMutate(seed, subcomponent.getAlteredByteArray()))
+            if doesMessageHaveSubcomponents:
+                for j in range(0, len(message.subcomponents)):
+                    subcomponent = message.subcomponents[j]
+                    actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
+                    presend = messageProcessor.preSendSubcomponentProcess(subcomponent.getAlteredByteArray(), MessageProcessorExtraParams(i, j, subcomponent.isFuzzed, originalSubcomponents, actualSubcomponents))
+                    subcomponent.setAlteredByteArray(presend)
+            actualSubcomponents = [subcomponent.getAlteredByteArray() for subcomponent in message.subcomponents]
+            sent.append(messageProcessor.preSendProcess(message.getAlteredMessage(), MessageProcessorExtraParams(i, -1, message.isFuzzed, originalSubcomponents, actualSubcomponents)))
+        else:
+            messageByteArray = message.getAlteredMessage()
+            messageProcessor.postReceiveProcess(messageByteArray, MessageProcessorExtraParams(i, -1, False, [messageByteArray], [messageByteArray]))
+
+# The same run with a RunPlan, as performRun() does it now
+def planRun(runPlan, messageCollection, messageProcessor, seed, sent):
+    mutate = lambda fuzzedIndex, byteArray: fakeMutate(seed, byteArray)
+    runRecord = RunRecord()
+    for i in range(0, len(messageCollection.messages)):
+        plan = runPlan.messages[i]
+        if plan.isOutbound:
+            sent.append(runPlan.prepareOutbound(i, runRecord, messageProcessor, mutate))
+        elif "postReceiveProcess" in runPlan.hooks:
+            data = bytearray(plan.originalMessage)
+            messageProcessor.postReceiveProcess(data, MessageProcessorExtraParams(i, -1, False, plan.originalWhole, [data]))
+
+def benchmark(fuzzerFile):
+    fuzzerData = FuzzerData()
+    fuzzerData.readFromFile(os.path.join(SAMPLE_APPS, fuzzerFile))
+    messageCollection = fuzzerData.messageCollection
+    runPlan = RunPlan(messageCollection)
+    # What ProcDirector finds for the default processor: nothing to call
+    skippingRunPlan = RunPlan(messageCollection, ProcDirector._findOverriddenHooks(MessageProcessor, MessageProcessor))
+    messageProcessor = MessageProcessor()
+    print(("\n{}{} ({} messages), {} runs...{}".format(Color.BOLD, fuzzerFile, len(messageCollection.messages), RUNS, Color.END)))
+
+    legacySent = []
+    planSent = []
+    skippingSent = []
+    for seed in range(0, 50):
+        legacyRun(messageCollection, messageProcessor, seed, legacySent)
+        planRun(runPlan, messageCollection, messageProcessor, seed, planSent)
+        planRun(skippingRunPlan, messageCollection, messageProcessor, seed, skippingSent)
+    printResult("Same Bytes Sent Test", legacySent == planSent == skippingSent)
+
+    sent = []
+    legacyTime = min(timeit.repeat(lambda: legacyRun(messageCollection, messageProcessor, 1, sent), number=RUNS, repeat=3))
+    del sent[:]
+    planTime = min(timeit.repeat(lambda: planRun(runPlan, messageCollection, messageProcessor, 1, sent), number=RUNS, repeat=3))
+    del sent[:]
+    skippingTime = min(timeit.repeat(lambda: planRun(skippingRunPlan, messageCollection, messageProcessor, 1, sent), number=RUNS, repeat=3))
+    print(("\tLegacy:   {:.2f} us/run".format(legacyTime / RUNS * 1e6)))
+    print(("\tRun plan: {:.2f} us/run".format(planTime / RUNS * 1e6)))
+    print(("\tRun plan, default callbacks skipped: {:.2f} us/run".format(skippingTime / RUNS * 1e6)))
+
+def main():
+    for fuzzerFile in FUZZER_FILES:
+        benchmark(fuzzerFile)
+
+if __name__ == "__main__":
+    main()